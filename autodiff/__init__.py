@@ -0,0 +1,2 @@
+from autodiff.hessian import hvp, hessian, hessian_diag, hessian_trace
+from autodiff.vmap import per_example_gradients
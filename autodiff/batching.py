@@ -0,0 +1,492 @@
+import string
+import numpy as np
+from compgraph.nodes import SparseNode
+from compgraph.registry import attach_rules
+from compgraph.api import (
+    _im2col, _conv2d, _conv2d_backprop_input, _max_pool2d,
+    _max_pool2d_backprop, _avg_pool2d, _avg_pool2d_backprop
+)
+import autodiff.jvps as jvps
+
+# the batched rules of the ops used to evaluate a per-example graph over a
+# batch of examples at once. {opname}_batched(node, values, batched) takes
+# the values of the node's operands and flags telling which of them carry a
+# leading batch axis, at least one does, and returns the batched value of the
+# node, i.e. of shape (B,) + node.shape. Unbatched values have the node's
+# own shape and broadcast against the batched ones as they are.
+# {opname}_batched_grad(node, adjoint, output, values, batched, needs) takes
+# the per-example adjoint of the node of shape (B,) + node.shape, its value
+# and its operands values and returns the per-example adjoints of the
+# operands whose needs flag is set, None for the others. The rules of where
+# get the value of the condition after the operands values.
+
+def _lift(value, batched, ndim):
+    """
+    inserts unit axes after the batch axis of a batched value so it
+    broadcasts against a batched result with ndim per-example dimensions
+    """
+    return jvps._lift(value, ndim) if batched else value
+
+def _lifted(node, values, batched):
+    """
+    lifts the operands values against the node
+    """
+    return [_lift(value, flag, node.ndim) for value, flag in zip(values, batched)]
+
+def _batch(value, batched, batch_size):
+    """
+    broadcasts an unbatched value along a leading batch axis
+    """
+    return value if batched else np.broadcast_to(value, (batch_size,) + value.shape)
+
+def _merge(value):
+    """
+    merges the batch axis of a batched NCHW value into its N axis
+    """
+    return jvps._merge(value)
+
+def _reduced(node):
+    """
+    returns the axes of its operand a reduction node reduces
+    """
+    ndim = node.operand_a.ndim
+    if node.axis is None:
+        return tuple(range(ndim))
+
+    return tuple(sorted(a % ndim for a in np.atleast_1d(node.axis)))
+
+def _keepdims(node, value):
+    """
+    reshapes a batched or unbatched value of a reduction node so its reduced
+    axes are kept as ones
+    """
+    reduced = _reduced(node)
+    shape = tuple(1 if i in reduced else size for i, size in enumerate(node.operand_a.shape))
+
+    return value.reshape(value.shape[:value.ndim - node.ndim] + shape)
+
+def _transposed_axes(ndim):
+    """
+    returns the axes permutation reversing the per-example axes of a batched
+    value with ndim per-example dimensions
+    """
+    return (0,) + tuple(range(ndim, 0, -1))
+
+def _dot_subscripts(ndim_a, ndim_b):
+    """
+    returns the einsum subscripts of np.dot for operands of the given number
+    of dimensions
+    """
+    if ndim_a == 0 or ndim_b == 0:
+        a, b = 'abcdef'[:ndim_a], 'abcdef'[:ndim_b]
+        return a, b, a if ndim_a > ndim_b else b
+
+    a = 'abcdef'[:ndim_a - 1] + 'z'
+    b = 'mnopqr'[:ndim_b - 1]
+    b = b[:-1] + 'z' + b[-1:] if ndim_b > 1 else 'z'
+
+    return a, b, a[:-1] + b.replace('z', '')
+
+def _batch_label(node):
+    """
+    returns an einsum label the subscripts of the node don't use
+    """
+    used = ''.join(node.input_subscripts) + node.output_subscript
+
+    return next(label for label in string.ascii_letters if label not in used)
+
+def _einsum(subscripts, batched, output, *arrays, batch_label='B'):
+    """
+    evaluates an einsum prefixing the subscripts of the batched operands and
+    of the output with the batch label
+    """
+    inputs = [batch_label + s if flag else s for s, flag in zip(subscripts, batched)]
+
+    return np.einsum(
+        "%s->%s" % (','.join(inputs), batch_label + output), *arrays, optimize=True
+    )
+
+def _check_dense(node):
+    if any(isinstance(operand, SparseNode) for operand in node.operands):
+        raise NotImplementedError("batching sparse operands of %s is not supported" % node.opname)
+
+def unbroadcast(adjoint, shape):
+    """
+    sums a per-example adjoint over the axes its operand of the given shape
+    was broadcasted along, keeping the batch axis
+
+    Parameters:
+    ----------
+    adjoint: ndarray
+        the adjoint of shape (B,) + a shape the operand broadcasts to
+    shape: tuple
+        the shape of the operand
+
+    Returns: ndarray
+        the adjoint of shape (B,) + shape
+    """
+    extra = adjoint.ndim - 1 - len(shape)
+    if extra > 0:
+        adjoint = np.sum(adjoint, axis=tuple(range(1, extra + 1)))
+
+    ones = tuple(
+        axis + 1 for axis, size in enumerate(shape)
+        if size == 1 and adjoint.shape[axis + 1] != 1
+    )
+    if len(ones) != 0:
+        adjoint = np.sum(adjoint, axis=ones, keepdims=True)
+
+    if adjoint.shape[1:] != tuple(shape):
+        adjoint = np.broadcast_to(adjoint, adjoint.shape[:1] + tuple(shape))
+
+    return adjoint
+
+def add_batched(node, values, batched):
+    a, b = _lifted(node, values, batched)
+    return a + b
+
+def sub_batched(node, values, batched):
+    a, b = _lifted(node, values, batched)
+    return a - b
+
+def mul_batched(node, values, batched):
+    a, b = _lifted(node, values, batched)
+    return a * b
+
+def div_batched(node, values, batched):
+    a, b = _lifted(node, values, batched)
+    return a / b
+
+def pow_batched(node, values, batched):
+    a, b = _lifted(node, values, batched)
+    return a ** b
+
+def transpose_batched(node, values, batched):
+    a, = values
+    return np.transpose(a, _transposed_axes(node.ndim))
+
+def sum_batched(node, values, batched):
+    a, = values
+    return np.sum(a, axis=jvps._axes(node.axis, node.operand_a.ndim), keepdims=node.keepdims)
+
+def mean_batched(node, values, batched):
+    a, = values
+    return np.mean(a, axis=jvps._axes(node.axis, node.operand_a.ndim))
+
+def max_batched(node, values, batched):
+    a, = values
+    return np.max(a, axis=jvps._axes(node.axis, node.operand_a.ndim), keepdims=node.keepdims)
+
+def exp_batched(node, values, batched):
+    a, = values
+    return np.exp(a)
+
+def log_batched(node, values, batched):
+    a, = values
+    return np.log(a)
+
+def sin_batched(node, values, batched):
+    a, = values
+    return np.sin(a)
+
+def cos_batched(node, values, batched):
+    a, = values
+    return np.cos(a)
+
+def dot_batched(node, values, batched):
+    _check_dense(node)
+    a, b = node.operands
+    subscripts_a, subscripts_b, output = _dot_subscripts(a.ndim, b.ndim)
+
+    return _einsum([subscripts_a, subscripts_b], batched, output, *values)
+
+def einsum_batched(node, values, batched):
+    return _einsum(
+        node.input_subscripts, batched, node.output_subscript, *values,
+        batch_label=_batch_label(node)
+    )
+
+def where_batched(node, values, batched):
+    a, b, condition = _lifted(node, values, batched)
+    return np.where(condition, a, b)
+
+def softmax_batched(node, values, batched):
+    a, = values
+    axis = node.axis % node.ndim + 1
+    exp = np.exp(a - np.max(a, axis=axis, keepdims=True))
+
+    return exp / np.sum(exp, axis=axis, keepdims=True)
+
+def softmax_cross_entropy_batched(node, values, batched):
+    logits, labels = values
+    exp = np.exp(logits - np.max(logits, axis=-1, keepdims=True))
+    softmax = exp / np.sum(exp, axis=-1, keepdims=True)
+    cross_entropy = labels * np.log(softmax + 1e-7)
+
+    # the per-example logits and labels have the same shape
+    return -np.mean(cross_entropy, axis=tuple(range(-node.operand_a.ndim, 0)))
+
+def reshape_batched(node, values, batched):
+    a, = values
+    return a.reshape(a.shape[:1] + node.shape)
+
+def squeeze_batched(node, values, batched):
+    return reshape_batched(node, values, batched)
+
+def cast_batched(node, values, batched):
+    a, = values
+    return a.astype(node.dtype)
+
+def add_n_batched(node, values, batched):
+    total = 0
+    for value in _lifted(node, values, batched):
+        total = total + value
+
+    return total
+
+def concatenate_batched(node, values, batched):
+    batch_size = next(value.shape[0] for value, flag in zip(values, batched) if flag)
+
+    return np.concatenate(
+        [_batch(value, flag, batch_size) for value, flag in zip(values, batched)],
+        axis=node.axis % node.ndim + 1
+    )
+
+def stack_batched(node, values, batched):
+    batch_size = next(value.shape[0] for value, flag in zip(values, batched) if flag)
+
+    return np.stack(
+        [_batch(value, flag, batch_size) for value, flag in zip(values, batched)],
+        axis=node.axis % node.ndim + 1
+    )
+
+def split_batched(node, values, batched):
+    a, = values
+    axis = node.axis % node.ndim + 1
+    index = [slice(None)] * a.ndim
+    index[axis] = slice(node.start, node.start + node.shape[axis - 1])
+
+    return a[tuple(index)]
+
+def conv2d_batched(node, values, batched):
+    (array, filters), (array_batched, filters_batched) = values, batched
+    if filters_batched:
+        raise NotImplementedError("batching the filters of conv2d is not supported")
+
+    value = _conv2d(_merge(array), filters, node.stride, node.padding)
+
+    return value.reshape(array.shape[:1] + node.shape)
+
+def max_pool2d_batched(node, values, batched):
+    a, = values
+    value, _ = _max_pool2d(_merge(a), node.kernel_size, node.stride, node.padding)
+
+    return value.reshape(a.shape[:1] + node.shape)
+
+def avg_pool2d_batched(node, values, batched):
+    a, = values
+    value = _avg_pool2d(_merge(a), node.kernel_size, node.stride, node.padding)
+
+    return value.reshape(a.shape[:1] + node.shape)
+
+def add_batched_grad(node, adjoint, output, values, batched, needs):
+    return [adjoint, adjoint]
+
+def sub_batched_grad(node, adjoint, output, values, batched, needs):
+    return [adjoint, -adjoint if needs[1] else None]
+
+def mul_batched_grad(node, adjoint, output, values, batched, needs):
+    a, b = _lifted(node, values, batched)
+    return [
+        adjoint * b if needs[0] else None,
+        adjoint * a if needs[1] else None
+    ]
+
+def div_batched_grad(node, adjoint, output, values, batched, needs):
+    a, b = _lifted(node, values, batched)
+    return [
+        adjoint / b if needs[0] else None,
+        -adjoint * a / b ** 2 if needs[1] else None
+    ]
+
+def pow_batched_grad(node, adjoint, output, values, batched, needs):
+    a, b = _lifted(node, values, batched)
+    return [
+        adjoint * b * a ** (b - 1) if needs[0] else None,
+        adjoint * output * np.log(a) if needs[1] else None
+    ]
+
+def transpose_batched_grad(node, adjoint, output, values, batched, needs):
+    return [np.transpose(adjoint, _transposed_axes(node.ndim))]
+
+def sum_batched_grad(node, adjoint, output, values, batched, needs):
+    adjoint = _keepdims(node, adjoint)
+    return [np.broadcast_to(adjoint, adjoint.shape[:1] + node.operand_a.shape)]
+
+def mean_batched_grad(node, adjoint, output, values, batched, needs):
+    adjoint = _keepdims(node, adjoint) / (node.operand_a.size // max(node.size, 1))
+    return [np.broadcast_to(adjoint, adjoint.shape[:1] + node.operand_a.shape)]
+
+def max_batched_grad(node, adjoint, output, values, batched, needs):
+    a, = values
+    mask = a == _keepdims(node, output)
+    reduced = tuple(axis + batched[0] for axis in _reduced(node))
+    normalizers = np.sum(mask, axis=reduced, keepdims=True)
+
+    return [_keepdims(node, adjoint) * (mask / normalizers)]
+
+def exp_batched_grad(node, adjoint, output, values, batched, needs):
+    return [adjoint * output]
+
+def log_batched_grad(node, adjoint, output, values, batched, needs):
+    a, = values
+    return [adjoint / a]
+
+def sin_batched_grad(node, adjoint, output, values, batched, needs):
+    a, = values
+    return [adjoint * np.cos(a)]
+
+def cos_batched_grad(node, adjoint, output, values, batched, needs):
+    a, = values
+    return [-adjoint * np.sin(a)]
+
+def dot_batched_grad(node, adjoint, output, values, batched, needs):
+    _check_dense(node)
+    a, b = node.operands
+    subscripts_a, subscripts_b, subscripts = _dot_subscripts(a.ndim, b.ndim)
+
+    return [
+        _einsum(
+            [subscripts, subscripts_b], [True, batched[1]], subscripts_a, adjoint, values[1]
+        ) if needs[0] else None,
+        _einsum(
+            [subscripts_a, subscripts], [batched[0], True], subscripts_b, values[0], adjoint
+        ) if needs[1] else None
+    ]
+
+def einsum_batched_grad(node, adjoint, output, values, batched, needs):
+    batch_label = _batch_label(node)
+    adjoints = []
+
+    for i, operand in enumerate(node.operands):
+        if not needs[i]:
+            adjoints.append(None)
+            continue
+
+        subscripts = [node.output_subscript]
+        flags = [True]
+        arrays = [adjoint]
+        for j in range(len(node.operands)):
+            if j != i:
+                subscripts.append(node.input_subscripts[j])
+                flags.append(batched[j])
+                arrays.append(values[j])
+
+        # labels only the operand itself carries are brought back by ones
+        own_labels = node.input_subscripts[i]
+        missing = ''.join(l for l in own_labels if l not in ''.join(subscripts))
+        if len(missing) != 0:
+            subscripts.append(missing)
+            flags.append(False)
+            arrays.append(np.ones(
+                [operand.shape[own_labels.index(l)] for l in missing], dtype=adjoint.dtype
+            ))
+
+        adjoints.append(_einsum(subscripts, flags, own_labels, *arrays, batch_label=batch_label))
+
+    return adjoints
+
+def where_batched_grad(node, adjoint, output, values, batched, needs):
+    condition = _lift(values[2], batched[2], node.ndim)
+    return [
+        np.where(condition, adjoint, 0) if needs[0] else None,
+        np.where(condition, 0, adjoint) if needs[1] else None
+    ]
+
+def softmax_batched_grad(node, adjoint, output, values, batched, needs):
+    # a negative axis since the output is batched only if the operand is
+    axis = node.axis % node.ndim - node.ndim
+    return [output * (adjoint - np.sum(adjoint * output, axis=axis, keepdims=True))]
+
+def softmax_cross_entropy_batched_grad(node, adjoint, output, values, batched, needs):
+    logits, labels = values
+    exp = np.exp(logits - np.max(logits, axis=-1, keepdims=True))
+    softmax = exp / np.sum(exp, axis=-1, keepdims=True)
+    adjoint = adjoint.reshape(adjoint.shape[:1] + (1,) * node.operand_a.ndim)
+
+    # the batched form of softmax_cross_entropy_grad, scaled by the size of
+    # an example's labels
+    return [adjoint * (softmax * np.sum(labels, axis=-1, keepdims=True) - labels) / node.operand_b.size, None]
+
+def reshape_batched_grad(node, adjoint, output, values, batched, needs):
+    return [adjoint.reshape(adjoint.shape[:1] + node.operand_a.shape)]
+
+def squeeze_batched_grad(node, adjoint, output, values, batched, needs):
+    return reshape_batched_grad(node, adjoint, output, values, batched, needs)
+
+def cast_batched_grad(node, adjoint, output, values, batched, needs):
+    return [adjoint.astype(node.operand_a.dtype)]
+
+def add_n_batched_grad(node, adjoint, output, values, batched, needs):
+    return [adjoint] * len(node.operands)
+
+def concatenate_batched_grad(node, adjoint, output, values, batched, needs):
+    return np.split(adjoint, node.split_indices, axis=node.axis % node.ndim + 1)
+
+def stack_batched_grad(node, adjoint, output, values, batched, needs):
+    axis = node.axis % node.ndim + 1
+    return [np.take(adjoint, i, axis=axis) for i in range(len(node.operands))]
+
+def split_batched_grad(node, adjoint, output, values, batched, needs):
+    operand = node.operand_a
+    axis = node.axis % operand.ndim + 1
+
+    doperand = np.zeros(adjoint.shape[:1] + operand.shape, dtype=adjoint.dtype)
+    index = [slice(None)] * doperand.ndim
+    index[axis] = slice(node.start, node.start + node.shape[axis - 1])
+    doperand[tuple(index)] = adjoint
+
+    return [doperand, None]
+
+def conv2d_batched_grad(node, adjoint, output, values, batched, needs):
+    (array, filters), (array_batched, _) = values, batched
+    batch_size = adjoint.shape[0]
+
+    doperand_a = None
+    if needs[0]:
+        input_shape = (batch_size * node.shape[0],) + node.operand_a.shape[1:]
+        doperand_a = _conv2d_backprop_input(
+            _merge(adjoint), filters, input_shape, node.stride, node.padding
+        ).reshape(adjoint.shape[:1] + node.operand_a.shape)
+
+    doperand_b = None
+    if needs[1]:
+        columns = _im2col(
+            _merge(array) if array_batched else array,
+            filters.shape[2:], node.stride, node.padding
+        )
+        if array_batched:
+            columns = columns.reshape(array.shape[:2] + columns.shape[1:])
+        doperand_b = _einsum(
+            ['nfhw', 'nchwij'], [True, array_batched], 'fcij', adjoint, columns
+        )
+
+    return [doperand_a, doperand_b]
+
+def max_pool2d_batched_grad(node, adjoint, output, values, batched, needs):
+    array = _merge(_batch(values[0], batched[0], adjoint.shape[0]))
+    _, argmax = _max_pool2d(array, node.kernel_size, node.stride, node.padding)
+
+    return [_max_pool2d_backprop(
+        _merge(adjoint), argmax, array.shape, node.kernel_size, node.stride, node.padding
+    ).reshape(adjoint.shape[:1] + node.operand_a.shape)]
+
+def avg_pool2d_batched_grad(node, adjoint, output, values, batched, needs):
+    input_shape = (adjoint.shape[0] * node.shape[0],) + node.operand_a.shape[1:]
+
+    return [_avg_pool2d_backprop(
+        _merge(adjoint), input_shape, node.kernel_size, node.stride, node.padding
+    ).reshape(adjoint.shape[:1] + node.operand_a.shape)]
+
+attach_rules(globals(), '_batched', 'batched')
+attach_rules(globals(), '_batched_grad', 'batched_vjp')
@@ -0,0 +1,169 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+def load_shard(shard):
+    """
+    opens a shard as memory-mapped arrays without reading its content
+
+    Parameters:
+    ----------
+    shard: String | ndarray | tuple
+        a path to an .npy file, an array (np.memmap included), or a tuple of
+        those holding aligned arrays, e.g. the features and the labels
+
+    Returns: tuple of ndarray
+    """
+    if not isinstance(shard, tuple):
+        shard = (shard,)
+
+    arrays = tuple(
+        np.load(part, mmap_mode='r') if isinstance(part, str) else part
+        for part in shard
+    )
+
+    if any(len(array) != len(arrays[0]) for array in arrays):
+        raise ValueError("the arrays of a shard must have the same length")
+
+    return arrays
+
+
+class DataLoader:
+
+    def __init__(self, shards, batch_size, shuffle=True, drop_last=False,
+                 transform=None, prefetch=2, workers=2, seed=None):
+        """
+        creates an iterator over minibatches streamed from a list of shards,
+        batches are read and preprocessed in a thread pool ahead of the
+        training loop so the I/O overlaps with the forward and backward passes
+
+        Parameters:
+        ----------
+        shards: list
+            the shards of the dataset, each is a path to an .npy file, an
+            array or a tuple of those as accepted by load_shard
+        batch_size: int
+            the number of examples in each batch
+        shuffle: Boolean
+            a flag to shuffle the shards order and the examples in each shard
+            at the start of each epoch
+        drop_last: Boolean
+            a flag to drop the last batch of an epoch if it's incomplete
+        transform: callable
+            a function applied to the batch arrays in the worker threads, it
+            takes the arrays of the batch and returns the arrays to yield
+        prefetch: int
+            the maximum number of batches prepared ahead, this bounds the memory
+            used by the pipeline to prefetch + 1 batches
+        workers: int
+            the number of threads preparing batches
+        seed: int
+            the seed of the shuffling random generator
+        """
+        self.shards = [load_shard(shard) for shard in shards]
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.transform = transform
+        self.prefetch = max(prefetch, 1)
+        self.workers = workers
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        """
+        returns the number of batches in an epoch
+
+        Returns: int
+        """
+        examples = sum(len(shard[0]) for shard in self.shards)
+        if self.drop_last:
+            return examples // self.batch_size
+
+        return -(-examples // self.batch_size)
+
+    def _plan(self):
+        """
+        generates the contents of each batch in an epoch as a list of
+        (shard index, example indices) segments, a batch spans two shards or
+        more when a shard's end doesn't align with the batch size
+        """
+        shards_order = np.arange(len(self.shards))
+        if self.shuffle:
+            self.rng.shuffle(shards_order)
+
+        segments = []
+        remaining = self.batch_size
+
+        for shard_index in shards_order:
+            length = len(self.shards[shard_index][0])
+            if self.shuffle:
+                indices = self.rng.permutation(length)
+            else:
+                indices = np.arange(length)
+
+            start = 0
+            while start < length:
+                stop = min(start + remaining, length)
+                segments.append((shard_index, indices[start:stop]))
+                remaining -= stop - start
+                start = stop
+
+                if remaining == 0:
+                    yield segments
+                    segments = []
+                    remaining = self.batch_size
+
+        if len(segments) != 0 and not self.drop_last:
+            yield segments
+
+    def _load(self, segments):
+        """
+        reads the examples of a batch from the shards and applies the transform
+
+        Parameters:
+        ----------
+        segments: list
+            the (shard index, example indices) segments of the batch
+
+        Returns: ndarray | tuple of ndarray
+        """
+        parts = []
+        for shard_index, indices in segments:
+            # reading in increasing order keeps the memory-mapped reads local
+            indices = np.sort(indices)
+            parts.append([np.asarray(array[indices]) for array in self.shards[shard_index]])
+
+        batch = tuple(
+            parts[0][i] if len(parts) == 1 else np.concatenate([part[i] for part in parts])
+            for i in range(len(parts[0]))
+        )
+
+        if self.transform is not None:
+            batch = self.transform(*batch)
+            if not isinstance(batch, tuple):
+                batch = (batch,)
+
+        return batch[0] if len(batch) == 1 else batch
+
+    def __iter__(self):
+        """
+        yields the batches of one epoch in order while the next ones are
+        being prepared in the background
+        """
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        pending = deque()
+        plan = self._plan()
+
+        try:
+            for segments in plan:
+                if len(pending) == self.prefetch:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(self._load, segments))
+
+            while len(pending) > 0:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
@@ -1,4 +1,6 @@
 import compgraph as cg
+from compgraph.nodes import SparseNode, SparseVariableNode
+from compgraph.registry import attach_rules
 import numpy as np
 
 def add_grad(prev_adjoint, node):
@@ -28,11 +30,30 @@ def pow_grad(prev_adjoint, node):
 def transpose_grad(prev_adjoint, node):
     return [prev_adjoint.T, None]
 
+def _keepdims_adjoint(prev_adjoint, node):
+    """
+    reshapes the adjoint of a reduction without keepdims to have the reduced
+    axes as ones, so it broadcasts against the reduced operand
+    """
+    axis = getattr(node, 'axis', None)
+    if axis is None or getattr(node, 'keepdims', False):
+        return prev_adjoint
+
+    axes = [a % node.operand_a.ndim for a in np.atleast_1d(axis)]
+    shape = [1 if i in axes else size for i, size in enumerate(node.operand_a.shape)]
+
+    return cg.reshape(prev_adjoint, shape)
+
 def sum_grad(prev_adjoint, node):
-    return [prev_adjoint * np.ones_like(node.operand_a), None]
+    prev_adjoint = _keepdims_adjoint(prev_adjoint, node)
+
+    return [prev_adjoint * np.ones_like(node.operand_a, subok=False), None]
 
 def mean_grad(prev_adjoint, node):
-    return [prev_adjoint * node * np.ones_like(node.operand_a), None]
+    prev_adjoint = _keepdims_adjoint(prev_adjoint, node)
+    count = node.operand_a.size // max(node.size, 1)
+
+    return [prev_adjoint * np.full(node.operand_a.shape, 1. / count, dtype=node.dtype), None]
 
 def exp_grad(prev_adjoint, node):
     return [prev_adjoint * node, None]
@@ -41,6 +62,7 @@ def log_grad(prev_adjoint, node):
     return [prev_adjoint * (1. / node.operand_a), None]
 
 def max_grad(prev_adjoint, node):
+    prev_adjoint = _keepdims_adjoint(prev_adjoint, node)
     doperand_a = cg.where(node.operand_a == node.with_keepdims, 1, 0)
     normalizers = cg.sum(doperand_a, axis=node.axis, keepdims=True)
     normalized_doperand_a = doperand_a / normalizers
@@ -48,30 +70,141 @@ def max_grad(prev_adjoint, node):
     return [prev_adjoint * normalized_doperand_a, None]
 
 def dot_grad(prev_adjoint, node):
-    prev_adj = prev_adjoint
+    if isinstance(node.operand_a, SparseNode) or isinstance(node.operand_b, SparseNode):
+        return sparse_dot_grad(prev_adjoint, node)
+
     op_a = node.operand_a
     op_b = node.operand_b
 
-    if prev_adjoint.ndim == 1:
-        prev_adj = cg.reshape(prev_adjoint, (1, -1))
-    
-    if node.operand_b.ndim == 1:
+    # 1-D operands are handled as a row and a column matrix respectively
+    if op_a.ndim == 1:
+        op_a = cg.reshape(op_a, (1, -1))
+    if op_b.ndim == 1:
         op_b = cg.reshape(op_b, (-1, 1))
 
+    prev_adj = prev_adjoint
+    if prev_adjoint.ndim != 2:
+        prev_adj = cg.reshape(prev_adjoint, (op_a.shape[0], op_b.shape[1]))
+
+    doperand_a = cg.dot(prev_adj, op_b.T)
+    doperand_b = cg.dot(op_a.T, prev_adj)
+
     if node.operand_a.ndim == 1:
-        op_a = cg.reshape(op_a, (1, -1))
+        doperand_a = cg.reshape(doperand_a, node.operand_a.shape)
+    if node.operand_b.ndim == 1:
+        doperand_b = cg.reshape(doperand_b, node.operand_b.shape)
 
-    return [
-        cg.dot(prev_adj, op_b.T),
-        cg.dot(op_a.T, prev_adj)
-    ]
+    return [doperand_a, doperand_b]
 
-def where_grad(prev_adjoint, node):
-    doperand_a = np.zeros_like(node.operand_a)
-    doperand_b = np.ones_like(node.operand_b)
+def sparse_dot_grad(prev_adjoint, node):
+    """
+    computes the adjoints of a dot product with a sparse operand. The dense
+    operand gets a sparse-dense product while a sparse variable gets only the
+    entries in its sparsity pattern, as a sparse matrix of the same pattern
+    """
+    op_a = node.operand_a
+    op_b = node.operand_b
+    prev_adj = np.asarray(prev_adjoint)
+
+    if isinstance(op_a, SparseNode):
+        doperand_b = cg.dot(op_a.T, prev_adjoint)
+        doperand_a = None
+        if isinstance(op_a, SparseVariableNode):
+            doperand_a = _sampled_dot(
+                prev_adj.reshape(op_a.shape[0], -1),
+                np.asarray(op_b).reshape(op_a.shape[1], -1),
+                op_a.value
+            )
+    else:
+        doperand_a = cg.dot(prev_adjoint, op_b.T)
+        doperand_b = None
+        if isinstance(op_b, SparseVariableNode):
+            doperand_b = _sampled_dot(
+                np.asarray(op_a).reshape(-1, op_b.shape[0]).T,
+                prev_adj.reshape(-1, op_b.shape[1]).T,
+                op_b.value
+            )
 
-    doperand_a[node.condition] = 1
-    doperand_b[node.condition] = 0
+    return [doperand_a, doperand_b]
+
+def _sampled_dot(left, right, pattern, chunk_size=65536):
+    """
+    computes the product left @ right.T only at the nonzero entries of the
+    given sparse pattern, in chunks to bound the memory of the gathered rows
+
+    Parameters:
+    ----------
+    left: ndarray
+        the left factor of shape (rows, k)
+    right: ndarray
+        the right factor of shape (cols, k)
+    pattern: scipy.sparse csr matrix
+        the sparse matrix to take the pattern from
+    chunk_size: int
+        the number of nonzero entries to compute at once
+    """
+    rows = np.repeat(np.arange(pattern.shape[0]), np.diff(pattern.indptr))
+    cols = pattern.indices
+    values = np.empty(pattern.nnz, dtype=np.result_type(left, right))
+
+    for start in range(0, pattern.nnz, chunk_size):
+        stop = start + chunk_size
+        values[start:stop] = np.einsum(
+            'ij,ij->i', left[rows[start:stop]], right[cols[start:stop]]
+        )
+
+    return pattern.__class__(
+        (values, pattern.indices.copy(), pattern.indptr.copy()),
+        shape=pattern.shape
+    )
+
+def einsum_grad(prev_adjoint, node):
+    """
+    computes the adjoint of each operand as an einsum of the output adjoint
+    with the other operands, labels that only the operand itself carries are
+    brought back by an all-ones operand
+    """
+    doperands = []
+
+    for i, operand in enumerate(node.operands):
+        subscripts = [node.output_subscript]
+        arrays = [prev_adjoint]
+        for j, other in enumerate(node.operands):
+            if j != i:
+                subscripts.append(node.input_subscripts[j])
+                arrays.append(other)
+
+        own_labels = node.input_subscripts[i]
+        missing = ''.join(l for l in own_labels if l not in ''.join(subscripts))
+        if len(missing) != 0:
+            subscripts.append(missing)
+            arrays.append(np.ones(
+                [operand.shape[own_labels.index(l)] for l in missing],
+                dtype=prev_adjoint.dtype
+            ))
+
+        doperand = cg.einsum(
+            "%s->%s" % (','.join(subscripts), own_labels), *arrays,
+            optimize=node.optimize
+        )
+
+        # sum over the axes the operand was broadcasted along
+        broadcasted = tuple(
+            axis for axis, size in enumerate(operand.shape)
+            if size == 1 and doperand.shape[axis] != 1
+        )
+        if len(broadcasted) != 0:
+            doperand = cg.sum(doperand, axis=broadcasted, keepdims=True)
+
+        doperands.append(doperand)
+
+    return doperands
+
+def where_grad(prev_adjoint, node):
+    # the masks have the result's shape, the broadcast operands' adjoints
+    # are summed back to their shapes after
+    doperand_a = np.broadcast_to(node.condition, node.shape).astype(node.dtype)
+    doperand_b = 1 - doperand_a
 
     return [prev_adjoint * doperand_a, prev_adjoint * doperand_b]
 
@@ -83,8 +216,19 @@ def cos_grad(prev_adjoint, node):
     return [-1 * prev_adjoint * cg.sin(node.operand_a), None]
 
 def softmax_cross_entropy_grad(prev_adjoint, node):
+    # the softmax is a node of the logits so the adjoint can be differentiated
+    # again, it's scaled by the labels size like the mean in the forward pass
+    labels = node.operand_b
+    return [
+        prev_adjoint * (
+            cg.softmax(node.operand_a, axis=-1) * cg.sum(labels, axis=-1, keepdims=True) - labels
+        ) / labels.size,
+        None
+    ]
+
+def softmax_grad(prev_adjoint, node):
     return [
-        prev_adjoint * (node.softmax_val - node.labels),
+        node * (prev_adjoint - cg.sum(prev_adjoint * node, axis=node.axis, keepdims=True)),
         None
     ]
 
@@ -100,7 +244,109 @@ def squeeze_grad(prev_adjoint, node):
         None
     ]
 
-def unbroadcast_adjoint(node, adjoint):
+def add_n_grad(prev_adjoint, node):
+    return [prev_adjoint] * len(node.operands)
+
+def concatenate_grad(prev_adjoint, node):
+    return cg.split(prev_adjoint, node.split_indices, axis=node.axis)
+
+def stack_grad(prev_adjoint, node):
+    sections = cg.split(prev_adjoint, len(node.operands), axis=node.axis)
+
+    return [
+        cg.reshape(section, operand.shape)
+        for section, operand in zip(sections, node.operands)
+    ]
+
+def split_grad(prev_adjoint, node):
+    operand = node.operand_a
+    axis = node.axis % operand.ndim
+
+    before_shape = list(operand.shape)
+    before_shape[axis] = node.start
+    after_shape = list(operand.shape)
+    after_shape[axis] = operand.shape[axis] - node.start - node.shape[axis]
+
+    return [
+        cg.concatenate([
+            np.zeros(before_shape, dtype=prev_adjoint.dtype),
+            prev_adjoint,
+            np.zeros(after_shape, dtype=prev_adjoint.dtype)
+        ], axis=axis),
+        None
+    ]
+
+def conv2d_grad(prev_adjoint, node):
+    array, filters = node.operands
+
+    return [
+        cg.conv2d_backprop_input(
+            prev_adjoint, filters, array.shape, node.stride, node.padding
+        ),
+        cg.conv2d_backprop_filter(
+            array, prev_adjoint, filters.shape[2:], node.stride, node.padding
+        )
+    ]
+
+def conv2d_backprop_input_grad(prev_adjoint, node):
+    adjoint, filters = node.operands
+
+    return [
+        cg.conv2d(prev_adjoint, filters, node.stride, node.padding),
+        cg.conv2d_backprop_filter(
+            prev_adjoint, adjoint, filters.shape[2:], node.stride, node.padding
+        )
+    ]
+
+def conv2d_backprop_filter_grad(prev_adjoint, node):
+    array, adjoint = node.operands
+
+    return [
+        cg.conv2d_backprop_input(
+            adjoint, prev_adjoint, array.shape, node.stride, node.padding
+        ),
+        cg.conv2d(array, prev_adjoint, node.stride, node.padding)
+    ]
+
+def max_pool2d_grad(prev_adjoint, node):
+    return [
+        cg.max_pool2d_backprop(
+            prev_adjoint, node.argmax, node.operand_a.shape,
+            node.kernel_size, node.stride, node.padding
+        ),
+        None
+    ]
+
+def max_pool2d_select_grad(prev_adjoint, node):
+    return max_pool2d_grad(prev_adjoint, node)
+
+def max_pool2d_backprop_grad(prev_adjoint, node):
+    return [
+        cg.max_pool2d_select(
+            prev_adjoint, node.argmax, node.kernel_size, node.stride, node.padding
+        ),
+        None
+    ]
+
+def avg_pool2d_grad(prev_adjoint, node):
+    return [
+        cg.avg_pool2d_backprop(
+            prev_adjoint, node.operand_a.shape,
+            node.kernel_size, node.stride, node.padding
+        ),
+        None
+    ]
+
+def avg_pool2d_backprop_grad(prev_adjoint, node):
+    return [
+        cg.avg_pool2d(prev_adjoint, node.kernel_size, node.stride, node.padding),
+        None
+    ]
+
+def cast_grad(prev_adjoint, node):
+    return [cg.cast(prev_adjoint, node.operand_a.dtype), None]
+
+def unbroadcast_adjoint(adjoint, broadcast):
     """
     puts the adjoint into the correct shape by summing over all the
     brodacsted dimensions. The underlying principle is notthing but
@@ -108,21 +354,19 @@ def unbroadcast_adjoint(node, adjoint):
 
     Parameters:
     ----------
-    node: Node
-        the node to check if its adjoint is broadcasted
     adjoint: ndarray
-        the the adjoint of the node that might need fixing
-    """
-    correct_adjoint = adjoint
-
-    if node.shape != adjoint.shape:
-        dimensions_diff = np.abs(adjoint.ndim - node.ndim)
-        if dimensions_diff != 0:
-            summation_dims = tuple(range(dimensions_diff))
-            correct_adjoint = cg.sum(adjoint, axis=summation_dims)
+        the the adjoint of an operand, in the shape of the op's result
+    broadcast: tuple
+        how the operand was broadcast, as recorded in the op's node
+        broadcast_axes when it was created
 
-            originally_ones = tuple([axis  for axis, size in enumerate(node.shape) if size == 1])
-            if len(originally_ones) != 0:
-                correct_adjoint = cg.sum(correct_adjoint, axis=axis, keepdims=True)
+    Returns: Node
+    """
+    axes, keepdims, shape = broadcast
+    correct_adjoint = cg.sum(adjoint, axis=axes, keepdims=keepdims)
+    if shape is not None:
+        correct_adjoint = cg.reshape(correct_adjoint, shape)
 
     return correct_adjoint
+
+attach_rules(globals(), '_grad', 'vjp')
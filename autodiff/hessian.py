@@ -0,0 +1,404 @@
+from collections import defaultdict
+import numpy as np
+import compgraph as cg
+from compgraph.nodes import *
+from autodiff.reverse import gradient
+import autodiff.jvps  # attaches the jvp rules to the built-in ops
+
+
+def jvp(outputs, tangents):
+    """
+    propagates a batch of tangents from the variables through the graphs of
+    the given outputs in forward mode, the graphs are evaluated already so
+    only the tangents are computed
+
+    Parameters:
+    ----------
+    outputs: list of Node
+        the nodes to compute their tangents
+    tangents: dict
+        the tangents of the variables by name, each of shape (K,) + the
+        variable's shape for a batch of K directions
+
+    Returns: list of ndarray | None
+        the tangent of each output, None if it doesn't depend on the variables
+    """
+    nodes = []
+    seen = set()
+    for output in outputs:
+        for node in topological_sort(output):
+            if id(node) not in seen:
+                seen.add(id(node))
+                nodes.append(node)
+
+    # count the consumers of each tangent so it's freed after its last use
+    consumers = defaultdict(int)
+    for node in nodes:
+        for operand in getattr(node, 'operands', ()):
+            consumers[id(operand)] += 1
+    for output in outputs:
+        consumers[id(output)] += 1
+
+    node_tangents = {}
+    for node in nodes:
+        if isinstance(node, (VariableNode, SparseVariableNode)):
+            tangent = tangents.get(node.name)
+            if tangent is not None and isinstance(node, SparseVariableNode):
+                raise NotImplementedError("tangents of sparse variables are not supported")
+        elif isinstance(node, OperationalNode):
+            operands_tangents = [node_tangents.get(id(operand)) for operand in node.operands]
+            tangent = None
+            if any(operand_tangent is not None for operand_tangent in operands_tangents):
+                rule = node.opdef.jvp
+                if rule is None:
+                    raise NotImplementedError("the op %s has no jvp registered" % node.opname)
+                tangent = rule(node, operands_tangents)
+
+            for operand in node.operands:
+                consumers[id(operand)] -= 1
+                if consumers[id(operand)] == 0:
+                    node_tangents.pop(id(operand), None)
+        else:
+            tangent = None
+
+        if tangent is not None:
+            batch_shape = tangent.shape[:1] + node.shape
+            if tangent.shape != batch_shape:
+                tangent = np.broadcast_to(tangent, batch_shape)
+            node_tangents[id(node)] = tangent
+
+    return [node_tangents.get(id(output)) for output in outputs]
+
+
+def _linearize(fn, x):
+    """
+    creates variables at the given point, builds the gradient graph of the
+    function there and returns the variables and their gradient nodes
+
+    Parameters:
+    ----------
+    fn: callable
+        a scalar function of one or more arrays, it takes the variable nodes
+        and returns a node
+    x: ndarray | list of ndarray
+        the point to linearize the gradient at
+
+    Returns: (list of VariableNode, list of Node | None, Boolean)
+        the variables, their gradients and whether x is a single array
+    """
+    single = not isinstance(x, (list, tuple))
+    xs = [x] if single else list(x)
+
+    variables = [cg.variable(value, '__hessian_x%d' % i) for i, value in enumerate(xs)]
+    output = fn(*variables)
+    if output.size != 1:
+        raise ValueError("the function must return a scalar, got shape %s" % (output.shape,))
+
+    grads = gradient(output)
+
+    return variables, [grads.get(variable.name) for variable in variables], single
+
+
+def _hvps(variables, grads, vectors):
+    """
+    computes a batch of Hessian-vector products by pushing the vectors as
+    tangents through the gradient graph
+
+    Parameters:
+    ----------
+    variables: list of VariableNode
+        the variables the gradient is taken wrt
+    grads: list of Node | None
+        the gradient of each variable
+    vectors: list of ndarray
+        a batch of vectors for each variable of shape (K,) + its shape
+
+    Returns: list of ndarray
+    """
+    tangents = {variable.name: vector for variable, vector in zip(variables, vectors)}
+    outputs = [grad for grad in grads if isinstance(grad, Node)]
+    products = iter(jvp(outputs, tangents))
+
+    batch = vectors[0].shape[0]
+    results = []
+    for variable, grad in zip(variables, grads):
+        product = next(products) if isinstance(grad, Node) else None
+        if product is None:
+            product = np.zeros((batch,) + variable.shape, dtype=variable.dtype)
+        results.append(np.asarray(product))
+
+    return results
+
+
+def hvp(fn, x, v, batched=False):
+    """
+    computes the product of the Hessian of fn at x with v in forward-over-
+    reverse mode: the gradient graph is built once by a reverse sweep, then v
+    is pushed through it as a tangent, so a product costs about two gradients
+    and a batch of products shares the reverse sweep
+
+    Parameters:
+    ----------
+    fn: callable
+        a scalar function of one or more arrays, it takes the variable nodes
+        and returns a node
+    x: ndarray | list of ndarray
+        the point to take the Hessian at, a list for a function of several
+        arrays
+    v: ndarray | list of ndarray
+        the vector to multiply, with the structure of x
+    batched: Boolean
+        a flag indicating that v holds a batch of vectors along a leading
+        axis, the products are then returned along the same axis
+
+    Returns: ndarray | list of ndarray
+        the product with the structure of x
+    """
+    variables, grads, single = _linearize(fn, x)
+
+    vectors = [v] if single else list(v)
+    vectors = [
+        np.asarray(vector, dtype=variable.dtype).reshape(
+            ((-1,) if batched else (1,)) + variable.shape
+        )
+        for variable, vector in zip(variables, vectors)
+    ]
+
+    products = _hvps(variables, grads, vectors)
+    if not batched:
+        products = [product[0] for product in products]
+
+    return products[0] if single else products
+
+
+def hessian(fn, x, chunk_size=None):
+    """
+    computes the Hessian of fn at x from batches of Hessian-vector products
+    with the standard basis, meant for small problems since it's dense
+
+    Parameters:
+    ----------
+    fn: callable
+        a scalar function of one or more arrays, it takes the variable nodes
+        and returns a node
+    x: ndarray | list of ndarray
+        the point to take the Hessian at, a list for a function of several
+        arrays
+    chunk_size: int
+        the number of basis vectors pushed through the gradient graph at once,
+        all of them by default, smaller chunks bound the memory used
+
+    Returns: ndarray | list of list of ndarray
+        the Hessian of shape x.shape + x.shape, or for several arrays the
+        block H[i][j] of shape x[i].shape + x[j].shape
+    """
+    variables, grads, single = _linearize(fn, x)
+
+    sizes = [variable.size for variable in variables]
+    offsets = np.cumsum([0] + sizes)
+    total = offsets[-1]
+    chunk_size = chunk_size or total
+    dtype = get_default_dtype()
+
+    rows = np.empty((total, total), dtype=dtype)
+    for start in range(0, total, chunk_size):
+        stop = min(start + chunk_size, total)
+        basis = np.zeros((stop - start, total), dtype=dtype)
+        basis[np.arange(stop - start), np.arange(start, stop)] = 1
+
+        vectors = [
+            basis[:, offsets[i]:offsets[i + 1]].reshape((-1,) + variable.shape)
+            for i, variable in enumerate(variables)
+        ]
+        products = _hvps(variables, grads, vectors)
+        rows[start:stop] = np.concatenate(
+            [product.reshape(stop - start, -1) for product in products], axis=1
+        )
+
+    # the Hessian is symmetric so the rows of products are its rows too
+    blocks = [
+        [
+            rows[offsets[i]:offsets[i + 1], offsets[j]:offsets[j + 1]].reshape(
+                variables[i].shape + variables[j].shape
+            )
+            for j in range(len(variables))
+        ]
+        for i in range(len(variables))
+    ]
+
+    return blocks[0][0] if single else blocks
+
+
+class HessianEstimate:
+
+    def __init__(self, mean, variance, samples):
+        """
+        holds a stochastic estimate along with the variance of the estimate,
+        i.e. the sample variance of the per-probe estimates over the number
+        of probes
+
+        Parameters:
+        ----------
+        mean: ndarray | list of ndarray | float
+            the estimate
+        variance: ndarray | list of ndarray | float
+            the variance of the estimate with the structure of mean
+        samples: int
+            the number of probes the estimate is averaged over
+        """
+        self.mean = mean
+        self.variance = variance
+        self.samples = samples
+
+    @property
+    def std_error(self):
+        """
+        the standard error of the estimate with the structure of mean
+        """
+        if isinstance(self.variance, list):
+            return [np.sqrt(variance) for variance in self.variance]
+
+        return np.sqrt(self.variance)
+
+    def __repr__(self):
+        if isinstance(self.mean, list):
+            mean = np.concatenate([np.ravel(mean) for mean in self.mean])
+            std_error = np.concatenate([np.ravel(error) for error in self.std_error])
+        else:
+            mean, std_error = np.ravel(self.mean), np.ravel(self.std_error)
+
+        if mean.size == 1:
+            return "HessianEstimate(%g +/- %g, samples=%d)" % (mean[0], std_error[0], self.samples)
+
+        return "HessianEstimate(%d entries, mean std error %g, max std error %g, samples=%d)" % (
+            mean.size, np.mean(std_error), np.max(std_error), self.samples
+        )
+
+
+def _hutchinson(variables, grads, samples, chunk_size, seed):
+    """
+    draws Rademacher probes z and yields the per-probe estimates z * Hz in
+    blocks of chunk_size probes, each block is one batched Hessian-vector
+    product pass through the gradient graph
+
+    Parameters:
+    ----------
+    variables: list of VariableNode
+        the variables the gradient is taken wrt
+    grads: list of Node | None
+        the gradient of each variable
+    samples: int
+        the number of probes
+    chunk_size: int
+        the number of probes in a block, all of them by default
+    seed: int | np.random.Generator
+        the seed of the probes
+
+    Yields: ndarray
+        the estimates of a block of shape (probes, total size of the
+        variables), flattened and concatenated over the variables
+    """
+    if samples < 2:
+        raise ValueError("at least 2 samples are needed to estimate the variance")
+
+    rng = np.random.default_rng(seed)
+    signs = np.array([-1, 1], dtype=get_default_dtype())
+    chunk_size = chunk_size or samples
+
+    for start in range(0, samples, chunk_size):
+        count = min(chunk_size, samples - start)
+        probes = [rng.choice(signs, size=(count,) + variable.shape) for variable in variables]
+        products = _hvps(variables, grads, probes)
+
+        yield np.concatenate([
+            (probe * product).reshape(count, -1) for probe, product in zip(probes, products)
+        ], axis=1)
+
+
+def hessian_diag(fn, x, samples=100, chunk_size=None, seed=None):
+    """
+    estimates the diagonal of the Hessian of fn at x with Hutchinson's
+    estimator E[z * Hz] over Rademacher probes z, each block of probes costs
+    one batched Hessian-vector product pass so the estimate costs about
+    2 * samples gradients however large x is
+
+    Parameters:
+    ----------
+    fn: callable
+        a scalar function of one or more arrays, it takes the variable nodes
+        and returns a node
+    x: ndarray | list of ndarray
+        the point to take the Hessian at, a list for a function of several
+        arrays
+    samples: int
+        the number of probes
+    chunk_size: int
+        the number of probes pushed through the gradient graph at once, all
+        of them by default, smaller chunks bound the memory used
+    seed: int | np.random.Generator
+        the seed of the probes
+
+    Returns: HessianEstimate
+        the diagonal with the structure of x and its variance
+    """
+    variables, grads, single = _linearize(fn, x)
+
+    # running sums so only a block of estimates is held at once
+    total = sum(variable.size for variable in variables)
+    sums = np.zeros(total, dtype=np.float64)
+    squares_sums = np.zeros(total, dtype=np.float64)
+    for estimates in _hutchinson(variables, grads, samples, chunk_size, seed):
+        sums += np.sum(estimates, axis=0)
+        squares_sums += np.sum(np.square(estimates, dtype=np.float64), axis=0)
+
+    mean = sums / samples
+    variance = np.maximum(squares_sums - samples * mean ** 2, 0) / (samples - 1) / samples
+
+    offsets = np.cumsum([0] + [variable.size for variable in variables])
+    means, variances = [
+        [
+            values[offsets[i]:offsets[i + 1]].reshape(variable.shape).astype(variable.dtype)
+            for i, variable in enumerate(variables)
+        ]
+        for values in (mean, variance)
+    ]
+
+    if single:
+        return HessianEstimate(means[0], variances[0], samples)
+
+    return HessianEstimate(means, variances, samples)
+
+
+def hessian_trace(fn, x, samples=100, chunk_size=None, seed=None):
+    """
+    estimates the trace of the Hessian of fn at x with Hutchinson's
+    estimator E[z . Hz] over Rademacher probes z, see hessian_diag
+
+    Parameters:
+    ----------
+    fn: callable
+        a scalar function of one or more arrays, it takes the variable nodes
+        and returns a node
+    x: ndarray | list of ndarray
+        the point to take the Hessian at, a list for a function of several
+        arrays
+    samples: int
+        the number of probes
+    chunk_size: int
+        the number of probes pushed through the gradient graph at once, all
+        of them by default, smaller chunks bound the memory used
+    seed: int | np.random.Generator
+        the seed of the probes
+
+    Returns: HessianEstimate
+        the trace and its variance
+    """
+    variables, grads, _ = _linearize(fn, x)
+    estimates = np.concatenate([
+        np.sum(block, axis=1, dtype=np.float64)
+        for block in _hutchinson(variables, grads, samples, chunk_size, seed)
+    ])
+
+    return HessianEstimate(
+        float(np.mean(estimates)), float(np.var(estimates, ddof=1) / samples), samples
+    )
@@ -0,0 +1,364 @@
+import functools
+import numpy as np
+from compgraph.nodes import SparseNode
+from compgraph.registry import attach_rules
+from compgraph.api import _im2col, _col2im
+
+# the forward mode rules of the ops, {opname}_jvp(node, tangents) takes the
+# tangents of the node's operands and returns the tangent of the node, a
+# tangent is a plain array with a leading axis over a batch of directions,
+# i.e. of shape (K,) + node.shape, and None stands for a zero tangent
+
+def _value(operand):
+    """
+    returns the value of an operand as a plain array or a sparse matrix
+    """
+    if isinstance(operand, SparseNode):
+        return operand.value
+
+    return np.asarray(operand)
+
+def _lift(tangent, ndim):
+    """
+    inserts unit axes after the batch axis so the tangent of a broadcasted
+    operand broadcasts against a result with ndim dimensions
+    """
+    if tangent is None or tangent.ndim - 1 == ndim:
+        return tangent
+
+    return tangent.reshape(
+        tangent.shape[:1] + (1,) * (ndim - tangent.ndim + 1) + tangent.shape[1:]
+    )
+
+def _total(*terms):
+    """
+    adds up the given tangent terms skipping the zero ones
+    """
+    terms = [term for term in terms if term is not None]
+    if len(terms) == 0:
+        return None
+
+    return functools.reduce(np.add, terms)
+
+def _axes(axis, ndim):
+    """
+    shifts the given reduction axes past the batch axis
+    """
+    if axis is None:
+        return tuple(range(1, ndim + 1))
+
+    return tuple(a % ndim + 1 for a in np.atleast_1d(axis))
+
+def _merge(tangent):
+    """
+    merges the batch axis of a NCHW tangent into its N axis
+    """
+    return tangent.reshape((-1,) + tangent.shape[2:])
+
+def add_jvp(node, tangents):
+    ta, tb = tangents
+    return _total(_lift(ta, node.ndim), _lift(tb, node.ndim))
+
+def sub_jvp(node, tangents):
+    ta, tb = tangents
+    return _total(_lift(ta, node.ndim), None if tb is None else -_lift(tb, node.ndim))
+
+def mul_jvp(node, tangents):
+    ta, tb = tangents
+    a, b = _value(node.operand_a), _value(node.operand_b)
+
+    return _total(
+        None if ta is None else _lift(ta, node.ndim) * b,
+        None if tb is None else a * _lift(tb, node.ndim)
+    )
+
+def div_jvp(node, tangents):
+    ta, tb = tangents
+    a, b = _value(node.operand_a), _value(node.operand_b)
+
+    return _total(
+        None if ta is None else _lift(ta, node.ndim) / b,
+        None if tb is None else -_lift(tb, node.ndim) * a / b ** 2
+    )
+
+def pow_jvp(node, tangents):
+    ta, tb = tangents
+    a, b = _value(node.operand_a), _value(node.operand_b)
+
+    return _total(
+        None if ta is None else _lift(ta, node.ndim) * b * a ** (b - 1),
+        None if tb is None else _lift(tb, node.ndim) * _value(node) * np.log(a)
+    )
+
+def transpose_jvp(node, tangents):
+    ta, = tangents
+    return ta.transpose((0,) + tuple(range(ta.ndim - 1, 0, -1)))
+
+def sum_jvp(node, tangents):
+    ta, = tangents
+    return np.sum(
+        ta, axis=_axes(getattr(node, 'axis', None), ta.ndim - 1),
+        keepdims=getattr(node, 'keepdims', False)
+    )
+
+def mean_jvp(node, tangents):
+    ta, = tangents
+    return np.mean(ta, axis=_axes(getattr(node, 'axis', None), ta.ndim - 1))
+
+def exp_jvp(node, tangents):
+    ta, = tangents
+    return ta * _value(node)
+
+def log_jvp(node, tangents):
+    ta, = tangents
+    return ta / _value(node.operand_a)
+
+def sin_jvp(node, tangents):
+    ta, = tangents
+    return ta * np.cos(_value(node.operand_a))
+
+def cos_jvp(node, tangents):
+    ta, = tangents
+    return -ta * np.sin(_value(node.operand_a))
+
+def max_jvp(node, tangents):
+    ta, = tangents
+    a = _value(node.operand_a)
+
+    # the tangent is averaged over the ties like the adjoint in max_grad
+    mask = (a == np.asarray(node.with_keepdims)).astype(ta.dtype)
+    mask /= np.sum(mask, axis=node.axis, keepdims=True)
+
+    return np.sum(ta * mask, axis=_axes(node.axis, a.ndim), keepdims=node.keepdims)
+
+def _sparse_left_dot(matrix, tangent):
+    """
+    computes matrix @ tangent for each direction of a dense tangent
+    """
+    moved = np.moveaxis(tangent, 0, -1)
+    product = matrix.dot(moved.reshape(moved.shape[0], -1))
+
+    return np.moveaxis(product.reshape((matrix.shape[0],) + moved.shape[1:]), -1, 0)
+
+def _sparse_right_dot(tangent, matrix):
+    """
+    computes tangent @ matrix for each direction of a dense tangent
+    """
+    rows = tangent.reshape(-1, matrix.shape[0])
+    product = matrix.T.dot(rows.T).T
+
+    return product.reshape(tangent.shape[:-1] + (matrix.shape[1],))
+
+def dot_jvp(node, tangents):
+    ta, tb = tangents
+    a, b = _value(node.operand_a), _value(node.operand_b)
+
+    if isinstance(node.operand_a, SparseNode):
+        return None if tb is None else _sparse_left_dot(a, tb)
+    if isinstance(node.operand_b, SparseNode):
+        return None if ta is None else _sparse_right_dot(ta, b)
+
+    if a.ndim == 0 or b.ndim == 0:
+        return mul_jvp(node, tangents)
+    if a.ndim > 2 or b.ndim > 2:
+        raise NotImplementedError("dot_jvp supports operands of up to 2 dimensions")
+
+    term_a = term_b = None
+    if ta is not None:
+        term_a = np.matmul(ta, b)
+    if tb is not None:
+        if b.ndim == 1:
+            term_b = np.matmul(a, tb[..., None])[..., 0]
+        else:
+            term_b = np.matmul(a, tb)
+
+    return _total(term_a, term_b)
+
+def einsum_jvp(node, tangents):
+    # a label that isn't used by the operands runs over the batch of directions
+    used = set(''.join(node.input_subscripts))
+    batch = next(l for l in 'zyxwvutsrqponmlkjihgfedcbaZYXWVUTSRQPONMLKJIHGFEDCBA' if l not in used)
+
+    values = [_value(operand) for operand in node.operands]
+    terms = []
+    for i, tangent in enumerate(tangents):
+        if tangent is None:
+            continue
+        subscripts = list(node.input_subscripts)
+        subscripts[i] = batch + subscripts[i]
+        arrays = values[:i] + [tangent] + values[i + 1:]
+        terms.append(np.einsum(
+            "%s->%s%s" % (','.join(subscripts), batch, node.output_subscript), *arrays,
+            optimize=node.optimize
+        ))
+
+    return _total(*terms)
+
+def where_jvp(node, tangents):
+    ta, tb = tangents
+    ta = 0. if ta is None else _lift(ta, node.ndim)
+    tb = 0. if tb is None else _lift(tb, node.ndim)
+
+    return np.where(node.condition, ta, tb)
+
+def softmax_jvp(node, tangents):
+    ta, = tangents
+    y = _value(node)
+    axis = _axes(node.axis, y.ndim)
+
+    return y * (ta - np.sum(ta * y, axis=axis, keepdims=True))
+
+def softmax_cross_entropy_jvp(node, tangents):
+    ta, tb = tangents
+    labels = _value(node.operand_b)
+    softmax_val = np.asarray(node.softmax_val)
+
+    # the derivatives of -mean(labels * log(softmax(logits))) wrt the logits and the labels
+    tangent = 0
+    if ta is not None:
+        dlogits = (softmax_val * np.sum(labels, axis=-1, keepdims=True) - labels) / labels.size
+        tangent = tangent + np.sum(ta * dlogits, axis=tuple(range(1, ta.ndim)))
+    if tb is not None:
+        dlabels = -np.log(softmax_val + 1e-7) / labels.size
+        tangent = tangent + np.sum(tb * dlabels, axis=tuple(range(1, tb.ndim)))
+
+    return tangent
+
+def reshape_jvp(node, tangents):
+    ta, = tangents
+    return ta.reshape(ta.shape[:1] + node.shape)
+
+def squeeze_jvp(node, tangents):
+    return reshape_jvp(node, tangents)
+
+def cast_jvp(node, tangents):
+    ta, = tangents
+    return ta.astype(node.dtype)
+
+def add_n_jvp(node, tangents):
+    return _total(*[_lift(tangent, node.ndim) for tangent in tangents])
+
+def _dense_tangents(node, tangents):
+    """
+    replaces the zero tangents of the node's operands by arrays of zeros
+    """
+    batch = next(tangent.shape[0] for tangent in tangents if tangent is not None)
+
+    return [
+        np.zeros((batch,) + operand.shape, dtype=node.dtype) if tangent is None else tangent
+        for operand, tangent in zip(node.operands, tangents)
+    ]
+
+def concatenate_jvp(node, tangents):
+    return np.concatenate(_dense_tangents(node, tangents), axis=node.axis % node.ndim + 1)
+
+def stack_jvp(node, tangents):
+    return np.stack(_dense_tangents(node, tangents), axis=node.axis % node.ndim + 1)
+
+def split_jvp(node, tangents):
+    ta, = tangents
+    axis = node.axis % node.ndim + 1
+    index = [slice(None)] * ta.ndim
+    index[axis] = slice(node.start, node.start + node.shape[axis - 1])
+
+    return ta[tuple(index)]
+
+def conv2d_jvp(node, tangents):
+    ta, tw = tangents
+    array, filters = _value(node.operand_a), _value(node.operand_b)
+    terms = []
+
+    if ta is not None:
+        columns = _im2col(_merge(ta), filters.shape[2:], node.stride, node.padding)
+        term = np.tensordot(columns, filters, axes=([1, 4, 5], [1, 2, 3]))
+        terms.append(np.transpose(term, (0, 3, 1, 2)).reshape(ta.shape[:1] + node.shape))
+    if tw is not None:
+        columns = _im2col(array, filters.shape[2:], node.stride, node.padding)
+        term = np.tensordot(columns, tw, axes=([1, 4, 5], [2, 3, 4]))
+        terms.append(np.transpose(term, (3, 0, 4, 1, 2)))
+
+    return _total(*terms)
+
+def conv2d_backprop_input_jvp(node, tangents):
+    tadj, tw = tangents
+    adjoint, filters = _value(node.operand_a), _value(node.operand_b)
+    terms = []
+
+    if tadj is not None:
+        columns = np.tensordot(_merge(tadj), filters, axes=([1], [0]))
+        columns = np.transpose(columns, (0, 3, 1, 2, 4, 5))
+        term = _col2im(columns, columns.shape[:1] + node.shape[1:], node.stride, node.padding)
+        terms.append(term.reshape(tadj.shape[:1] + node.shape))
+    if tw is not None:
+        columns = np.tensordot(adjoint, tw, axes=([1], [1]))
+        columns = _merge(np.transpose(columns, (3, 0, 4, 1, 2, 5, 6)))
+        term = _col2im(columns, columns.shape[:1] + node.shape[1:], node.stride, node.padding)
+        terms.append(term.reshape(tw.shape[:1] + node.shape))
+
+    return _total(*terms)
+
+def conv2d_backprop_filter_jvp(node, tangents):
+    ta, tadj = tangents
+    array, adjoint = _value(node.operand_a), _value(node.operand_b)
+    kernel_size = node.shape[2:]
+    terms = []
+
+    if ta is not None:
+        columns = _im2col(_merge(ta), kernel_size, node.stride, node.padding)
+        columns = columns.reshape(ta.shape[:2] + columns.shape[1:])
+        term = np.tensordot(adjoint, columns, axes=([0, 2, 3], [1, 3, 4]))
+        terms.append(np.transpose(term, (1, 0, 2, 3, 4)))
+    if tadj is not None:
+        columns = _im2col(array, kernel_size, node.stride, node.padding)
+        terms.append(np.tensordot(tadj, columns, axes=([1, 3, 4], [0, 2, 3])))
+
+    return _total(*terms)
+
+def _select(tangent, node):
+    """
+    selects the window elements given by the node's argmax from each
+    direction of a NCHW tangent
+    """
+    windows = _im2col(_merge(tangent), node.kernel_size, node.stride, node.padding)
+    windows = windows.reshape(tangent.shape[:1] + node.argmax.shape + (-1,))
+
+    return np.take_along_axis(windows, node.argmax[None, ..., None], axis=-1)[..., 0]
+
+def max_pool2d_jvp(node, tangents):
+    ta, = tangents
+    return _select(ta, node)
+
+def max_pool2d_select_jvp(node, tangents):
+    return max_pool2d_jvp(node, tangents)
+
+def max_pool2d_backprop_jvp(node, tangents):
+    tadj, = tangents
+    size = node.kernel_size[0] * node.kernel_size[1]
+
+    columns = np.zeros(tadj.shape + (size,), dtype=tadj.dtype)
+    indices = np.broadcast_to(node.argmax[None, ..., None], tadj.shape + (1,))
+    np.put_along_axis(columns, indices, tadj[..., None], axis=-1)
+    columns = _merge(columns.reshape(tadj.shape + tuple(node.kernel_size)))
+    term = _col2im(columns, columns.shape[:1] + node.shape[1:], node.stride, node.padding)
+
+    return term.reshape(tadj.shape[:1] + node.shape)
+
+def avg_pool2d_jvp(node, tangents):
+    ta, = tangents
+    windows = _im2col(_merge(ta), node.kernel_size, node.stride, node.padding)
+
+    return np.mean(windows, axis=(4, 5)).reshape(ta.shape[:1] + node.shape)
+
+def avg_pool2d_backprop_jvp(node, tangents):
+    tadj, = tangents
+    kernel_h, kernel_w = node.kernel_size
+
+    columns = np.broadcast_to(
+        _merge(tadj)[..., None, None] / (kernel_h * kernel_w),
+        (tadj.shape[0] * tadj.shape[1],) + tadj.shape[2:] + (kernel_h, kernel_w)
+    )
+    term = _col2im(columns, columns.shape[:1] + node.shape[1:], node.stride, node.padding)
+
+    return term.reshape(tadj.shape[:1] + node.shape)
+
+attach_rules(globals(), '_jvp', 'jvp')
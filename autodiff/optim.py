@@ -0,0 +1,225 @@
+import numpy as np
+from compgraph.nodes import *
+
+
+class Optimizer:
+
+    def __init__(self, params, learning_rate):
+        """
+        creates an optimizer that updates the buffers of the given variable
+        nodes in place using the result of reverse.gradient
+
+        Parameters:
+        ----------
+        params: iterable of VariableNode | SparseVariableNode
+            the variables to optimize
+        learning_rate: float
+            the step size of the updates
+        """
+        self.params = {}
+        self.buffers = {}
+        self.learning_rate = learning_rate
+        self.steps = 0
+
+        for param in params:
+            if isinstance(param, VariableNode):
+                buffer = param.view(np.ndarray)
+            elif isinstance(param, SparseVariableNode):
+                # the sparsity pattern is fixed so only the data is updated
+                buffer = param.value.data
+            else:
+                raise TypeError("can only optimize variable nodes, got %s" % type(param).__name__)
+
+            self.params[param.name] = param
+            self.buffers[param.name] = buffer
+
+        self.scratch = self._state_like()
+
+    def _state_like(self):
+        """
+        preallocates an array for each parameter to hold optimizer's state
+
+        Returns: dict
+        """
+        return {name: np.zeros_like(buffer) for name, buffer in self.buffers.items()}
+
+    def step(self, grads):
+        """
+        performs one update on each parameter that has a gradient
+
+        Parameters:
+        ----------
+        grads: dict
+            the gradients dictionary as returned by reverse.gradient
+        """
+        self.steps += 1
+
+        for name, buffer in self.buffers.items():
+            if name not in grads:
+                continue
+
+            grad = grads[name]
+            if is_sparse(grad):
+                grad = grad.data
+            else:
+                grad = np.asarray(grad)
+
+            if grad.shape != buffer.shape:
+                raise ValueError("gradient of %s has shape %s, expected %s" % (
+                    name, grad.shape, buffer.shape
+                ))
+
+            self._update(name, buffer, grad)
+
+    def _update(self, name, param, grad):
+        """
+        updates the parameter buffer in place given its gradient
+
+        Parameters:
+        ----------
+        name: String
+            the name of the parameter
+        param: ndarray
+            the parameter's buffer
+        grad: ndarray
+            the parameter's gradient
+        """
+        raise NotImplementedError()
+
+
+class SGD(Optimizer):
+
+    def _update(self, name, param, grad):
+        scratch = self.scratch[name]
+
+        np.multiply(grad, self.learning_rate, out=scratch)
+        np.subtract(param, scratch, out=param)
+
+
+class Momentum(Optimizer):
+
+    def __init__(self, params, learning_rate, momentum=0.9, nesterov=False):
+        """
+        creates a stochastic gradient descent optimizer with momentum
+
+        Parameters:
+        ----------
+        params: iterable of VariableNode | SparseVariableNode
+            the variables to optimize
+        learning_rate: float
+            the step size of the updates
+        momentum: float
+            the decay factor of the velocity
+        nesterov: Boolean
+            a flag to use Nesterov's accelerated gradient
+        """
+        super().__init__(params, learning_rate)
+        self.momentum = momentum
+        self.nesterov = nesterov
+        self.velocity = self._state_like()
+
+    def _update(self, name, param, grad):
+        velocity = self.velocity[name]
+        scratch = self.scratch[name]
+
+        np.multiply(velocity, self.momentum, out=velocity)
+        np.add(velocity, grad, out=velocity)
+
+        if self.nesterov:
+            np.multiply(velocity, self.momentum, out=scratch)
+            np.add(scratch, grad, out=scratch)
+        else:
+            np.copyto(scratch, velocity)
+
+        np.multiply(scratch, self.learning_rate, out=scratch)
+        np.subtract(param, scratch, out=param)
+
+
+class RMSProp(Optimizer):
+
+    def __init__(self, params, learning_rate=0.001, decay=0.9, epsilon=1e-8):
+        """
+        creates an RMSProp optimizer
+
+        Parameters:
+        ----------
+        params: iterable of VariableNode | SparseVariableNode
+            the variables to optimize
+        learning_rate: float
+            the step size of the updates
+        decay: float
+            the decay factor of the squared gradients average
+        epsilon: float
+            a small number for numerical stability
+        """
+        super().__init__(params, learning_rate)
+        self.decay = decay
+        self.epsilon = epsilon
+        self.square_avg = self._state_like()
+
+    def _update(self, name, param, grad):
+        square_avg = self.square_avg[name]
+        scratch = self.scratch[name]
+
+        np.multiply(grad, grad, out=scratch)
+        np.multiply(scratch, 1 - self.decay, out=scratch)
+        np.multiply(square_avg, self.decay, out=square_avg)
+        np.add(square_avg, scratch, out=square_avg)
+
+        np.sqrt(square_avg, out=scratch)
+        np.add(scratch, self.epsilon, out=scratch)
+        np.divide(grad, scratch, out=scratch)
+        np.multiply(scratch, self.learning_rate, out=scratch)
+        np.subtract(param, scratch, out=param)
+
+
+class Adam(Optimizer):
+
+    def __init__(self, params, learning_rate=0.001, beta1=0.9, beta2=0.999, epsilon=1e-8):
+        """
+        creates an Adam optimizer
+
+        Parameters:
+        ----------
+        params: iterable of VariableNode | SparseVariableNode
+            the variables to optimize
+        learning_rate: float
+            the step size of the updates
+        beta1: float
+            the decay factor of the gradients average
+        beta2: float
+            the decay factor of the squared gradients average
+        epsilon: float
+            a small number for numerical stability
+        """
+        super().__init__(params, learning_rate)
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.epsilon = epsilon
+        self.first_moment = self._state_like()
+        self.second_moment = self._state_like()
+
+    def _update(self, name, param, grad):
+        first_moment = self.first_moment[name]
+        second_moment = self.second_moment[name]
+        scratch = self.scratch[name]
+
+        np.multiply(first_moment, self.beta1, out=first_moment)
+        np.multiply(grad, 1 - self.beta1, out=scratch)
+        np.add(first_moment, scratch, out=first_moment)
+
+        np.multiply(second_moment, self.beta2, out=second_moment)
+        np.multiply(grad, grad, out=scratch)
+        np.multiply(scratch, 1 - self.beta2, out=scratch)
+        np.add(second_moment, scratch, out=second_moment)
+
+        # the bias corrections are folded into the step size and epsilon
+        correction1 = 1 - self.beta1 ** self.steps
+        correction2 = np.sqrt(1 - self.beta2 ** self.steps)
+        step_size = self.learning_rate * correction2 / correction1
+
+        np.sqrt(second_moment, out=scratch)
+        np.add(scratch, self.epsilon * correction2, out=scratch)
+        np.divide(first_moment, scratch, out=scratch)
+        np.multiply(scratch, step_size, out=scratch)
+        np.subtract(param, scratch, out=param)
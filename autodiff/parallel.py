@@ -0,0 +1,227 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import compgraph as cg
+from autodiff.reverse import gradient
+
+# the shared state of a worker process, set once by _init_worker
+_worker_state = {}
+
+
+def _attach(name):
+    """
+    attaches to an existing shared memory block, leaving its lifetime to
+    the process that created it
+
+    Parameters:
+    ----------
+    name: String
+        the name of the shared memory block
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # python < 3.13 has no track argument
+        return shared_memory.SharedMemory(name=name)
+
+
+def _shared_views(block, layout, offset=0):
+    """
+    creates an array view over the shared block for each parameter
+
+    Parameters:
+    ----------
+    block: SharedMemory
+        the shared memory block holding the arrays
+    layout: list
+        (name, shape, dtype, offset) for each array in the block
+    offset: int
+        an extra byte offset added to each array's offset
+    """
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset + array_offset)
+        for name, shape, dtype, array_offset in layout
+    }
+
+
+def _init_worker(loss_fn, layout, params_block_name, grads_block_name, row_bytes, dtype_policy):
+    """
+    attaches a worker process to the shared parameters and gradients, the
+    variable nodes are created once over the shared parameters buffers so
+    every step sees the latest values without any copy
+    """
+    # the parent's policy keeps the variables from being cast into copies
+    cg.set_default_dtype(*dtype_policy)
+
+    params_block = _attach(params_block_name)
+    grads_block = _attach(grads_block_name)
+
+    _worker_state['loss_fn'] = loss_fn
+    _worker_state['layout'] = layout
+    _worker_state['params_block'] = params_block
+    _worker_state['grads_block'] = grads_block
+    _worker_state['row_bytes'] = row_bytes
+    _worker_state['variables'] = {
+        name: cg.variable(view, name)
+        for name, view in _shared_views(params_block, layout).items()
+    }
+
+
+def _worker_step(task):
+    """
+    computes the gradient of the loss on a shard and writes it in the row of
+    the gradients block that belongs to the shard
+
+    Parameters:
+    ----------
+    task: (int, tuple of ndarray)
+        the shard's rank and its arrays
+    """
+    rank, shard = task
+    layout = _worker_state['layout']
+
+    loss = _worker_state['loss_fn'](_worker_state['variables'], *shard)
+    grads = gradient(loss)
+
+    rows = _shared_views(
+        _worker_state['grads_block'], layout, rank * _worker_state['row_bytes']
+    )
+    for name, row in rows.items():
+        if name in grads:
+            np.copyto(row, np.asarray(grads[name]), casting='same_kind')
+        else:
+            row.fill(0)
+
+    return float(loss)
+
+
+class DataParallel:
+
+    def __init__(self, loss_fn, params, workers=None, reduction='mean', context=None):
+        """
+        creates a pool of worker processes that compute the gradient of a loss
+        over shards of a batch, the parameters and the gradients are exchanged
+        through shared memory instead of being pickled
+
+        Parameters:
+        ----------
+        loss_fn: callable
+            builds the loss graph, takes a dict of the variable nodes by name
+            followed by the shard arrays and returns a scalar node, it must be
+            picklable when the context doesn't fork
+        params: dict
+            the initial value of each parameter by name
+        workers: int
+            the number of worker processes, defaults to the number of CPUs
+        reduction: String
+            'mean' to average the shards losses and gradients weighted by
+            their sizes for losses averaged over the examples, 'sum' to add
+            them up for losses summed over the examples
+        context: String
+            the multiprocessing start method, defaults to the platform's
+        """
+        if reduction not in ('mean', 'sum'):
+            raise ValueError("reduction must be 'mean' or 'sum', got %s" % reduction)
+
+        self.workers = workers or mp.cpu_count()
+        self.reduction = reduction
+
+        # lay the parameters out in a single block, each aligned to 64 bytes
+        self.layout = []
+        row_bytes = 0
+        for name, value in params.items():
+            value = np.asarray(value, dtype=cg.get_default_dtype())
+            self.layout.append((name, value.shape, value.dtype, row_bytes))
+            row_bytes += -(-value.nbytes // 64) * 64
+        self.row_bytes = max(row_bytes, 64)
+
+        self.params_block = shared_memory.SharedMemory(create=True, size=self.row_bytes)
+        self.grads_block = shared_memory.SharedMemory(create=True, size=self.row_bytes * self.workers)
+
+        self.params = _shared_views(self.params_block, self.layout)
+        for name, value in params.items():
+            np.copyto(self.params[name], value, casting='same_kind')
+
+        # the per worker gradients of each parameter as a (workers, *shape) view
+        self.grads_rows = {
+            name: np.ndarray(
+                (self.workers,) + shape, dtype=dtype, buffer=self.grads_block.buf,
+                offset=offset, strides=(self.row_bytes,) + np.empty(shape, dtype).strides
+            )
+            for name, shape, dtype, offset in self.layout
+        }
+        self.grads = {name: np.zeros_like(value) for name, value in self.params.items()}
+
+        self.pool = mp.get_context(context).Pool(
+            self.workers, initializer=_init_worker,
+            initargs=(
+                loss_fn, self.layout, self.params_block.name,
+                self.grads_block.name, self.row_bytes,
+                (cg.get_default_dtype(), cg.is_mixed_precision())
+            )
+        )
+
+    def variables(self):
+        """
+        returns variable nodes over the shared parameters, updating them in
+        place, e.g. with autodiff.optim, updates the workers' parameters
+
+        Returns: dict
+        """
+        return {name: cg.variable(value, name) for name, value in self.params.items()}
+
+    def gradient(self, *batch):
+        """
+        splits the batch over the workers, computes the gradient on each
+        shard and reduces the shards losses and gradients by the reduction
+
+        Parameters:
+        ----------
+        batch: ndarray
+            the batch arrays, split along their first axis
+
+        Returns: (float, dict)
+            the batch loss and the gradients by name, the gradient arrays are
+            reused by the next call
+        """
+        shards = list(zip(*[np.array_split(array, self.workers) for array in batch]))
+        tasks = [(rank, shard) for rank, shard in enumerate(shards) if len(shard[0]) != 0]
+
+        losses = self.pool.map(_worker_step, tasks, chunksize=1)
+
+        # the loss and the gradients are reduced alike, the mean weights the
+        # shards by their sizes while the sum takes each of them once
+        weights = np.zeros(self.workers)
+        for rank, shard in tasks:
+            weights[rank] = len(shard[0])
+        if self.reduction == 'mean':
+            weights /= weights.sum()
+        else:
+            weights = (weights != 0).astype(weights.dtype)
+        loss = float(np.dot(weights[[rank for rank, _ in tasks]], losses))
+
+        for name, rows in self.grads_rows.items():
+            np.einsum('w,w...->...', weights, rows, out=self.grads[name])
+
+        return loss, self.grads
+
+    def close(self):
+        """
+        stops the workers and releases the shared memory
+        """
+        self.pool.terminate()
+        self.pool.join()
+
+        self.params = self.grads_rows = None
+        for block in (self.params_block, self.grads_block):
+            block.unlink()
+            try:
+                block.close()
+            except BufferError:
+                # variable nodes still refer to the block, it's freed with them
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,58 +1,236 @@
-from collections import defaultdict
+import contextvars
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from compgraph.nodes import *
-from autodiff.visualize import visualize_AD
+from compgraph import profiler
 import numpy as np
+import compgraph as cg
 import autodiff.grads as grads
 
-def gradient(node):
+def _backward_step(current_node, contributions, mixed_precision, accumulator_dtype):
+    """
+    sums the adjoint contributions a node received from its consumers and
+    runs its gradient rule, returning the contributions to its operands
+
+    Parameters:
+    ----------
+    current_node: OperationalNode
+        the node to propagate its adjoint
+    contributions: list
+        the (order key, adjoint) contributions to the node's adjoint
+    mixed_precision: Boolean
+        a flag to run the rule in the node's dtype and accumulate in float64
+    accumulator_dtype: np.dtype
+        the dtype the adjoints are accumulated in
+
+    Returns: list of Node | None
+    """
+    current_adjoint = _accumulate(contributions)
+    if current_adjoint is None:
+        return [None] * len(current_node.operands)
+
+    if mixed_precision and current_adjoint.dtype != current_node.dtype:
+        current_adjoint = cg.cast(current_adjoint, current_node.dtype)
+
+    op_grad = current_node.opdef.vjp
+    if op_grad is None:
+        raise NotImplementedError("the op %s has no vjp registered" % current_node.opname)
+    next_adjoints = op_grad(current_adjoint, current_node)
+
+    # the axes the operands were broadcast along are recorded by the op
+    broadcast_axes = getattr(current_node, 'broadcast_axes', None)
+
+    operands_adjoints = []
+    for i, (operand, next_adjoint) in enumerate(zip(current_node.operands, next_adjoints)):
+        if next_adjoint is not None:
+            if mixed_precision and isinstance(next_adjoint, Node) and next_adjoint.dtype != accumulator_dtype:
+                next_adjoint = cg.cast(next_adjoint, accumulator_dtype)
+            if broadcast_axes is not None and broadcast_axes[i] is not None:
+                next_adjoint = grads.unbroadcast_adjoint(next_adjoint, broadcast_axes[i])
+
+        operands_adjoints.append(next_adjoint)
+
+    return operands_adjoints
+
+
+def _accumulate(contributions):
+    """
+    adds up the adjoint contributions in the order of their keys, so the
+    result doesn't depend on the order they were computed in
+
+    Parameters:
+    ----------
+    contributions: list
+        the (order key, adjoint) contributions
+
+    Returns: Node | None
+    """
+    contributions = sorted(
+        (contribution for contribution in contributions if contribution[1] is not None),
+        key=lambda contribution: contribution[0]
+    )
+    if len(contributions) == 0:
+        return None
+
+    total = contributions[0][1]
+    for _, contribution in contributions[1:]:
+        total = total + contribution
+
+    return total
+
+
+def _release(node):
+    """
+    drops the links of an operational node to its operands and the values it
+    saved for its gradient, keeping only its own value, name and op
+
+    Parameters:
+    ----------
+    node: OperationalNode
+        the node to release
+    """
+    for key in list(node.__dict__):
+        if key not in ('name', 'opname', 'opdef'):
+            del node.__dict__[key]
+    node.operands = ()
+
+
+def _detach(adjoint, graph):
+    """
+    cuts an adjoint from the nodes its gradient rule created it from, so
+    holding the adjoint doesn't keep them alive
+
+    Parameters:
+    ----------
+    adjoint: Node | None
+        the adjoint to detach
+    graph: set
+        the ids of the forward graph's nodes, which are left untouched
+
+    Returns: Node | None
+    """
+    if isinstance(adjoint, OperationalNode) and id(adjoint) not in graph:
+        _release(adjoint)
+
+    return adjoint
+
+
+def gradient(node, workers=None, retain_graph=True):
     """
     computes and returns the gradient of the given node wrt to VariableNodes
-    the function implements a breadth-first-search (BFS) to traverse the
-    computational graph from the gievn node back to VariableNodes
+    the function sweeps the computational graph from the given node back to
+    VariableNodes, a node is processed once all of its consumers have passed
+    their adjoints to it
 
     Parameters:
     ----------
     node: Node
         the node to compute its gradient
+    workers: int
+        the number of threads to run the gradient rules of independent
+        branches on, the rules run in the calling thread if not given
+    retain_graph: Boolean
+        if False, each operational node is released once its adjoint is
+        propagated, dropping its operands and saved values so the forward
+        buffers are freed during the sweep, the gradients are then returned
+        as plain arrays and can't be differentiated again
     """
 
-    adjoint = defaultdict(int)
     grad = {}
-    queue = NodesQueue()
-
-    # put the given node in the queue and set its adjoint to one
-    adjoint[node.name] = ConstantNode.create_using(np.ones(node.shape))
-    queue.push(node)
-
-    while len(queue) > 0:
-        current_node = queue.pop()
-
-        if isinstance(current_node, ConstantNode):
-            continue
-        if isinstance(current_node, VariableNode):
-            grad[current_node.name] = adjoint[current_node.name]
-            continue
-
-        current_adjoint = adjoint[current_node.name]
-        current_op = current_node.opname
-
-        op_grad = getattr(grads, '{}_grad'.format(current_op))
-        next_adjoints = op_grad(current_adjoint, current_node)
-
-        adjoint[current_node.operand_a.name] = grads.unbroadcast_adjoint(
-            current_node.operand_a,
-            adjoint[current_node.operand_a.name] + next_adjoints[0]
-        )
-        if current_node.operand_a not in queue:
-            queue.push(current_node.operand_a)
-
-        if current_node.operand_b is not None:
-            adjoint[current_node.operand_b.name] = grads.unbroadcast_adjoint(
-                current_node.operand_b,
-                adjoint[current_node.operand_b.name] + next_adjoints[1]
+
+    # in mixed precision the adjoints are accumulated in float64 while each
+    # gradient rule runs in the dtype of the node it differentiates
+    mixed_precision = is_mixed_precision()
+    accumulator_dtype = get_accumulator_dtype()
+
+    # count the consumers each node waits for before its adjoint is complete
+    nodes = topological_sort(node)
+    rank = {id(n): i for i, n in enumerate(nodes)}
+    pending = defaultdict(int)
+    for n in nodes:
+        for operand in getattr(n, 'operands', ()):
+            pending[id(operand)] += 1
+
+    # only the ids are kept so the sweep doesn't hold the released nodes
+    graph = set(rank) if not retain_graph else None
+    del nodes
+
+    contributions = defaultdict(list)
+    seed = ConstantNode.create_using(np.ones(node.shape, dtype=node.dtype))
+    contributions[id(node)].append((0, seed))
+    ready = deque([node])
+
+    def release(current_node, operands_adjoints):
+        """
+        hands the adjoints of a processed node to its operands and queues
+        the operands whose adjoints are now complete
+        """
+        for i, (operand, next_adjoint) in enumerate(zip(current_node.operands, operands_adjoints)):
+            if not retain_graph:
+                next_adjoint = _detach(next_adjoint, graph)
+            contributions[id(operand)].append(((rank[id(current_node)], i), next_adjoint))
+            pending[id(operand)] -= 1
+            if pending[id(operand)] == 0:
+                ready.append(operand)
+
+        if not retain_graph:
+            _release(current_node)
+
+    def is_leaf(current_node):
+        """
+        handles the end of a path, returns True if the node is a leaf
+        """
+        if isinstance(current_node, (ConstantNode, SparseConstantNode)):
+            contributions.pop(id(current_node), None)
+            return True
+        if isinstance(current_node, (VariableNode, SparseVariableNode)):
+            adjoint = profiler.record(
+                'backward', 'accumulate', _accumulate, contributions.pop(id(current_node))
             )
-            if current_node.operand_b not in queue:
-                queue.push(current_node.operand_b)
+            if adjoint is not None:
+                if not retain_graph and isinstance(adjoint, Node):
+                    adjoint = _detach(adjoint, graph).view(np.ndarray)
+                grad[current_node.name] = adjoint
+            return True
+
+        return False
+
+    if workers is None or workers <= 1:
+        while len(ready) > 0:
+            current_node = ready.popleft()
+            if is_leaf(current_node):
+                continue
+
+            release(current_node, profiler.record(
+                'backward', current_node.opname + '_grad', _backward_step,
+                current_node, contributions.pop(id(current_node)),
+                mixed_precision, accumulator_dtype
+            ))
+
+        return grad
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while len(ready) > 0 or len(running) > 0:
+            while len(ready) > 0:
+                current_node = ready.popleft()
+                if is_leaf(current_node):
+                    continue
+
+                # the rules run in a copy of the caller's context so the nodes
+                # they create belong to the caller's graph
+                future = executor.submit(
+                    contextvars.copy_context().run,
+                    profiler.record, 'backward', current_node.opname + '_grad',
+                    _backward_step, current_node, contributions.pop(id(current_node)),
+                    mixed_precision, accumulator_dtype
+                )
+                running[future] = current_node
+
+            if len(running) > 0:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    release(running.pop(future), future.result())
 
     return grad
 
@@ -82,3 +260,13 @@ def check_gradient(fx, args, suspect):
         approx_grad.append((fx(*shifted_args) - fx(*args)) / h)
 
     return np.allclose(approx_grad, suspect)
+
+
+def __getattr__(name):
+    # the animation of the reverse AD needs matplotlib, it's imported on
+    # first use so computing gradients only imports numpy
+    if name in ('visualize_AD', 'save_AD_animation'):
+        import autodiff.visualize as visualize
+        return getattr(visualize, name)
+
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
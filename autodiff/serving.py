@@ -0,0 +1,271 @@
+import asyncio
+from collections import deque
+import numpy as np
+import compgraph as cg
+import autodiff.vmap as vmap
+
+
+class GradientServer:
+
+    def __init__(self, fn, params, max_batch_size=64, max_latency=0.005, executor=None):
+        """
+        creates a server answering prediction and gradient requests of single
+        examples in batches: the requests arriving within max_latency of the
+        first queued one, up to max_batch_size of them, are stacked and run
+        through a single vectorized forward and backward pass of the graph
+        of fn, see per_example_gradients. The graph is built once, on the
+        first batch, and the passes run in an executor so the event loop
+        keeps queueing requests meanwhile
+
+        Parameters:
+        ----------
+        fn: callable
+            the function of one example, it takes a dict of the variable nodes
+            by name followed by a constant node for each of the example's
+            arrays, it must return a scalar node to serve gradients
+        params: dict
+            the parameters by name, VariableNode or ndarray
+        max_batch_size: int
+            the largest number of requests run in one pass
+        max_latency: float
+            the longest time in seconds a request waits for others to join
+            its batch
+        executor: concurrent.futures.Executor
+            the executor running the passes, the event loop's default one
+            if None
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be positive, got %d" % max_batch_size)
+
+        self.fn = fn
+        self.params = params
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.executor = executor
+        self.stats = {'requests': 0, 'batches': 0}
+
+        self._graph = cg.Graph()
+        self._trace = None
+        self._signature = None
+        self._pending = deque()
+        self._waiter = None
+        self._wanted = 1
+        self._closing = False
+        self._task = None
+
+    async def start(self):
+        """
+        starts serving the requests on the running event loop
+        """
+        if self._task is not None:
+            raise RuntimeError("the server is already running")
+
+        self._closing = False
+        self._task = asyncio.get_running_loop().create_task(self._serve())
+
+    async def close(self):
+        """
+        stops the server once the queued requests are answered
+        """
+        if self._task is None:
+            return
+
+        self._closing = True
+        self._wake()
+        try:
+            await self._task
+        finally:
+            self._task = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+        return False
+
+    async def predict(self, *example):
+        """
+        returns the output of fn on the given example
+
+        Parameters:
+        ----------
+        example: ndarray
+            the arrays of the example, without a batch axis
+
+        Returns: ndarray
+        """
+        return await self._submit('predict', example)
+
+    async def gradient(self, *example):
+        """
+        returns the value of fn on the given example and its gradient
+
+        Parameters:
+        ----------
+        example: ndarray
+            the arrays of the example, without a batch axis
+
+        Returns: (ndarray, dict)
+            the scalar value and the gradients of the parameters by name
+        """
+        return await self._submit('gradient', example)
+
+    async def _submit(self, kind, example):
+        """
+        queues a request and waits for its result
+        """
+        if self._task is None or self._closing:
+            raise RuntimeError("the server isn't running")
+
+        example = tuple(np.asarray(array) for array in example)
+        signature = tuple((array.shape, array.dtype) for array in example)
+        if self._signature is None:
+            self._signature = signature
+        elif signature != self._signature:
+            # the graph is built for the shapes and dtypes of the first example
+            raise ValueError("expected examples of (shape, dtype) %s, got %s" % (self._signature, signature))
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((kind, example, future))
+        self._wake()
+
+        return await future
+
+    def _wake(self):
+        """
+        wakes the serving task up if enough requests are pending or the
+        server is closing
+        """
+        if self._waiter is not None and not self._waiter.done():
+            if self._closing or len(self._pending) >= self._wanted:
+                self._waiter.set_result(None)
+
+    async def _wait(self, count, timeout=None):
+        """
+        waits until count requests are pending, the timeout passes or the
+        server is closing
+
+        Parameters:
+        ----------
+        count: int
+            the number of pending requests to wait for
+        timeout: float
+            the longest time to wait in seconds, None waits indefinitely
+        """
+        if self._closing or len(self._pending) >= count:
+            return
+
+        self._wanted = count
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait([self._waiter], timeout=timeout)
+        finally:
+            self._waiter = None
+
+    async def _serve(self):
+        """
+        collects the pending requests into batches and runs them, a batch
+        is formed when it's full or its first request waited max_latency
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            await self._wait(1)
+            if len(self._pending) == 0:
+                break
+
+            deadline = loop.time() + self.max_latency
+            await self._wait(self.max_batch_size, deadline - loop.time())
+
+            size = min(len(self._pending), self.max_batch_size)
+            requests = [self._pending.popleft() for _ in range(size)]
+            for kind in ('predict', 'gradient'):
+                batch = [request for request in requests if request[0] == kind and not request[2].done()]
+                if len(batch) != 0:
+                    await self._dispatch(loop, kind, batch)
+
+    async def _dispatch(self, loop, kind, requests):
+        """
+        runs a batch of requests of the same kind in the executor and hands
+        each result, or the error of the batch, back to its caller
+        """
+        arrays = [
+            np.stack([example[i] for _, example, _ in requests])
+            for i in range(len(requests[0][1]))
+        ]
+        try:
+            results = await loop.run_in_executor(self.executor, self._run, kind, arrays)
+        except Exception as error:
+            for _, _, future in requests:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        self.stats['requests'] += len(requests)
+        self.stats['batches'] += 1
+        for (_, _, future), result in zip(requests, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _run(self, kind, arrays):
+        """
+        runs the forward pass, and the backward pass for gradient requests,
+        on a batch of examples, this runs in the executor
+
+        Returns: list
+            the result of each example
+        """
+        # the nodes are named in the server's own graph, apart from the
+        # graphs built in other threads
+        with self._graph:
+            batch, batch_size = vmap._check_batch(arrays)
+            if self._trace is None:
+                self._trace = vmap._trace(self.fn, self.params, [array[0] for array in batch])
+
+            outputs, values = vmap._forward(self._trace, batch, batch_size)
+            if kind == 'predict':
+                return list(outputs)
+
+            if self._trace['output'].size != 1:
+                raise ValueError("gradients need a scalar function, got shape %s" % (self._trace['output'].shape,))
+            gradients = vmap._backward(self._trace, values, batch_size)
+            losses = outputs.reshape(batch_size)
+
+            return [
+                (losses[i], {name: gradient[i] for name, gradient in gradients.items()})
+                for i in range(batch_size)
+            ]
+
+
+class LocalClient:
+
+    def __init__(self, server, loop):
+        """
+        creates a blocking client of a server running on an event loop in
+        another thread, e.g. for request handlers running in a thread pool
+
+        Parameters:
+        ----------
+        server: GradientServer
+            the running server
+        loop: asyncio.AbstractEventLoop
+            the event loop the server runs on
+        """
+        self.server = server
+        self.loop = loop
+
+    def predict(self, *example, timeout=None):
+        """
+        returns the output of the server's function on the given example,
+        see GradientServer.predict
+        """
+        return asyncio.run_coroutine_threadsafe(self.server.predict(*example), self.loop).result(timeout)
+
+    def gradient(self, *example, timeout=None):
+        """
+        returns the value and the gradient of the server's function on the
+        given example, see GradientServer.gradient
+        """
+        return asyncio.run_coroutine_threadsafe(self.server.gradient(*example), self.loop).result(timeout)
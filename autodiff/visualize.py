@@ -3,9 +3,8 @@ from matplotlib import animation, rc
 from matplotlib.lines import Line2D
 import matplotlib.gridspec as gridspec
 import networkx as nx
-from networkx.classes import graph
 from compgraph.nodes import *
-from collections import defaultdict
+from collections import defaultdict, deque
 import autodiff.grads as grads
 import numpy as np
 
@@ -23,7 +22,10 @@ def _sweep_graph(node):
     leafs_count = 0
     name_to_node = {}
     var_node_names = []
-    color_dict = {'VariableNode': 'lightblue', 'ConstantNode': 'orange'}
+    color_dict = {
+        'VariableNode': 'lightblue', 'ConstantNode': 'orange',
+        'SparseVariableNode': 'lightblue', 'SparseConstantNode': 'orange'
+    }
     color = lambda n: color_dict[n.__class__.__name__] if n.__class__.__name__ in color_dict else '#d5a6f9'
 
     queue = NodesQueue()
@@ -35,328 +37,432 @@ def _sweep_graph(node):
     while len(queue) > 0:
         current = queue.pop()
         name_to_node[current.name] = current
-        if isinstance(current, VariableNode) or isinstance(current, ConstantNode):
-            if isinstance(current, VariableNode):
+        if isinstance(current, (VariableNode, ConstantNode, SparseNode)):
+            if isinstance(current, (VariableNode, SparseVariableNode)):
                 var_node_names.append(current.name)
-            if current not in queue:
-                leafs_count += 1
+            leafs_count += 1
             continue
-        else:
 
-            previous_nodes = sorted(
-                filter(lambda n: n is not None, [current.operand_a, current.operand_b]),
-                key=lambda n: n.name
-            )
+        previous_nodes = sorted(current.operands, key=lambda n: n.name)
 
-            for prev_node in previous_nodes:
-                if prev_node is not None:
+        for prev_node in previous_nodes:
+            if prev_node is not None:
+                # each node is queued once, when it's first seen
+                if prev_node.name not in G:
                     G.add_node(prev_node.name, label=f"${prev_node.name}$", color=color(prev_node))
-                    G.add_edge(prev_node.name, current.name)
-
-                    if prev_node not in queue:
-                        queue.push(prev_node)
+                    queue.push(prev_node)
+                G.add_edge(prev_node.name, current.name)
 
     return G, leafs_count, var_node_names, name_to_node
 
 
-def visualize_AD(node, figsize=None):
+def _node_grad(node, index):
     """
-    craetes a matplotlib animation visualizing the reverse AD process on the
-    the computational graph of the given node
+    returns a string containing the local grad of a node
 
     Parameters:
     ----------
     node: Node
-        the node to visualize the reverse AD process on its computational graph
+        the node to print its local grad
+    index: int
+        the index of the operand to get the grad wrt
     """
 
-    nx_graph, leafs_count, var_names, name_to_node = _sweep_graph(node)
-    frames_count = len(nx_graph.edges()) + leafs_count
+    local_grad_txt = ""
 
-    edge_labels = {}
+    if node.opname == 'add':
+        local_grad_txt += "$%s = %s + %s \Rightarrow \\frac{\partial %s}{\partial %s} = 1$" % (
+            node.name, node.operand_a.name, node.operand_b.name, node.name,
+            node.operand_a.name if index == 0 else node.operand_b.name
+        )
+    elif node.opname == 'sub':
+        local_grad_txt += "$%s = %s - %s \Rightarrow \\frac{\partial %s}{\partial %s} = %s1$" % (
+            node.name, node.operand_a.name, node.operand_b.name, node.name,
+            node.operand_a.name if index == 0 else node.operand_b.name,
+            "" if index == 0 else "-"
+        )
+    elif node.opname == 'mul':
+        local_grad_txt += "$%s = %s \\times %s \Rightarrow \\frac{\partial %s}{\partial %s} = %s = %.4s$" % (
+            node.name, node.operand_a.name, node.operand_b.name, node.name,
+            node.operand_a.name if index == 0 else node.operand_b.name,
+            node.operand_b.name if index == 0 else node.operand_a.name,
+            node.operand_b if index == 0 else node.operand_a
+        )
+    elif node.opname == 'div':
+        local_grad_txt += "$%s = \\frac{%s}{%s} \Rightarrow \\frac{\partial %s}{\partial %s} =" % (
+            node.name, node.operand_a.name, node.operand_b.name, node.name,
+            node.operand_a.name if index == 0 else node.operand_b.name
+        )
+        if index == 0:
+            local_grad_txt += "\\frac{1}{%s} = %.4s$" % (node.operand_b.name, 1 / node.operand_b)
+        else:
+            local_grad_txt += "-\\frac{%s}{%s^2} = %.4s$" % (
+                node.operand_a.name, node.operand_b.name, -1 * node.operand_a / (node.operand_b **2)
+            )
+    elif node.opname == 'pow':
+        local_grad_txt += "$%s = %s^{%s} \Rightarrow \\frac{\partial %s}{\partial %s} =" % (
+            node.name, node.operand_a.name, node.operand_b.name, node.name,
+            node.operand_a.name if index == 0 else node.operand_b.name
+        )
+        if index == 0:
+            local_grad_txt += "%s \\times %s^{%s - 1} = %.4s$" % (
+                node.operand_b.name, node.operand_a.name, node.operand_b.name,
+                node.operand_b * (node.operand_a ** (node.operand_b - 1))
+            )
+        else:
+            local_grad_txt += "%s^{%s}\ln %s = %.4s$" % (
+                node.operand_a.name, node.operand_b.name, node.operand_a.name,
+                node * np.log(node.operand_a)
+            )
+    elif node.opname == 'sin':
+        local_grad_txt += "$%s = \sin(%s) \Rightarrow \\frac{\partial %s}{\partial %s} = \cos(%s) = %.4s$" % (
+            node.name, node.operand_a.name, node.name, node.operand_a.name, node.operand_a.name,
+            np.cos(node.operand_a)
+        )
+    elif node.opname == 'cos':
+        local_grad_txt += "$%s = \cos(%s) \Rightarrow \\frac{\partial %s}{\partial %s} = -\sin(%s) = %.4s$" % (
+            node.name, node.operand_a.name, node.name, node.operand_a.name, node.operand_a.name,
+            -1 * np.sin(node.operand_a)
+        )
+    elif node.opname == 'exp':
+        local_grad_txt += "$%s = \exp(%s) \Rightarrow \\frac{\partial %s}{\partial %s} = \exp(%s) = %.4s$" % (
+            node.name, node.operand_a.name, node.name, node.operand_a.name, node.operand_a.name,
+            node
+        )
+    elif node.opname == 'log':
+        local_grad_txt += "$%s = \ln(%s) \Rightarrow \\frac{\partial %s}{\partial %s} = \\frac{1}{%s} = %.4s$" % (
+            node.name, node.operand_a.name, node.name, node.operand_a.name, node.operand_a.name,
+            1. / node.operand_a
+        )
+    return local_grad_txt
 
-    # set the stage for the visualization
-    fig = plt.figure(figsize=figsize)
-    gs = gridspec.GridSpec(3, 1, hspace=0, wspace=0)
 
-    graph_ax = plt.subplot(gs[0:2, 0])
-    chain_ax = plt.subplot(gs[2:3, 0])
+def _chain_text(current, operand, index, current_adjoint, next_adjoint):
+    """
+    returns the text explaining the chain rule step along the edge between
+    the current node and one of its operands
+    """
+    if isinstance(operand, (ConstantNode, SparseConstantNode)) or next_adjoint is None:
+        return "Constant operand\nNo derivatives to propagate"
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        local_grad = next_adjoint / current_adjoint
+
+    chain_txt = _node_grad(current, index) + "\n"
+    chain_txt += "$\\frac{\partial f}{\partial %s} \/ += \/ \\frac{\partial f}{\partial %s}\\frac{\partial %s}{\partial %s} = %.4s\\times%.4s=%.4s$" % (
+            operand.name,
+            current.name,
+            current.name,
+            operand.name,
+            current_adjoint,
+            local_grad,
+            next_adjoint
+    )
 
-    chain_ax.axis("off")
-    chain_txt = chain_ax.text(0.2, 0.5, '', fontsize=25, va='center', fontfamily='serif')
+    return chain_txt
 
-    # set the necessary data strutures fro reverse AD
-    adjoint = defaultdict(int)
-    parameters_dict = {
-        'var_names': var_names,
-        'nx_graph': nx_graph,
-        'adjoint': defaultdict(int), # true if the next call of animate is handeling operand_b
-        'queue': NodesQueue(),
-        'current_node': None,
-        'other_operand': False,
-        'grads_annotations': {}
-    }
-    parameters_dict['adjoint'][node.name] = ConstantNode.create_using(np.ones(node.shape))
-    parameters_dict['queue'].push(node)
 
-    def node_grad(node, index):
-        """
-        returns a string containing the local grad of a node
-
-        Parameters:
-        ----------
-        node: Node
-            the node to print its local grad
-        index: int
-            the index of the operand to get the grad wrt
-        """
+def _grad_text(name, adjoint):
+    """
+    returns the annotation text of the derivative of f wrt a variable
+    """
+    return "$\\frac{\partial f}{\partial %s} = %.4s$" % (name, adjoint)
 
-        local_grad_txt = ""
 
-        if node.opname == 'add':
-            local_grad_txt += "$%s = %s + %s \Rightarrow \\frac{\partial %s}{\partial %s} = 1$" % (
-                node.name, node.operand_a.name, node.operand_b.name, node.name,
-                node.operand_a.name if index == 0 else node.operand_b.name
-            )
-        elif node.opname == 'sub':
-            local_grad_txt += "$%s = %s - %s \Rightarrow \\frac{\partial %s}{\partial %s} = %s1$" % (
-                node.name, node.operand_a.name, node.operand_b.name, node.name,
-                node.operand_a.name if index == 0 else node.operand_b.name,
-                "" if indx == 0 else "-"
-            )
-        elif node.opname == 'mul':
-            local_grad_txt += "$%s = %s \\times %s \Rightarrow \\frac{\partial %s}{\partial %s} = %s = %.4s$" % (
-                node.name, node.operand_a.name, node.operand_b.name, node.name,
-                node.operand_a.name if index == 0 else node.operand_b.name,
-                node.operand_b.name if index == 0 else node.operand_a.name,
-                node.operand_b if index == 0 else node.operand_a
-            )
-        elif node.opname == 'div':
-            local_grad_txt += "$%s = \\frac{%s}{%s} \Rightarrow \\frac{\partial %s}{\partial %s} =" % (
-                node.name, node.operand_a.name, node.operand_b.name, node.name,
-                node.operand_a.name if index == 0 else node.operand_b.name
-            )
-            if index == 0:
-                local_grad_txt += "\\frac{1}{%s} = %.4s$" % (node.operand_b.name, 1 / node.operand_b)
-            else:
-                local_grad_txt += "-\\frac{%s}{%s^2} = %.4s$" % (
-                    node.operand_a.name, node.operand_b.name, -1 * node.operand_a / (node.operand_b **2)
-                )
-        elif node.opname == 'pow':
-            local_grad_txt += "$%s = %s^{%s} \Rightarrow \\frac{\partial %s}{\partial %s} =" % (
-                node.name, node.operand_a.name, node.operand_b.name, node.name,
-                node.operand_a.name if index == 0 else node.operand_b.name
-            )
-            if index == 0:
-                local_grad_txt += "%s \\times %s^{%s - 1} = %.4s$" % (
-                    node.operand_b.name, node.operand_a.name, node.operand_b.name,
-                    node.operand_b * (node.operand_a ** (node.operand_b - 1))
-                )
-            else:
-                local_grad_txt += "%s^{%s}\ln %s = %.4s$" % (
-                    node.operand_a.name, node.operand_b.name, node.operand_a.name,
-                    node * np.log(node.operand_a)
-                )
-        elif node.opname == 'sin':
-            local_grad_txt += "$%s = \sin(%s) \Rightarrow \\frac{\partial %s}{\partial %s} = \cos(%s) = %.4s$" % (
-                node.name, node.operand_a.name, node.name, node.operand_a.name, node.operand_a.name,
-                np.cos(node.operand_a)
-            )
-        elif node.opname == 'cos':
-            local_grad_txt += "$%s = \cos(%s) \Rightarrow \\frac{\partial %s}{\partial %s} = -\sin(%s) = %.4s$" % (
-                node.name, node.operand_a.name, node.name, node.operand_a.name, node.operand_a.name,
-                -1 * np.sin(node.operand_a)
-            )
-        elif node.opname == 'exp':
-            local_grad_txt += "$%s = \exp(%s) \Rightarrow \\frac{\partial %s}{\partial %s} = \exp(%s) = %.4s$" % (
-                node.name, node.operand_a.name, node.name, node.operand_a.name, node.operand_a.name,
-                node
-            )
-        elif node.opname == 'log':
-            local_grad_txt += "$%s = \ln(%s) \Rightarrow \\frac{\partial %s}{\partial %s} = \\frac{1}{%s} = %.4s$" % (
-                node.name, node.operand_a.name, node.name, node.operand_a.name, node.operand_a.name,
-                1. / node.operand_a
-            )
-        return local_grad_txt
+def _frames(node, name_to_node):
+    """
+    runs the reverse AD sweep the animation shows and records what changes in
+    each of its frames, a node is visited once all of its consumers passed
+    their adjoints to it, so each node gets its final adjoint before passing
+    it on
 
-    def process_edge(current, prev, indx, params):
-        """
-        performs the necessary processing for an edge between current and prev
-        nodes
-
-        Parameters:
-        ----------
-        current: Node
-            the current node passinf it's adjoint
-        prev: Node
-            the operand node that its adjoint being calculated
-        indx: int
-            the index of the operand node
-        """
+    Parameters:
+    ----------
+    node: Node
+        the node to run the reverse AD from
+    name_to_node: dict
+        the nodes of the graph by name, as collected by _sweep_graph
 
-        current_adjoint = params['adjoint'][current.name]
-        current_op = current.opname
+    Returns: list of dict
+        for each frame: the visited node, the highlighted edge, the chain rule
+        text, the edge labels and the variables derivatives set in the frame
+    """
+    pending = defaultdict(int)
+    for current in name_to_node.values():
+        if isinstance(current, OperationalNode):
+            for operand in current.operands:
+                pending[operand.name] += 1
 
-        op_grad = getattr(grads, '%s_grad' % (current_op))
-        next_adjoints = op_grad(current_adjoint, current)
+    adjoint = defaultdict(int)
+    adjoint[node.name] = ConstantNode.create_using(np.ones(node.shape, dtype=node.dtype))
+    queue = deque([node])
+    frames = []
 
-        params['adjoint'][prev.name] = params['adjoint'][prev.name] + next_adjoints[indx]
+    def frame(current, edge=None, chain="", edge_labels=None, grads_texts=None):
+        return {
+            'node': current.name, 'edge': edge, 'chain': chain,
+            'edge_labels': edge_labels or {}, 'grads': grads_texts or {}
+        }
 
-        chain_txt = ""
+    while len(queue) > 0:
+        current = queue.popleft()
 
-        if not isinstance(prev, ConstantNode):
-            chain_txt += node_grad(current, indx) + "\n"
-            chain_txt += "$\\frac{\partial f}{\partial %s} \/ += \/ \\frac{\partial f}{\partial %s}\\frac{\partial %s}{\partial %s} = %.4s\\times%.4s=%.4s$" % (
-                    prev.name,
-                    current.name,
-                    current.name,
-                    prev.name,
-                    current_adjoint,
-                    next_adjoints[indx] / current_adjoint,
-                    next_adjoints[indx]
-            )
-        else:
-            chain_txt = "Constant operand\nNo derivatives to propagate"
+        if isinstance(current, (ConstantNode, SparseConstantNode)):
+            frames.append(frame(current, chain="Constant node → End of path"))
+            continue
+        if isinstance(current, (VariableNode, SparseVariableNode)):
+            frames.append(frame(current, chain="Variable node → End of path"))
+            continue
 
-        return chain_txt
+        current_adjoint = adjoint[current.name]
+        next_adjoints = current.opdef.vjp(current_adjoint, current)
 
+        # the edges into the current node are labeled with its adjoint on
+        # the first of its frames
+        edge_labels = {
+            (operand.name, current.name): "$%.4s$" % current_adjoint
+            for operand in current.operands
+        }
 
-    def update_edge_labels(params):
-        edge_labels = {}
-        graph = params.get("nx_graph")
-        adjoints = params.get("adjoint")
+        broadcast_axes = getattr(current, 'broadcast_axes', None)
 
-        for node in graph.nodes():
-            if node in adjoints:
-                actual_node = name_to_node.get(node)
-                if isinstance(actual_node, VariableNode) or isinstance(actual_node, ConstantNode):
-                    continue
-                edge_labels[(actual_node.operand_a.name, actual_node.name)] = "$%.4s$" % (adjoints.get(node))
-                if actual_node.operand_b is not None:
-                    edge_labels[(actual_node.operand_b.name, actual_node.name)] = "$%.4s$" % (adjoints.get(node))
+        for index, operand in enumerate(current.operands):
+            next_adjoint = next_adjoints[index]
+            if next_adjoint is not None:
+                if broadcast_axes is not None and broadcast_axes[index] is not None:
+                    next_adjoint = grads.unbroadcast_adjoint(next_adjoint, broadcast_axes[index])
+                adjoint[operand.name] = adjoint[operand.name] + next_adjoint
 
-        return edge_labels
+            grads_texts = {}
+            if isinstance(operand, (VariableNode, SparseVariableNode)):
+                grads_texts[operand.name] = _grad_text(operand.name, adjoint[operand.name])
 
+            frames.append(frame(
+                current, (operand.name, current.name),
+                _chain_text(current, operand, index, current_adjoint, next_adjoint),
+                edge_labels, grads_texts
+            ))
+            edge_labels = None
 
-    def update_figure(params, chain_txt_buff="", edge_labels={}):
-        """
-        performs the necessary updates to the axes to craete the frame
-        """
+            pending[operand.name] -= 1
+            if pending[operand.name] == 0:
+                queue.append(operand)
+
+    return frames
+
+
+def _animation(node, figsize=None, interval=2500, blit=True):
+    """
+    creates the figure and the animation of visualize_AD
+    """
 
-        graph_ax.clear()
+    nx_graph, _, var_names, name_to_node = _sweep_graph(node)
+    frames = _frames(node, name_to_node)
 
-        #legend
+    # the layout is the costly part, it's done once for all the frames
+    pos = nx.nx_pydot.pydot_layout(nx_graph, prog='dot')
+    node_names = list(nx_graph.nodes())
+    edges = list(nx_graph.edges())
 
-        op_circle = Line2D([0], [0], marker='o', color='w', label='Operational Node', markerfacecolor='#d5a6f9', markersize=15)
-        const_circle = Line2D([0], [0], marker='o', color='w', label='Constant Node', markerfacecolor='orange', markersize=15)
-        var_circle = Line2D([0], [0], marker='o', color='w', label='Variable Node', markerfacecolor='lightblue', markersize=15)
+    rc("mathtext", fontset='cm')
 
-        graph_ax.legend(handles=[op_circle, var_circle, const_circle])
+    # set the stage for the visualization
+    fig = plt.figure(figsize=figsize)
+    gs = gridspec.GridSpec(3, 1, hspace=0, wspace=0)
 
-        node_colors = []
-        node_labels = {}
-        node_boundary_colors = []
-        node_boundary_thickness = []
-        edges_colors = []
-        edges_widths = []
+    graph_ax = plt.subplot(gs[0:2, 0])
+    chain_ax = plt.subplot(gs[2:3, 0])
 
+    graph_ax.set_axis_off()
+    chain_ax.axis("off")
+    chain_txt = chain_ax.text(0.2, 0.5, '', fontsize=25, va='center', fontfamily='serif')
 
-        for _node in params['nx_graph'].nodes(data=True):
-            node_labels[_node[0]] = _node[1]['label']
-            if _node[0] == params['current_node'].name:
-                node_boundary_colors.append("#45a325")
-                node_boundary_thickness.append(5)
-            else:
-                node_boundary_colors.append('black')
-                node_boundary_thickness.append(1)
+    #legend
 
-            node_colors.append(_node[1]['color'])
+    op_circle = Line2D([0], [0], marker='o', color='w', label='Operational Node', markerfacecolor='#d5a6f9', markersize=15)
+    const_circle = Line2D([0], [0], marker='o', color='w', label='Constant Node', markerfacecolor='orange', markersize=15)
+    var_circle = Line2D([0], [0], marker='o', color='w', label='Variable Node', markerfacecolor='lightblue', markersize=15)
 
-        for _edge in params['nx_graph'].edges():
-            if _edge == params['current_edge']:
-                edges_colors.append("#45a325")
-                edges_widths.append(5)
-            else:
-                edges_colors.append("black")
-                edges_widths.append(1)
+    graph_ax.legend(handles=[op_circle, var_circle, const_circle])
 
-        pos=nx.nx_pydot.pydot_layout(params['nx_graph'], prog='dot')
+    # the static artists, drawn once
+    nx.draw_networkx_nodes(
+        nx_graph, pos, ax=graph_ax, nodelist=node_names, node_size=2000,
+        node_color=[nx_graph.nodes[name]['color'] for name in node_names],
+        edgecolors='black', linewidths=1
+    )
+    nx.draw_networkx_edges(nx_graph, pos, ax=graph_ax, edgelist=edges, arrows=True, node_size=2000)
+    nx.draw_networkx_labels(
+        nx_graph, pos, ax=graph_ax, font_size=15,
+        labels={name: nx_graph.nodes[name]['label'] for name in node_names}
+    )
 
-        nx.draw(
-            params['nx_graph'], pos, ax=graph_ax, 
-            arrows=True, node_color=node_colors, node_size=2000, 
-            edgecolors=node_boundary_colors, linewidths=node_boundary_thickness,
-            edge_color=edges_colors, width=edges_widths
+    # the dynamic artists, the highlights of the current node and edge are
+    # drawn over the static ones
+    highlighted_node = graph_ax.scatter(
+        [], [], s=2000, facecolors='none', edgecolors="#45a325", linewidths=5, zorder=3
+    )
+    highlighted_edges = dict(zip(edges, nx.draw_networkx_edges(
+        nx_graph, pos, ax=graph_ax, edgelist=edges, arrows=True, node_size=2000,
+        edge_color="#45a325", width=5
+    )))
+    for patch in highlighted_edges.values():
+        patch.set_visible(False)
+    # the edge labels are placed once, plain texts are cheaper to redraw than
+    # the labels networkx draws along the edges
+    edge_labels = {
+        (u, v): graph_ax.text(
+            *(0.65 * np.asarray(pos[u]) + 0.35 * np.asarray(pos[v])), '',
+            bbox={'boxstyle':'square,pad=0.1', 'fc':'white', 'ec':'white'},
+            fontsize=18, color='slategray', fontweight="bold",
+            ha='center', va='center', zorder=4
+        )
+        for u, v in edges
+    }
+    grads_annotations = {
+        variable: graph_ax.annotate(
+            _grad_text(variable, 0), xy=pos[variable], xytext=(-100, 0),
+            textcoords='offset points', size=20, ha='center', va='center'
         )
-        nx.draw_networkx_labels(params['nx_graph'], pos, ax=graph_ax, labels=node_labels, font_size=15)
-        nx.draw_networkx_edge_labels(params['nx_graph'], pos, ax=graph_ax, edge_labels=edge_labels, bbox={'boxstyle':'square,pad=0.1', 'fc':'white', 'ec':'white'}, font_size=18, font_color='slategray', font_weight="bold", label_pos=0.65)
-        for variable in params['var_names']:
-            if variable in params['grads_annotations']:
-                params['grads_annotations'][variable].remove()
-            node_pos = pos[variable]
-            d_txt = "$\\frac{\partial f}{\partial %s} = %.4s$" % (variable, params['adjoint'][variable])
-            ant = graph_ax.annotate(d_txt, xy=node_pos, xytext=(-100, 0), textcoords='offset points', size=20, ha='center', va='center')
-            params['grads_annotations'][variable] = ant
-        chain_txt.set_text(chain_txt_buff)
+        for variable in var_names
+    }
+
+    dynamic = [highlighted_node, chain_txt]
+    dynamic += list(highlighted_edges.values())
+    dynamic += list(edge_labels.values())
+    dynamic += list(grads_annotations.values())
+
+    # the artists of a frame, the labels set so far and the current edge,
+    # with blitting only these are redrawn over the static background
+    state = {'applied': 0, 'edge': None, 'labeled': []}
+
+    def reset():
+        for text in edge_labels.values():
+            text.set_text('')
+        for variable, annotation in grads_annotations.items():
+            annotation.set_text(_grad_text(variable, 0))
+        if state['edge'] is not None:
+            highlighted_edges[state['edge']].set_visible(False)
+        highlighted_node.set_offsets(np.empty((0, 2)))
+        chain_txt.set_text('')
+        state['applied'] = 0
+        state['edge'] = None
+        state['labeled'] = []
 
     def init_func():
-        return []
+        reset()
+        return dynamic
 
-    def animate(i, params):
+    def animate(i):
         """
-        sets the content of each frame of the animation
+        sets the content of each frame of the animation, by applying the
+        changes of the frames up to it
         """
 
-        chain_txt_buff = ""
-        edge_labels = update_edge_labels(params)
+        if i < state['applied']:
+            reset()
+        while state['applied'] <= i:
+            frame = frames[state['applied']]
+            for edge, label in frame['edge_labels'].items():
+                edge_labels[edge].set_text(label)
+                state['labeled'].append(edge_labels[edge])
+            for variable, text in frame['grads'].items():
+                grads_annotations[variable].set_text(text)
+            state['applied'] += 1
+
+        frame = frames[i]
+        highlighted_node.set_offsets([pos[frame['node']]])
+        if state['edge'] is not None:
+            highlighted_edges[state['edge']].set_visible(False)
+        if frame['edge'] is not None:
+            highlighted_edges[frame['edge']].set_visible(True)
+        state['edge'] = frame['edge']
+        chain_txt.set_text(frame['chain'])
+
+        artists = [highlighted_node, chain_txt] + state['labeled']
+        artists += list(grads_annotations.values())
+        if frame['edge'] is not None:
+            artists.append(highlighted_edges[frame['edge']])
+
+        return artists
+
+    anim = animation.FuncAnimation(
+        fig, animate, init_func=init_func,
+        frames=len(frames), interval=interval, blit=blit
+    )
 
-        if len(params['queue']) > 0 and not params['other_operand']:
-            params['current_node'] = params['queue'].pop()
-            current_node = params['current_node']
+    return fig, anim
 
-            if isinstance(current_node, ConstantNode):
-                update_figure(params, "Constant node → End of path", edge_labels)
-                return []
-            if isinstance(current_node, VariableNode):
-                update_figure(params, "Variable node → End of path", edge_labels)
-                return []
 
-            params['current_edge'] = (current_node.operand_a.name, current_node.name)
+def visualize_AD(node, figsize=None, interval=2500, blit=True):
+    """
+    craetes a matplotlib animation visualizing the reverse AD process on the
+    the computational graph of the given node. The graph is laid out and
+    drawn once and each frame only updates the highlights and labels that
+    changed
 
-            chain_txt_buff = process_edge(current_node, current_node.operand_a, 0, params)
-            
-            #if not isinstance(current_node.operand_a, ConstantNode):
-                #edge_labels[(current_node.operand_a.name, current_node.name)] = "$\\frac{\partial f}{\partial %s} = %.4s$" % (current_node.name, params['adjoint'][current_node.name])
+    Parameters:
+    ----------
+    node: Node
+        the node to visualize the reverse AD process on its computational graph
+    figsize: tuple
+        the size of the figure
+    interval: int
+        the delay between the frames in milliseconds
+    blit: Boolean
+        a flag to redraw only the updated artists in each frame
+
+    Returns: matplotlib.animation.FuncAnimation
+    """
 
-            if current_node.operand_a not in params['queue']:
-                params['queue'].push(current_node.operand_a)
+    rc('animation', html='html5')
+    _, anim = _animation(node, figsize, interval, blit)
 
-            if current_node.operand_b is not None:
-                params['other_operand'] = True
-        elif len(params['queue']) > 0:
-            current_node = params['current_node']
-            params['current_edge'] = (current_node.operand_b.name, current_node.name)
+    return anim
 
-            chain_txt_buff = process_edge(current_node, current_node.operand_b, 1, params)
-            #if not isinstance(current_node.operand_b, ConstantNode):
-                #edge_labels[(current_node.operand_b.name, current_node.name)] = "$\\frac{\partial f}{\partial %s} = %.4s$" % (current_node.name, params['adjoint'][current_node.name])
 
-            if current_node.operand_b not in params['queue']:
-                params['queue'].push(current_node.operand_b)
+def _writer(path, fps):
+    """
+    returns a writer streaming the frames to the file at the given path,
+    ffmpeg is piped the frames one by one for both mp4 and gif, without
+    it a gif is written by imagemagick, or by pillow which keeps the frames
+    in memory
+    """
+    if animation.writers.is_available('ffmpeg'):
+        return animation.FFMpegWriter(fps=fps)
+    if path.lower().endswith('.gif'):
+        if animation.writers.is_available('imagemagick'):
+            return animation.ImageMagickWriter(fps=fps)
+        return animation.PillowWriter(fps=fps)
 
-            params['other_operand'] = False  # reset the flag after processing
-        else:
-            return []
+    raise RuntimeError("ffmpeg is required to write %s" % path)
 
-        update_figure(params, chain_txt_buff, edge_labels)
-        params['current_edge'] = None
 
-        return []
+def save_AD_animation(node, path, fps=1, dpi=None, figsize=None, writer=None):
+    """
+    writes the visualize_AD animation of the given node to a video file,
+    frame by frame, without keeping the animation in memory
 
-    rc('animation', html='html5')
-    rc("mathtext", fontset='cm')
-    return animation.FuncAnimation(
-        fig, animate, init_func=init_func,
-        frames=frames_count, interval=2500,
-        fargs=[parameters_dict]
-    )
+    Parameters:
+    ----------
+    node: Node
+        the node to visualize the reverse AD process on its computational graph
+    path: String
+        the path of the file, e.g. an .mp4 or .gif file
+    fps: int
+        the frames per second of the video
+    dpi: int
+        the resolution of the frames, the figure's dpi by default
+    figsize: tuple
+        the size of the figure
+    writer: matplotlib.animation.AbstractMovieWriter
+        the writer to use, picked from the available ones by default
+    """
+    if writer is None:
+        writer = _writer(path, fps)
+    fig, anim = _animation(node, figsize, blit=False)
+
+    try:
+        anim.save(path, writer=writer, dpi=dpi)
+    finally:
+        plt.close(fig)
@@ -0,0 +1,330 @@
+import numpy as np
+import compgraph as cg
+from compgraph.nodes import *
+from compgraph import profiler
+import autodiff.batching as batching
+
+
+def _comparison_nodes(condition):
+    """
+    returns the graph nodes a where condition was computed from by comparing
+    nodes, see Node._compare
+
+    Parameters:
+    ----------
+    condition: ndarray
+        the condition of a where node
+    """
+    comparison = getattr(condition, 'comparison', None)
+    if comparison is None:
+        return []
+
+    nodes = []
+    for operand in comparison[1:]:
+        if hasattr(operand, 'comparison'):
+            nodes += _comparison_nodes(operand)
+        elif isinstance(operand, Node) and hasattr(operand, 'name'):
+            nodes.append(operand)
+
+    return nodes
+
+
+def _dependencies(node):
+    """
+    returns the nodes the value of the given node is computed from, the
+    operands and for a where node the nodes its condition compares
+    """
+    dependencies = list(getattr(node, 'operands', ()))
+    if getattr(node, 'opname', None) == 'where':
+        dependencies += _comparison_nodes(node.condition)
+
+    return dependencies
+
+
+def _topological_sort(node):
+    """
+    returns the nodes the given node depends on in topological order, like
+    compgraph.nodes.topological_sort but following the where conditions too
+    """
+    order = []
+    visited = {id(node)}
+    stack = [(node, iter(_dependencies(node)))]
+
+    while len(stack) > 0:
+        current, dependencies = stack[-1]
+        for dependency in dependencies:
+            if id(dependency) not in visited:
+                visited.add(id(dependency))
+                stack.append((dependency, iter(_dependencies(dependency))))
+                break
+        else:
+            stack.pop()
+            order.append(current)
+
+    return order
+
+
+def _lookup(values, node):
+    """
+    returns the value of the given node and whether it's batched, the nodes
+    that don't depend on the examples keep their traced value
+    """
+    if id(node) in values:
+        return values[id(node)]
+    if isinstance(node, SparseNode):
+        return node.value, False
+
+    return np.asarray(node), False
+
+
+def _condition(condition, values):
+    """
+    re-evaluates the condition of a where node from the batched values of the
+    nodes it compares, a condition computed otherwise is the same for all the
+    examples
+
+    Parameters:
+    ----------
+    condition: ndarray
+        the condition of the where node
+    values: dict
+        the (value, batched) pairs of the evaluated nodes by their ids
+
+    Returns: (ndarray, Boolean)
+    """
+    comparison = getattr(condition, 'comparison', None)
+    if comparison is None:
+        return np.asarray(condition), False
+
+    ufunc, *operands = comparison
+    evaluated = []
+    for operand in operands:
+        if hasattr(operand, 'comparison'):
+            evaluated.append(_condition(operand, values))
+        elif isinstance(operand, Node):
+            evaluated.append(_lookup(values, operand))
+        else:
+            evaluated.append((np.asarray(operand), False))
+
+    if not any(flag for _, flag in evaluated):
+        return np.asarray(condition), False
+
+    ndim = max(value.ndim - flag for value, flag in evaluated)
+
+    return ufunc(*(batching._lift(value, flag, ndim) for value, flag in evaluated)), True
+
+
+def _operands_values(node, values):
+    """
+    returns the values of the operands of the given node and whether they
+    are batched, with the condition last for a where node
+    """
+    operands_values = [_lookup(values, operand) for operand in node.operands]
+    if node.opname == 'where':
+        operands_values.append(_condition(node.condition, values))
+
+    return [value for value, _ in operands_values], [flag for _, flag in operands_values]
+
+
+def _rule(node, rule):
+    """
+    returns the given batching rule of the node's op
+    """
+    op_rule = getattr(node.opdef, rule)
+    if op_rule is None:
+        raise NotImplementedError("the op %s has no %s rule registered" % (node.opname, rule))
+
+    return op_rule
+
+
+def _trace(fn, params, example):
+    """
+    builds the graph of the given function on one example, the graph is
+    then evaluated and differentiated over whole batches of examples of the
+    same shapes and dtypes
+
+    Parameters:
+    ----------
+    fn: callable
+        the function of one example, see per_example_gradients
+    params: dict
+        the parameters by name, VariableNode or ndarray
+    example: list of ndarray
+        the arrays of one example
+
+    Returns: dict
+        the 'variables' by name, the 'examples' constant nodes, the 'output'
+        node and the graph's 'nodes' in topological order
+    """
+    variables = {
+        name: value if isinstance(value, VariableNode) else cg.variable(value, name)
+        for name, value in params.items()
+    }
+    examples = [
+        cg.constant(np.ascontiguousarray(array), '__vmap_example%d' % i)
+        for i, array in enumerate(example)
+    ]
+    output = fn(variables, *examples)
+
+    return {
+        'variables': variables,
+        'examples': examples,
+        'output': output,
+        'nodes': _topological_sort(output)
+    }
+
+
+def _check_batch(batch):
+    """
+    converts the batched arrays into ndarrays and returns them with their
+    common leading size
+    """
+    if len(batch) == 0:
+        raise ValueError("at least one batched array is required")
+    batch = [np.asarray(array) for array in batch]
+    batch_size = len(batch[0])
+    if any(len(array) != batch_size for array in batch):
+        raise ValueError("the batched arrays have different leading sizes")
+
+    return batch, batch_size
+
+
+def _forward(trace, batch, batch_size):
+    """
+    evaluates a traced graph over a batch of examples
+
+    Parameters:
+    ----------
+    trace: dict
+        the traced graph, see _trace
+    batch: list of ndarray
+        the arrays holding the examples along their leading axis
+    batch_size: int
+        the number of examples
+
+    Returns: (ndarray, dict)
+        the output of each example of shape (B,) + the output's shape, and
+        the (value, batched) pairs of the evaluated nodes by their ids
+    """
+    values = {
+        id(example): (np.asarray(array, dtype=example.dtype), True)
+        for example, array in zip(trace['examples'], batch)
+    }
+
+    for node in trace['nodes']:
+        if not isinstance(node, OperationalNode):
+            continue
+        operands_values, batched = _operands_values(node, values)
+        if not any(batched):
+            continue
+
+        value = profiler.record(
+            'forward', node.opname + '_batched',
+            _rule(node, 'batched'), node, operands_values, batched
+        )
+        value = np.asarray(value).astype(node.dtype, copy=False)
+        if value.shape[1:] != node.shape:
+            value = np.broadcast_to(value, (batch_size,) + node.shape)
+        values[id(node)] = (value, True)
+
+    output = trace['output']
+    value, batched = _lookup(values, output)
+    if batched:
+        value = value.reshape((batch_size,) + output.shape)
+    else:
+        value = np.broadcast_to(value, (batch_size,) + output.shape)
+
+    return value.copy(), values
+
+
+def _backward(trace, values, batch_size):
+    """
+    differentiates the output of a traced graph evaluated over a batch by
+    the parameters, for each example
+
+    Parameters:
+    ----------
+    trace: dict
+        the traced graph, see _trace, its output is a scalar
+    values: dict
+        the (value, batched) pairs of the evaluated nodes, see _forward
+    batch_size: int
+        the number of examples
+
+    Returns: dict
+        the gradients of the parameters by name, each of shape (B,) + the
+        parameter's shape
+    """
+    nodes, output, variables = trace['nodes'], trace['output'], trace['variables']
+
+    # only the nodes depending on the parameters get adjoints
+    differentiable = {id(variable) for variable in variables.values()}
+    for node in nodes:
+        if any(id(operand) in differentiable for operand in getattr(node, 'operands', ())):
+            differentiable.add(id(node))
+
+    adjoints = {id(output): np.ones((batch_size,) + output.shape, dtype=output.dtype)}
+    for node in reversed(nodes):
+        if not isinstance(node, OperationalNode) or id(node) not in differentiable:
+            continue
+        adjoint = adjoints.pop(id(node), None)
+        if adjoint is None:
+            continue
+
+        operands_values, batched = _operands_values(node, values)
+        needs = [id(operand) in differentiable for operand in node.operands]
+        operands_adjoints = profiler.record(
+            'backward', node.opname + '_batched_grad',
+            _rule(node, 'batched_vjp'),
+            node, adjoint, _lookup(values, node)[0], operands_values, batched, needs
+        )
+
+        for operand, need, operand_adjoint in zip(node.operands, needs, operands_adjoints):
+            if not need or operand_adjoint is None:
+                continue
+            operand_adjoint = batching.unbroadcast(operand_adjoint, operand.shape)
+            if id(operand) in adjoints:
+                operand_adjoint = adjoints[id(operand)] + operand_adjoint
+            adjoints[id(operand)] = operand_adjoint
+
+    gradients = {}
+    for name, variable in variables.items():
+        adjoint = adjoints.get(id(variable))
+        if adjoint is None:
+            adjoint = np.zeros((batch_size,) + variable.shape, dtype=variable.dtype)
+        gradients[name] = np.ascontiguousarray(adjoint, dtype=variable.dtype)
+
+    return gradients
+
+
+def per_example_gradients(fn, params, *batch):
+    """
+    computes the gradient of a loss for each example of a batch in a single
+    vectorized sweep: the loss graph of one example is built once, evaluated
+    over the whole batch along a leading axis and differentiated per example,
+    instead of building and differentiating a graph for each example
+
+    Parameters:
+    ----------
+    fn: callable
+        the loss of one example, it takes a dict of the variable nodes by name
+        followed by a constant node for each of the example's arrays and
+        returns a scalar node. The examples may only flow through compgraph
+        ops, where conditions follow them when computed by comparing nodes
+    params: dict
+        the parameters to differentiate by name, VariableNode or ndarray
+    batch: ndarray
+        the arrays holding the examples along their leading axis
+
+    Returns: (ndarray, dict)
+        the loss of each example of shape (B,) and the gradients of the
+        parameters by name, each of shape (B,) + the parameter's shape
+    """
+    batch, batch_size = _check_batch(batch)
+    trace = _trace(fn, params, [array[0] for array in batch])
+    if trace['output'].size != 1:
+        raise ValueError("the function must return a scalar, got shape %s" % (trace['output'].shape,))
+
+    losses, values = _forward(trace, batch, batch_size)
+
+    return losses.reshape(batch_size), _backward(trace, values, batch_size)
@@ -0,0 +1,175 @@
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.workloads import WORKLOADS
+import compgraph as cg
+
+
+def measure(fn, repeat, min_time=0.2):
+    """
+    times the given callable and measures its peak memory
+
+    Parameters:
+    ----------
+    fn: callable
+        the callable to measure
+    repeat: int
+        the number of timing rounds
+    min_time: float
+        the minimum duration of a round in seconds, short callables are
+        called several times in each round
+
+    Returns: dict
+        the median and minimum time of a call in seconds and the peak of the
+        memory allocated during a call in bytes
+    """
+    # warm up and pick the number of calls in a round
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    number = max(1, int(min_time / max(elapsed, 1e-9)))
+
+    times = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            cg.reset()
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            times.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    # tracemalloc slows the calls down so the memory is measured separately
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'median': float(np.median(times)), 'min': min(times), 'peak_bytes': peak}
+
+
+def run(names=None, repeat=5, quick=False):
+    """
+    runs the workloads on each of their sizes
+
+    Parameters:
+    ----------
+    names: list of String
+        the workloads to run, all of them if None
+    repeat: int
+        the number of timing rounds for each size
+    quick: Boolean
+        a flag to run each workload on its smallest size only
+
+    Returns: dict
+        the measurements keyed by "workload[size]"
+    """
+    results = {}
+    for name, (workload, sizes) in WORKLOADS.items():
+        if names and name not in names:
+            continue
+        for size in sizes[:1] if quick else sizes:
+            key = "%s[%d]" % (name, size)
+            results[key] = measure(workload(size), repeat)
+            print("%-36s %12.3f ms %12.1f KiB" % (
+                key, results[key]['median'] * 1e3, results[key]['peak_bytes'] / 1024
+            ), flush=True)
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    prints the ratios of the results to the baseline and returns the
+    workloads that regressed
+
+    Parameters:
+    ----------
+    results: dict
+        the current measurements as returned by run
+    baseline: dict
+        the baseline measurements
+    threshold: float
+        the ratio above which a time or a peak memory is a regression
+
+    Returns: list of String
+    """
+    regressions = []
+    print("\n%-36s %10s %10s" % ('workload', 'time', 'memory'))
+    for key, current in results.items():
+        if key not in baseline:
+            continue
+        reference = baseline[key]
+        time_ratio = current['median'] / reference['median']
+        memory_ratio = current['peak_bytes'] / max(reference['peak_bytes'], 1)
+
+        regressed = time_ratio > threshold or memory_ratio > threshold
+        if regressed:
+            regressions.append(key)
+        print("%-36s %9.2fx %9.2fx%s" % (
+            key, time_ratio, memory_ratio, '  REGRESSION' if regressed else ''
+        ))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="runs the benchmark workloads and compares them to a baseline"
+    )
+    parser.add_argument('workloads', nargs='*', help="the workloads to run, all by default")
+    parser.add_argument('--repeat', type=int, default=5, help="the timing rounds per size")
+    parser.add_argument('--quick', action='store_true', help="run the smallest sizes only")
+    parser.add_argument('--save', metavar='PATH', help="save the results as a baseline")
+    parser.add_argument('--compare', metavar='PATH', help="compare the results to a baseline")
+    parser.add_argument(
+        '--threshold', type=float, default=1.25,
+        help="the slowdown ratio reported as a regression"
+    )
+    parser.add_argument('--list', action='store_true', help="list the workloads and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (workload, sizes) in WORKLOADS.items():
+            print("%-28s %-24s %s" % (name, sizes, workload.__doc__.strip().splitlines()[0]))
+        return 0
+
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error("unknown workloads: %s" % ", ".join(sorted(unknown)))
+
+    results = run(args.workloads, args.repeat, args.quick)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'machine': platform.machine(),
+                'results': results
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import compgraph as cg
+import autodiff.reverse as reverse
+import autodiff.forward as forward
+from dualnumbers import DualNumber
+import dualnumbers.dmath as dmath
+
+# each workload takes its size parameter, does the untimed setup and returns
+# the callable to time, WORKLOADS maps the workloads names to their function
+# and the sizes they are run on
+WORKLOADS = {}
+
+
+def workload(*sizes):
+    """
+    registers the decorated function as a workload run on the given sizes
+
+    Parameters:
+    ----------
+    sizes: int
+        the values of the size parameter to run the workload on
+    """
+    def register(fn):
+        WORKLOADS[fn.__name__] = (fn, sizes)
+        return fn
+
+    return register
+
+
+def _chain(x, depth):
+    """
+    builds a chain of scalar operations of the given depth over x
+    """
+    y = x
+    for _ in range(depth):
+        y = cg.sin(y * 0.5 + 1.)
+
+    return y
+
+
+@workload(100, 1000, 5000)
+def build_scalar_chain(depth):
+    """
+    the construction of a deep chain of scalar operations
+    """
+    x = cg.variable(0.5, 'x')
+
+    return lambda: _chain(x, depth)
+
+
+@workload(100, 1000, 5000)
+def reverse_scalar_chain(depth):
+    """
+    the reverse gradient of a deep chain of scalar operations
+    """
+    y = _chain(cg.variable(0.5, 'x'), depth)
+
+    return lambda: reverse.gradient(y)
+
+
+def _wide(xs):
+    """
+    builds independent elementwise branches over xs and adds them up
+    """
+    return cg.add_n([cg.sum(cg.sin(x) * cg.cos(x) + cg.exp(x * x * -1.)) for x in xs])
+
+
+@workload(10, 100, 500)
+def build_wide_elementwise(width):
+    """
+    the construction of a wide graph of elementwise operations on vectors
+    """
+    rng = np.random.default_rng(0)
+    xs = [cg.variable(rng.standard_normal(1000), 'x%d' % i) for i in range(width)]
+
+    return lambda: _wide(xs)
+
+
+@workload(10, 100, 500)
+def reverse_wide_elementwise(width):
+    """
+    the reverse gradient of a wide graph of elementwise operations on vectors
+    """
+    rng = np.random.default_rng(0)
+    y = _wide([cg.variable(rng.standard_normal(1000), 'x%d' % i) for i in range(width)])
+
+    return lambda: reverse.gradient(y)
+
+
+@workload(32, 256, 1024)
+def mlp_training_step(batch_size):
+    """
+    a forward pass, a reverse gradient and an SGD update of a two layers
+    perceptron trained with softmax_cross_entropy
+    """
+    rng = np.random.default_rng(0)
+    features = rng.standard_normal((batch_size, 784))
+    labels = np.eye(10)[rng.integers(0, 10, batch_size)]
+    W1 = cg.variable(rng.standard_normal((784, 128)) * 0.05, 'W1')
+    b1 = cg.variable(np.zeros(128), 'b1')
+    W2 = cg.variable(rng.standard_normal((128, 10)) * 0.05, 'W2')
+    b2 = cg.variable(np.zeros(10), 'b2')
+    params = [W1, b1, W2, b2]
+
+    def step():
+        hidden = cg.dot(features, W1) + b1
+        hidden = cg.where(hidden > 0, hidden, 0)
+        loss = cg.softmax_cross_entropy(cg.dot(hidden, W2) + b2, labels)
+        grads = reverse.gradient(loss)
+        for param in params:
+            np.subtract(param, 0.01 * np.asarray(grads[param.name]), out=param.view(np.ndarray))
+
+    return step
+
+
+@workload(128, 512, 1024)
+def large_dot(size):
+    """
+    the forward and reverse passes of a product of two square matrices
+    """
+    rng = np.random.default_rng(0)
+    A = cg.variable(rng.standard_normal((size, size)), 'A')
+    B = cg.variable(rng.standard_normal((size, size)), 'B')
+
+    return lambda: reverse.gradient(cg.sum(cg.dot(A, B)))
+
+
+def _n_variables_function(*xs):
+    """
+    a scalar function of n variables coupling each one with its neighbour
+    """
+    total = 0
+    for x, next_x in zip(xs, xs[1:]):
+        total = total + dmath.sin(x) * next_x + x * x
+
+    return total
+
+
+@workload(10, 50, 200)
+def forward_gradient(n):
+    """
+    the forward mode gradient of a function of n variables, one pass per
+    variable
+    """
+    args = list(np.linspace(0.1, 1., n))
+
+    return lambda: forward.gradient(_n_variables_function, args)
+
+
+@workload(1000, 10000, 100000)
+def dual_arithmetic(n):
+    """
+    a loop of DualNumber arithmetic
+    """
+    def run():
+        z = DualNumber(0.5, 1.)
+        for _ in range(n):
+            z = (z * 0.999 + 0.001) / 1.0001 - 0.0001
+
+        return z
+
+    return run
+
+
+# the modules a training worker imports and the ones they must leave to be
+# imported on first use
+_CORE_MODULES = ('compgraph', 'autodiff', 'autodiff.reverse', 'autodiff.forward')
+_LAZY_MODULES = ('matplotlib', 'networkx', 'scipy')
+
+
+@workload(1)
+def import_core(processes):
+    """
+    the startup of fresh interpreters importing the core modules, a call
+    fails if they import any of the visualizations dependencies
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = "import sys\nimport %s\nloaded = [m for m in %r if m in sys.modules]\n" \
+        "assert not loaded, 'imported at startup: %%s' %% loaded" % (
+            ", ".join(_CORE_MODULES), _LAZY_MODULES
+        )
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+
+    def run():
+        for _ in range(processes):
+            subprocess.run([sys.executable, '-c', script], cwd=root, env=env, check=True)
+
+    return run
@@ -1,2 +1,27 @@
 from compgraph.api import *
-from compgraph.visualize import *
+from compgraph.serialize import save, load
+from compgraph.export import export
+from compgraph.profiler import profile
+from compgraph.memory import memory_report
+import importlib
+
+# the visualizations are imported on first use, so building and
+# differentiating graphs only imports numpy
+_LAZY = {
+    'visualize_at': 'compgraph.visualize',
+    'summarize_graph': 'compgraph.visualize',
+    'render_svg': 'compgraph.visualize'
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name]), name)
+        globals()[name] = value
+        return value
+
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
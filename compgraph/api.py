@@ -1,5 +1,24 @@
+import builtins
 import numpy as np
 from compgraph.nodes import *
+from compgraph import profiler
+from compgraph import registry
+
+def _reduction_dtype(array):
+    """
+    returns the dtype a reduction over the given array should accumulate in,
+    None leaves it to numpy's default
+
+    Parameters:
+    ----------
+    array: Node
+        the array to be reduced
+    """
+    if is_mixed_precision() and array.dtype.kind == 'f':
+        return get_accumulator_dtype()
+
+    return None
+
 
 def variable(initial_value, name=None):
     """
@@ -29,6 +48,7 @@ def constant(value, name=None):
     return ConstantNode.create_using(value, name)
 
 
+@profiler.instrument
 def sum(array, axis=None, keepdims=False, name=None):
     """
     defines a node in the computational graph representing a sum operation
@@ -46,11 +66,20 @@ def sum(array, axis=None, keepdims=False, name=None):
     """
     if not isinstance(array, Node):
         array = ConstantNode.create_using(array)
-    opvalue = np.sum(array, axis=axis, keepdims=keepdims)
+    opvalue = np.sum(
+        array, axis=axis, keepdims=keepdims, dtype=_reduction_dtype(array)
+    ).astype(array.dtype, copy=False)
 
-    return OperationalNode.create_using(opvalue, 'sum', array, name=name)
+    opnode = OperationalNode.create_using(opvalue, 'sum', array, name=name)
 
+    # save info for gradient computation
+    opnode.axis = axis
+    opnode.keepdims = keepdims
 
+    return opnode
+
+
+@profiler.instrument
 def mean(array, axis=None, name=None):
     """
     defines a node in the computational graph representing a mean operation
@@ -66,11 +95,17 @@ def mean(array, axis=None, name=None):
     """
     if not isinstance(array, Node):
         array = ConstantNode.create_using(array)
-    opvalue = np.mean(array, axis=axis)
+    opvalue = np.mean(
+        array, axis=axis, dtype=_reduction_dtype(array)
+    ).astype(array.dtype, copy=False)
+
+    opnode = OperationalNode.create_using(opvalue, 'mean', array, name=name)
+    opnode.axis = axis  # save axis for gradient computation
 
-    return OperationalNode.create_using(opvalue, 'mean', array, name=name)
+    return opnode
 
 
+@profiler.instrument
 def exp(array, name=None):
     """
     defines a node in the computational graph representing an exp operation
@@ -89,6 +124,7 @@ def exp(array, name=None):
     return OperationalNode.create_using(opvalue, 'exp', array, name=name)
 
 
+@profiler.instrument
 def log(array, name=None):
     """
     defines a node in the computational graph representing an log operation
@@ -107,6 +143,7 @@ def log(array, name=None):
     return OperationalNode.create_using(opvalue, 'log', array, name=name)
 
 
+@profiler.instrument
 def max(array, axis=None, keepdims=False, name=None):
     """
     defines a node in the computational graph representing a max operation
@@ -135,6 +172,7 @@ def max(array, axis=None, keepdims=False, name=None):
     return opnode
 
 
+@profiler.instrument
 def dot(array_a, array_b, name=None):
     """
     defines a node in the computational graph representing an array product op
@@ -147,16 +185,148 @@ def dot(array_a, array_b, name=None):
         the second operand to the product
     name: String
         the name of the node
+
+    Any one of the operands can be sparse (a scipy.sparse matrix or a sparse
+    constant/variable node), the product is then computed without
+    densifying it and its result is a dense node
     """
-    if not isinstance(array_a, Node):
+    if not isinstance(array_a, (Node, SparseNode)):
         array_a = ConstantNode.create_using(array_a)
-    if not isinstance(array_b, Node):
+    if not isinstance(array_b, (Node, SparseNode)):
         array_b = ConstantNode.create_using(array_b)
-    opvalue = np.dot(array_a, array_b)
 
-    return OperationalNode.create_using(opvalue, 'dot', array_a, array_b, name)
+    if isinstance(array_a, SparseNode) and isinstance(array_b, SparseNode):
+        raise TypeError("cg.dot supports at most one sparse operand")
+    elif isinstance(array_a, SparseNode):
+        opvalue = array_a.value @ np.asarray(array_b)
+    elif isinstance(array_b, SparseNode):
+        opvalue = np.asarray(array_a) @ array_b.value
+    else:
+        opvalue = np.dot(array_a, array_b)
+
+    return OperationalNode.create_using(opvalue, 'dot', array_a, array_b, name=name)
+
+
+def _parse_einsum(subscripts, operands):
+    """
+    parses einsum subscripts into explicit per-operand and output subscripts,
+    with ellipses replaced by unused labels so every axis is named
 
+    Parameters:
+    ----------
+    subscripts: String
+        the einsum subscripts, in implicit or explicit mode
+    operands: list of Node
+        the operands the subscripts describe
+
+    Returns: (list of String, String)
+    """
+    subscripts = subscripts.replace(' ', '')
+    if '->' in subscripts:
+        inputs, output = subscripts.split('->')
+    else:
+        inputs, output = subscripts, None
+    inputs = inputs.split(',')
+
+    if len(inputs) != len(operands):
+        raise ValueError("einsum got %d operands for %d subscripts" % (len(operands), len(inputs)))
+
+    used = set(subscripts) - set('.,->')
+    free = [l for l in 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ' if l not in used]
+    ellipsis_ndim = builtins.max(
+        [operand.ndim - len(subs.replace('...', '')) for subs, operand in zip(inputs, operands) if '...' in subs] + [0]
+    )
+    ellipsis = ''.join(free[:ellipsis_ndim])
+
+    explicit_inputs = []
+    for subs, operand in zip(inputs, operands):
+        if '...' in subs:
+            ndim = operand.ndim - len(subs.replace('...', ''))
+            subs = subs.replace('...', ellipsis[ellipsis_ndim - ndim:])
+        if len(subs) != operand.ndim:
+            raise ValueError("einsum subscripts '%s' do not match an operand of shape %s" % (subs, operand.shape))
+        if len(set(subs)) != len(subs):
+            raise ValueError("repeated subscripts within an operand are not supported: '%s'" % subs)
+        explicit_inputs.append(subs)
+
+    if output is None:
+        labels = ''.join(explicit_inputs)
+        output = ellipsis + ''.join(sorted(
+            l for l in set(labels) if labels.count(l) == 1 and l not in ellipsis
+        ))
+    else:
+        output = output.replace('...', ellipsis)
+
+    return explicit_inputs, output
+
+
+@profiler.instrument
+def einsum(subscripts, *operands, optimize='greedy', name=None):
+    """
+    defines a node in the computational graph representing an einstein
+    summation over the given operands, the contraction order is optimized
+    once when the node is created
+
+    Parameters:
+    ----------
+    subscripts: String
+        the einsum subscripts as in np.einsum, e.g. 'bij,bjk->bik'
+    operands: Node | ndarray | number
+        the operands of the summation
+    optimize: String
+        the contraction path strategy, 'greedy' or 'optimal'
+    name: String
+        node's name in the graph
+    """
+    operands = [
+        operand if isinstance(operand, Node) else ConstantNode.create_using(operand)
+        for operand in operands
+    ]
+    inputs, output = _parse_einsum(subscripts, operands)
+    explicit_subscripts = "%s->%s" % (','.join(inputs), output)
+
+    path = np.einsum_path(explicit_subscripts, *operands, optimize=optimize)[0]
+    opvalue = np.einsum(explicit_subscripts, *operands, optimize=path)
+    opnode = OperationalNode.create_using(np.asarray(opvalue), 'einsum', *operands, name=name)
+
+    # save info for gradient computation
+    opnode.input_subscripts = inputs
+    opnode.output_subscript = output
+    opnode.optimize = optimize
+    opnode.path = path
 
+    return opnode
+
+
+def matmul(array_a, array_b, name=None):
+    """
+    defines a node in the computational graph representing a matrix product
+    with np.matmul semantics, including broadcasted batch dimensions
+
+    Parameters:
+    ----------
+    array_a: Node | ndarray
+        the first operand to the product
+    array_b: Node | ndarray
+        the second operand to the product
+    name: String
+        the name of the node
+    """
+    subscripts_a = 'j' if np.ndim(array_a) == 1 else '...ij'
+    subscripts_b = 'j' if np.ndim(array_b) == 1 else '...jk'
+    subscripts_out = '...'
+    if np.ndim(array_a) != 1:
+        subscripts_out += 'i'
+    if np.ndim(array_b) != 1:
+        subscripts_out += 'k'
+
+    return einsum(
+        "%s,%s->%s" % (subscripts_a, subscripts_b, subscripts_out),
+        array_a, array_b, name=name
+    )
+
+
+@profiler.instrument
 def where(condition, array_a, array_b, name=None):
     """
     defines a node in the computational graph representing a where selection
@@ -174,18 +344,19 @@ def where(condition, array_a, array_b, name=None):
         the name of the node
     """
     if not isinstance(array_a, Node):
-        nd_array_a = np.full_like(condition, array_a)
+        nd_array_a = np.full(np.shape(condition), array_a, dtype=get_default_dtype())
         array_a = ConstantNode.create_using(nd_array_a)
     if not isinstance(array_b, Node):
-        nd_array_b = np.full_like(condition, array_b)
+        nd_array_b = np.full(np.shape(condition), array_b, dtype=get_default_dtype())
         array_b = ConstantNode.create_using(nd_array_b)
     opvalue = np.where(condition, array_a, array_b)
-    opnode = OperationalNode.create_using(opvalue, 'where', array_a, array_b, name=name)
+    opnode = OperationalNode.create_using(opvalue, 'where', array_a, array_b, name=name, broadcast=True)
     opnode.condition = condition  # save condition for gradient computation
 
     return opnode
 
 
+@profiler.instrument
 def sin(array, name=None):
     """
     defines a node in the computational graph representing a sin operation
@@ -203,6 +374,7 @@ def sin(array, name=None):
 
     return OperationalNode.create_using(opvalue, 'sin', array, name=name)
 
+@profiler.instrument
 def cos(array, name=None):
     """
     defines a node in the computational graph representing a cos operation
@@ -220,6 +392,7 @@ def cos(array, name=None):
 
     return OperationalNode.create_using(opvalue, 'cos', array, name=name)
 
+@profiler.instrument
 def softmax_cross_entropy(logits, labels, name=None):
     """
     defines a softmax-cross-entropy op as a primitive for numerical stability
@@ -227,7 +400,7 @@ def softmax_cross_entropy(logits, labels, name=None):
     Parameters:
     ----------
     logits: Node| ndarray| Number
-        the model's prediction
+        the model's prediction, the softmax is taken along the last axis
     labels:
         the true labels
     name: String
@@ -238,25 +411,57 @@ def softmax_cross_entropy(logits, labels, name=None):
     if not isinstance(labels, Node):
         labels = ConstantNode.create_using(labels)
 
-    logits_max = np.max(logits, axis=1, keepdims=True)
-    exp_op = np.exp(logits - logits_max)
-    logits_softmax = exp_op / np.sum(exp_op, axis=1, keepdims=True)
+    # computed on plain arrays so no throwaway nodes are kept by softmax_val
+    logits_value = np.asarray(logits)
+    logits_max = np.max(logits_value, axis=-1, keepdims=True)
+    exp_op = np.exp(logits_value - logits_max)
+    logits_softmax = exp_op / np.sum(exp_op, axis=-1, keepdims=True)
 
-    cross_entropy = -1 * np.mean(labels * np.log(logits_softmax + 1e-7))
+    cross_entropy = -1 * np.mean(
+        np.asarray(labels) * np.log(logits_softmax + 1e-7), dtype=_reduction_dtype(logits)
+    ).astype(logits.dtype, copy=False)
 
     opnode = OperationalNode.create_using(
         cross_entropy,
         'softmax_cross_entropy',
         logits,
+        labels,
         name=name
     )
 
     # save info for gradient calculations
     opnode.softmax_val = logits_softmax
-    opnode.labels = labels
 
     return opnode
 
+@profiler.instrument
+def softmax(array, axis=-1, name=None):
+    """
+    defines a node in the computational graph representing a softmax operation
+
+    Parameters:
+    ----------
+    array: Node | ndarray | number
+        the array to be normalized
+    axis: int
+        the axis to normalize along
+    name: String
+        node's name in the graph
+    """
+    if not isinstance(array, Node):
+        array = ConstantNode.create_using(array)
+
+    array_value = np.asarray(array)
+    exp_op = np.exp(array_value - np.max(array_value, axis=axis, keepdims=True))
+    opvalue = exp_op / np.sum(exp_op, axis=axis, keepdims=True)
+
+    opnode = OperationalNode.create_using(opvalue, 'softmax', array, name=name)
+    opnode.axis = axis  # save axis for gradient computation
+
+    return opnode
+
+
+@profiler.instrument
 def reshape(array, new_shape, name=None):
     """
     defines a node in the computational graph representing a reshape operation
@@ -276,6 +481,7 @@ def reshape(array, new_shape, name=None):
 
     return OperationalNode.create_using(opvalue, 'reshape', array, name=name)
 
+@profiler.instrument
 def squeeze(array, axis=None, name=None):
     """
     defines a node in the computational graph representing a squeeze operation
@@ -296,9 +502,669 @@ def squeeze(array, axis=None, name=None):
     return OperationalNode.create_using(opvalue, 'squeeze', array, name=name)
 
 
+@profiler.instrument
+def add_n(arrays, name=None):
+    """
+    defines a node in the computational graph representing the sum of
+    any number of arrays in a single operation
+
+    Parameters:
+    ----------
+    arrays: iterable of Node | ndarray | number
+        the arrays to be added together
+    name: String
+        node's name in the graph
+    """
+    arrays = [
+        array if isinstance(array, Node) else ConstantNode.create_using(array)
+        for array in arrays
+    ]
+    dtype = np.result_type(*arrays)
+    opvalue = np.zeros(
+        np.broadcast_shapes(*[array.shape for array in arrays]),
+        dtype=get_accumulator_dtype() if is_mixed_precision() and dtype.kind == 'f' else dtype
+    )
+    for array in arrays:
+        np.add(opvalue, array, out=opvalue)
+
+    return OperationalNode.create_using(
+        opvalue.astype(dtype, copy=False), 'add_n', *arrays, name=name, broadcast=True
+    )
+
+
+@profiler.instrument
+def concatenate(arrays, axis=0, name=None):
+    """
+    defines a node in the computational graph representing a concatenation
+    of arrays along an existing axis
+
+    Parameters:
+    ----------
+    arrays: iterable of Node | ndarray
+        the arrays to be concatenated
+    axis: int
+        the axis along which the arrays are joined
+    name: String
+        node's name in the graph
+    """
+    arrays = [
+        array if isinstance(array, Node) else ConstantNode.create_using(array)
+        for array in arrays
+    ]
+    opvalue = np.concatenate(arrays, axis=axis)
+    opnode = OperationalNode.create_using(opvalue, 'concatenate', *arrays, name=name)
+
+    # save info for gradient computation
+    opnode.axis = axis
+    opnode.split_indices = np.cumsum([array.shape[axis] for array in arrays[:-1]])
+
+    return opnode
+
+
+@profiler.instrument
+def stack(arrays, axis=0, name=None):
+    """
+    defines a node in the computational graph representing a stacking of
+    arrays along a new axis
+
+    Parameters:
+    ----------
+    arrays: iterable of Node | ndarray
+        the arrays to be stacked, all of the same shape
+    axis: int
+        the index of the new axis in the result
+    name: String
+        node's name in the graph
+    """
+    arrays = [
+        array if isinstance(array, Node) else ConstantNode.create_using(array)
+        for array in arrays
+    ]
+    opvalue = np.stack(arrays, axis=axis)
+    opnode = OperationalNode.create_using(opvalue, 'stack', *arrays, name=name)
+    opnode.axis = axis  # save axis for gradient computation
+
+    return opnode
+
+
+@profiler.instrument
+def split(array, indices_or_sections, axis=0, name=None):
+    """
+    defines a group of nodes in the computational graph, one for each of the
+    sections resulting from splitting the array along the given axis
+
+    Parameters:
+    ----------
+    array: Node | ndarray
+        the array to be split
+    indices_or_sections: int | iterable
+        the number of equal sections or the indices to split at
+    axis: int
+        the axis along which to split
+    name: String
+        prefix of the sections names in the graph
+
+    Returns: list of OperationalNode
+    """
+    if not isinstance(array, Node):
+        array = ConstantNode.create_using(array)
+    sections = np.split(np.asarray(array), indices_or_sections, axis=axis)
+
+    opnodes = []
+    start = 0
+    for i, section in enumerate(sections):
+        opnode = OperationalNode.create_using(
+            section, 'split', array,
+            name=None if name is None else "%s_%d" % (name, i)
+        )
+
+        # save info for gradient computation
+        opnode.axis = axis
+        opnode.start = start
+        start += section.shape[axis]
+
+        opnodes.append(opnode)
+
+    return opnodes
+
+
+def _pair(value):
+    """
+    returns the given int or pair of ints as a pair
+    """
+    if isinstance(value, int):
+        return (value, value)
+
+    return tuple(value)
+
+
+def _im2col(array, kernel_size, stride, padding, pad_value=0):
+    """
+    returns a strided view over the sliding windows of a padded NCHW array
+    with shape (N, C, OH, OW, KH, KW), no data is copied except for padding
+
+    Parameters:
+    ----------
+    array: ndarray
+        the NCHW array to take the windows from
+    kernel_size: (int, int)
+        the height and width of the windows
+    stride: (int, int)
+        the vertical and horizontal steps between windows
+    padding: (int, int)
+        the number of rows and columns padded on each side
+    pad_value: Number
+        the value to pad the array with
+    """
+    pad_h, pad_w = padding
+    array = np.asarray(array)
+    if pad_h != 0 or pad_w != 0:
+        array = np.pad(
+            array, ((0, 0), (0, 0), (pad_h, pad_h), (pad_w, pad_w)),
+            constant_values=pad_value
+        )
+    windows = np.lib.stride_tricks.sliding_window_view(array, kernel_size, axis=(2, 3))
+
+    return windows[:, :, ::stride[0], ::stride[1]]
+
+
+def _col2im(columns, input_shape, stride, padding):
+    """
+    scatter-adds sliding windows of shape (N, C, OH, OW, KH, KW) back into an
+    NCHW array of the given shape, the inverse layout of _im2col
+
+    Parameters:
+    ----------
+    columns: ndarray
+        the windows values to scatter
+    input_shape: tuple
+        the NCHW shape of the array the windows were taken from
+    stride: (int, int)
+        the vertical and horizontal steps between windows
+    padding: (int, int)
+        the number of rows and columns padded on each side
+    """
+    n, c, height, width = input_shape
+    pad_h, pad_w = padding
+    out_h, out_w, kernel_h, kernel_w = columns.shape[2:]
+
+    padded = np.zeros((n, c, height + 2 * pad_h, width + 2 * pad_w), dtype=columns.dtype)
+    for i in range(kernel_h):
+        for j in range(kernel_w):
+            padded[
+                :, :,
+                i:i + stride[0] * out_h:stride[0],
+                j:j + stride[1] * out_w:stride[1]
+            ] += columns[:, :, :, :, i, j]
+
+    return padded[:, :, pad_h:pad_h + height, pad_w:pad_w + width]
+
+
+def _conv2d(array, filters, stride, padding):
+    """
+    computes the 2D cross-correlation of an NCHW array with a bank of filters
+    of shape (F, C, KH, KW)
+    """
+    columns = _im2col(array, filters.shape[2:], stride, padding)
+    value = np.tensordot(columns, filters, axes=([1, 4, 5], [1, 2, 3]))
+
+    return np.transpose(value, (0, 3, 1, 2))
+
+
+def _conv2d_backprop_input(adjoint, filters, input_shape, stride, padding):
+    """
+    computes the transposed convolution of an (N, F, OH, OW) adjoint with a
+    bank of filters into an array of the given NCHW shape
+    """
+    columns = np.tensordot(adjoint, filters, axes=([1], [0]))
+    columns = np.transpose(columns, (0, 3, 1, 2, 4, 5))
+
+    return _col2im(columns, input_shape, stride, padding)
+
+
+def _max_pool2d(array, kernel_size, stride, padding):
+    """
+    computes the 2D max pooling of an NCHW array, returns the pooled values
+    and the flat index of the selected element in each window
+    """
+    windows = _im2col(array, kernel_size, stride, padding, pad_value=-np.inf)
+    windows = windows.reshape(windows.shape[:4] + (-1,))
+    argmax = np.argmax(windows, axis=-1)
+
+    return np.take_along_axis(windows, argmax[..., None], axis=-1)[..., 0], argmax
+
+
+def _max_pool2d_backprop(adjoint, argmax, input_shape, kernel_size, stride, padding):
+    """
+    routes an (N, C, OH, OW) adjoint to the selected window elements of an
+    array of the given NCHW shape
+    """
+    columns = np.zeros(argmax.shape + (kernel_size[0] * kernel_size[1],), dtype=adjoint.dtype)
+    np.put_along_axis(columns, argmax[..., None], np.asarray(adjoint)[..., None], axis=-1)
+    columns = columns.reshape(argmax.shape + tuple(kernel_size))
+
+    return _col2im(columns, input_shape, stride, padding)
+
+
+def _avg_pool2d(array, kernel_size, stride, padding):
+    """
+    computes the 2D average pooling of an NCHW array
+    """
+    windows = _im2col(array, kernel_size, stride, padding)
+
+    return np.mean(windows, axis=(4, 5), dtype=_reduction_dtype(array)).astype(array.dtype, copy=False)
+
+
+def _avg_pool2d_backprop(adjoint, input_shape, kernel_size, stride, padding):
+    """
+    spreads an (N, C, OH, OW) adjoint evenly over the windows of an array of
+    the given NCHW shape
+    """
+    columns = np.broadcast_to(
+        np.asarray(adjoint)[..., None, None] / (kernel_size[0] * kernel_size[1]),
+        adjoint.shape + tuple(kernel_size)
+    )
+
+    return _col2im(columns, input_shape, stride, padding)
+
+
+@profiler.instrument
+def conv2d(array, filters, stride=1, padding=0, name=None):
+    """
+    defines a node in the computational graph representing a 2D convolution
+    (cross-correlation) of an NCHW array with a bank of filters
+
+    Parameters:
+    ----------
+    array: Node | ndarray
+        the input of shape (N, C, H, W)
+    filters: Node | ndarray
+        the filters of shape (F, C, KH, KW)
+    stride: int | (int, int)
+        the steps between the filter applications
+    padding: int | (int, int)
+        the number of zero rows and columns padded on each side
+    name: String
+        node's name in the graph
+    """
+    if not isinstance(array, Node):
+        array = ConstantNode.create_using(array)
+    if not isinstance(filters, Node):
+        filters = ConstantNode.create_using(filters)
+    stride, padding = _pair(stride), _pair(padding)
+
+    opvalue = _conv2d(array, filters, stride, padding)
+    opnode = OperationalNode.create_using(opvalue, 'conv2d', array, filters, name=name)
+
+    # save info for gradient computation
+    opnode.stride = stride
+    opnode.padding = padding
+
+    return opnode
+
+
+@profiler.instrument
+def conv2d_backprop_input(adjoint, filters, input_shape, stride=1, padding=0, name=None):
+    """
+    defines a node in the computational graph representing the adjoint of a
+    conv2d input, i.e. the transposed convolution of the adjoint with filters
+
+    Parameters:
+    ----------
+    adjoint: Node | ndarray
+        the adjoint of the convolution output of shape (N, F, OH, OW)
+    filters: Node | ndarray
+        the filters of shape (F, C, KH, KW)
+    input_shape: tuple
+        the NCHW shape of the convolution input
+    stride: int | (int, int)
+        the steps between the filter applications
+    padding: int | (int, int)
+        the number of zero rows and columns padded on each side
+    name: String
+        node's name in the graph
+    """
+    if not isinstance(adjoint, Node):
+        adjoint = ConstantNode.create_using(adjoint)
+    if not isinstance(filters, Node):
+        filters = ConstantNode.create_using(filters)
+    stride, padding = _pair(stride), _pair(padding)
+
+    opvalue = _conv2d_backprop_input(adjoint, filters, input_shape, stride, padding)
+
+    opnode = OperationalNode.create_using(
+        opvalue, 'conv2d_backprop_input', adjoint, filters, name=name
+    )
+
+    # save info for gradient computation
+    opnode.stride = stride
+    opnode.padding = padding
+
+    return opnode
+
+
+@profiler.instrument
+def conv2d_backprop_filter(array, adjoint, kernel_size, stride=1, padding=0, name=None):
+    """
+    defines a node in the computational graph representing the adjoint of
+    conv2d filters, i.e. the correlation of the input with the adjoint
+
+    Parameters:
+    ----------
+    array: Node | ndarray
+        the convolution input of shape (N, C, H, W)
+    adjoint: Node | ndarray
+        the adjoint of the convolution output of shape (N, F, OH, OW)
+    kernel_size: int | (int, int)
+        the height and width of the filters
+    stride: int | (int, int)
+        the steps between the filter applications
+    padding: int | (int, int)
+        the number of zero rows and columns padded on each side
+    name: String
+        node's name in the graph
+    """
+    if not isinstance(array, Node):
+        array = ConstantNode.create_using(array)
+    if not isinstance(adjoint, Node):
+        adjoint = ConstantNode.create_using(adjoint)
+    kernel_size, stride, padding = _pair(kernel_size), _pair(stride), _pair(padding)
+
+    columns = _im2col(array, kernel_size, stride, padding)
+    opvalue = np.tensordot(adjoint, columns, axes=([0, 2, 3], [0, 2, 3]))
+
+    opnode = OperationalNode.create_using(
+        opvalue, 'conv2d_backprop_filter', array, adjoint, name=name
+    )
+
+    # save info for gradient computation
+    opnode.stride = stride
+    opnode.padding = padding
+
+    return opnode
+
+
+@profiler.instrument
+def max_pool2d(array, kernel_size, stride=None, padding=0, name=None):
+    """
+    defines a node in the computational graph representing a 2D max pooling
+    of an NCHW array
+
+    Parameters:
+    ----------
+    array: Node | ndarray
+        the input of shape (N, C, H, W)
+    kernel_size: int | (int, int)
+        the height and width of the pooling windows
+    stride: int | (int, int)
+        the steps between the windows, defaults to kernel_size
+    padding: int | (int, int)
+        the number of rows and columns padded on each side with -inf
+    name: String
+        node's name in the graph
+    """
+    if not isinstance(array, Node):
+        array = ConstantNode.create_using(array)
+    kernel_size = _pair(kernel_size)
+    stride = kernel_size if stride is None else _pair(stride)
+    padding = _pair(padding)
+
+    opvalue, argmax = _max_pool2d(array, kernel_size, stride, padding)
+    opnode = OperationalNode.create_using(opvalue, 'max_pool2d', array, name=name)
+
+    # save info for gradient computation
+    opnode.kernel_size = kernel_size
+    opnode.stride = stride
+    opnode.padding = padding
+    opnode.argmax = argmax
+
+    return opnode
+
+
+@profiler.instrument
+def max_pool2d_backprop(adjoint, argmax, input_shape, kernel_size, stride, padding, name=None):
+    """
+    defines a node in the computational graph representing the adjoint of a
+    max pooling input, the adjoint is routed to the selected window elements
+
+    Parameters:
+    ----------
+    adjoint: Node | ndarray
+        the adjoint of the pooling output of shape (N, C, OH, OW)
+    argmax: ndarray of int
+        the flat index of the selected element in each window
+    input_shape: tuple
+        the NCHW shape of the pooling input
+    kernel_size, stride, padding: (int, int)
+        the pooling windows configuration
+    name: String
+        node's name in the graph
+    """
+    if not isinstance(adjoint, Node):
+        adjoint = ConstantNode.create_using(adjoint)
+
+    opvalue = _max_pool2d_backprop(adjoint, argmax, input_shape, kernel_size, stride, padding)
+
+    opnode = OperationalNode.create_using(opvalue, 'max_pool2d_backprop', adjoint, name=name)
+
+    # save info for gradient computation
+    opnode.kernel_size = kernel_size
+    opnode.stride = stride
+    opnode.padding = padding
+    opnode.argmax = argmax
+
+    return opnode
+
+
+@profiler.instrument
+def max_pool2d_select(array, argmax, kernel_size, stride, padding, name=None):
+    """
+    defines a node in the computational graph representing the selection of
+    the given window elements, the adjoint of max_pool2d_backprop
+
+    Parameters:
+    ----------
+    array: Node | ndarray
+        the input of shape (N, C, H, W)
+    argmax: ndarray of int
+        the flat index of the element to select in each window
+    kernel_size, stride, padding: (int, int)
+        the pooling windows configuration
+    name: String
+        node's name in the graph
+    """
+    if not isinstance(array, Node):
+        array = ConstantNode.create_using(array)
+
+    windows = _im2col(array, kernel_size, stride, padding)
+    windows = windows.reshape(windows.shape[:4] + (-1,))
+    opvalue = np.take_along_axis(windows, argmax[..., None], axis=-1)[..., 0]
+
+    opnode = OperationalNode.create_using(opvalue, 'max_pool2d_select', array, name=name)
+
+    # save info for gradient computation
+    opnode.kernel_size = kernel_size
+    opnode.stride = stride
+    opnode.padding = padding
+    opnode.argmax = argmax
+
+    return opnode
+
+
+@profiler.instrument
+def avg_pool2d(array, kernel_size, stride=None, padding=0, name=None):
+    """
+    defines a node in the computational graph representing a 2D average
+    pooling of an NCHW array, padded zeros count in the averages
+
+    Parameters:
+    ----------
+    array: Node | ndarray
+        the input of shape (N, C, H, W)
+    kernel_size: int | (int, int)
+        the height and width of the pooling windows
+    stride: int | (int, int)
+        the steps between the windows, defaults to kernel_size
+    padding: int | (int, int)
+        the number of zero rows and columns padded on each side
+    name: String
+        node's name in the graph
+    """
+    if not isinstance(array, Node):
+        array = ConstantNode.create_using(array)
+    kernel_size = _pair(kernel_size)
+    stride = kernel_size if stride is None else _pair(stride)
+    padding = _pair(padding)
+
+    opvalue = _avg_pool2d(array, kernel_size, stride, padding)
+
+    opnode = OperationalNode.create_using(opvalue, 'avg_pool2d', array, name=name)
+
+    # save info for gradient computation
+    opnode.kernel_size = kernel_size
+    opnode.stride = stride
+    opnode.padding = padding
+
+    return opnode
+
+
+@profiler.instrument
+def avg_pool2d_backprop(adjoint, input_shape, kernel_size, stride, padding, name=None):
+    """
+    defines a node in the computational graph representing the adjoint of an
+    average pooling input, the adjoint is spread evenly over each window
+
+    Parameters:
+    ----------
+    adjoint: Node | ndarray
+        the adjoint of the pooling output of shape (N, C, OH, OW)
+    input_shape: tuple
+        the NCHW shape of the pooling input
+    kernel_size, stride, padding: (int, int)
+        the pooling windows configuration
+    name: String
+        node's name in the graph
+    """
+    if not isinstance(adjoint, Node):
+        adjoint = ConstantNode.create_using(adjoint)
+
+    opvalue = _avg_pool2d_backprop(adjoint, input_shape, kernel_size, stride, padding)
+
+    opnode = OperationalNode.create_using(opvalue, 'avg_pool2d_backprop', adjoint, name=name)
+
+    # save info for gradient computation
+    opnode.kernel_size = kernel_size
+    opnode.stride = stride
+    opnode.padding = padding
+
+    return opnode
+
+
+@profiler.instrument
+def cast(array, dtype, name=None):
+    """
+    defines a node in the computational graph representing a dtype conversion
+
+    Parameters:
+    ----------
+    array: Node | ndarray | number
+        the array to be converted
+    dtype: np.dtype | type
+        the dtype to convert to
+    name: String
+        node's name in the graph
+    """
+    if not isinstance(array, Node):
+        array = ConstantNode.create_using(array)
+    opvalue = np.asarray(array).astype(dtype)
+
+    return OperationalNode.create_using(opvalue, 'cast', array, name=name)
+
+
+def register_op(name, forward=None, vjp=None, jvp=None, batched=None, batched_vjp=None):
+    """
+    registers a user-defined op, e.g. a fused kernel, with its rules so the
+    autodiff sweeps treat its nodes like the built-in ones. Used without a
+    forward it decorates the forward function
+
+    Parameters:
+    ----------
+    name: String
+        the op's name, the opname of its nodes
+    forward: callable
+        computes the op's value as an ndarray, it takes the operands values
+        followed by the op's keyword attributes
+    vjp: callable
+        vjp(prev_adjoint, node) returns the adjoints of the node's operands,
+        built from compgraph ops so they can be differentiated again, with
+        None for the operands that take no adjoint
+    jvp: callable
+        jvp(node, tangents) returns the tangent of the node, see autodiff.jvps
+    batched: callable
+        batched(node, values, batched) returns the batched value of the node,
+        see autodiff.batching
+    batched_vjp: callable
+        batched_vjp(node, adjoint, output, values, batched, needs) returns the
+        per-example adjoints of the operands, see autodiff.batching
+
+    Returns: callable
+        the op, op(*operands, name=None, **attributes) creates its node and
+        saves the attributes on it, the op's OpDef is its opdef attribute
+    """
+    if forward is None:
+        return lambda forward: register_op(name, forward, vjp, jvp, batched, batched_vjp)
+
+    if name in registry._opcodes:
+        opdef = registry.get_op(name)
+        if name in registry._BUILTIN_OPS or opdef.forward is not None:
+            raise ValueError("an op named %r is already registered" % name)
+    else:
+        opdef = registry._opdef(name)
+
+    # an op known only from a loaded graph keeps its opcode and gets its rules
+    opdef.forward = forward
+    opdef.vjp, opdef.jvp = vjp, jvp
+    opdef.batched, opdef.batched_vjp = batched, batched_vjp
+
+    def op(*operands, name=None, **attributes):
+        operands = [
+            operand if isinstance(operand, (Node, SparseNode)) else ConstantNode.create_using(operand)
+            for operand in operands
+        ]
+        opvalue = forward(
+            *(operand.value if isinstance(operand, SparseNode) else np.asarray(operand)
+              for operand in operands),
+            **attributes
+        )
+        opnode = OperationalNode.create_using(np.asarray(opvalue), opdef.name, *operands, name=name)
+        for key, value in attributes.items():
+            setattr(opnode, key, value)
+
+        return opnode
+
+    op.__name__ = op.__qualname__ = opdef.name
+    op.__doc__ = forward.__doc__
+    op = profiler.instrument(op)
+    op.opdef = opdef
+
+    return op
+
+
+def get_op(op):
+    """
+    returns a registered op definition with its opcode and rules
+
+    Parameters:
+    ----------
+    op: String | int
+        the op's name or opcode
+
+    Returns: OpDef
+    """
+    return registry.get_op(op)
+
+
 def reset():
-    """ resets the count for all node types
+    """ resets the count for all node types in the current graph, see Graph
     """
-    OperationalNode.nodes_counter = {}
-    ConstantNode.count = 0
-    VariableNode.count = 0
+    get_graph().reset()
@@ -0,0 +1,232 @@
+import json
+import numpy as np
+from compgraph.nodes import *
+
+# the formats export writes and the fill colors of the kinds of nodes in DOT
+FORMATS = ('dot', 'json')
+_DOT_COLORS = {'variable': 'lightblue', 'constant': 'orange', 'op': '#d5a6f9'}
+
+
+def _walk(roots, index):
+    """
+    yields the nodes of the graphs of the given roots in topological order as
+    they are finished, each node is yielded once and given the next id in the
+    index so its operands ids are known when it's yielded
+
+    Parameters:
+    ----------
+    roots: list
+        the nodes to walk their graphs
+    index: dict
+        filled with the ids of the yielded nodes by their python id
+    """
+    visited = set()
+    for root in roots:
+        if id(root) in visited:
+            continue
+        visited.add(id(root))
+        stack = [(root, iter(getattr(root, 'operands', ())))]
+
+        while len(stack) > 0:
+            current, operands = stack[-1]
+            for operand in operands:
+                if id(operand) not in visited:
+                    visited.add(id(operand))
+                    stack.append((operand, iter(getattr(operand, 'operands', ()))))
+                    break
+            else:
+                stack.pop()
+                index[id(current)] = len(index)
+                yield current
+
+
+def _kind(node):
+    """
+    returns the kind of the given node in an export record
+    """
+    if isinstance(node, SparseVariableNode):
+        return 'sparse_variable'
+    if isinstance(node, SparseConstantNode):
+        return 'sparse_constant'
+    if isinstance(node, VariableNode):
+        return 'variable'
+    if isinstance(node, OperationalNode):
+        return 'op'
+
+    return 'constant'
+
+
+def _stats(node):
+    """
+    returns the statistics of the value of the given node over its finite
+    entries, the stored entries for a sparse node, and the count of the
+    non-finite ones
+
+    Parameters:
+    ----------
+    node: Node | SparseNode
+        the node to describe its value
+
+    Returns: dict
+    """
+    values = node.value.data if isinstance(node, SparseNode) else np.asarray(node)
+    values = values.reshape(-1)
+    if values.dtype.kind == 'b':
+        values = values.view(np.int8)
+    if values.size == 0:
+        return {'min': None, 'max': None, 'mean': None, 'std': None, 'nonfinite': 0}
+
+    # the graphs are mostly small arrays, so the checks for non-finite
+    # entries only run when the sum isn't finite
+    nonfinite = 0
+    total = np.add.reduce(values, dtype=np.complex128 if values.dtype.kind == 'c' else np.float64)
+    if not np.isfinite(total):
+        finite = np.isfinite(values)
+        nonfinite = int(values.size - np.count_nonzero(finite))
+        if nonfinite != 0:
+            values = values[finite]
+            if values.size == 0:
+                return {'min': None, 'max': None, 'mean': None, 'std': None, 'nonfinite': nonfinite}
+            total = np.add.reduce(values, dtype=total.dtype)
+
+    mean = total / values.size
+    deviations = np.abs(values - mean)
+
+    return {
+        'min': float(np.minimum.reduce(values).real),
+        'max': float(np.maximum.reduce(values).real),
+        'mean': float(mean.real),
+        'std': float(np.sqrt(np.dot(deviations, deviations) / values.size)),
+        'nonfinite': nonfinite
+    }
+
+
+def _record(node, index, stats):
+    """
+    returns the export record of the given node
+
+    Parameters:
+    ----------
+    node: Node | SparseNode
+        the node to describe
+    index: dict
+        the ids of the exported nodes by their python id
+    stats: Boolean
+        a flag to add the statistics of the node's value
+
+    Returns: dict
+    """
+    if isinstance(node, SparseNode):
+        nbytes = sum(int(getattr(node.value, part).nbytes) for part in ('data', 'indices', 'indptr'))
+    else:
+        nbytes = int(node.nbytes)
+
+    record = {
+        'id': index[id(node)],
+        'name': getattr(node, 'name', None),
+        'kind': _kind(node),
+        'op': getattr(node, 'opname', None),
+        'opcode': node.opdef.opcode if hasattr(node, 'opdef') else None,
+        'shape': list(node.shape),
+        'dtype': str(node.dtype),
+        'nbytes': nbytes,
+        'operands': [index[id(operand)] for operand in getattr(node, 'operands', ())]
+    }
+    if stats:
+        record['stats'] = _stats(node)
+
+    return record
+
+
+def _dot_escape(value):
+    """
+    returns the given value as the content of a quoted DOT string
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _write_dot(f, records, outputs):
+    """
+    writes the given records as a DOT digraph, the records fields are kept
+    as attributes of the nodes
+    """
+    f.write('digraph G {\n  rankdir=LR;\n  node [style=filled];\n')
+    for record in records:
+        title = record['name'] if record['name'] is not None else '#%d' % record['id']
+        details = record['op'] if record['op'] is not None else record['kind']
+        attributes = {
+            'label': '%s\\n%s' % (_dot_escape(title), _dot_escape('%s %s %s' % (
+                details, tuple(record['shape']), record['dtype']
+            ))),
+            'shape': 'box' if record['kind'] == 'op' else 'ellipse',
+            'fillcolor': _DOT_COLORS[record['kind'].replace('sparse_', '')],
+            'kind': record['kind'],
+            'dtype': record['dtype'],
+            'nbytes': record['nbytes']
+        }
+        if record['op'] is not None:
+            attributes['op'] = record['op']
+            attributes['opcode'] = record['opcode']
+        for key, value in record.get('stats', {}).items():
+            attributes[key] = value
+
+        f.write('  n%d [%s];\n' % (record['id'], ', '.join(
+            # the label is escaped already, its \n is a line break
+            '%s="%s"' % (key, value if key == 'label' else _dot_escape(value))
+            for key, value in attributes.items()
+        )))
+        for position, operand in enumerate(record['operands']):
+            f.write('  n%d -> n%d [operand=%d];\n' % (operand, record['id'], position))
+
+    for output in outputs():
+        f.write('  n%d [peripheries=2];\n' % output)
+    f.write('}\n')
+
+
+def _write_json(f, records, outputs):
+    """
+    writes the given records as a JSON document with a nodes list, each
+    record on its own line, followed by the ids of the outputs
+    """
+    f.write('{"nodes": [\n')
+    separator = ''
+    for record in records:
+        f.write(separator)
+        f.write(json.dumps(record))
+        separator = ',\n'
+    f.write('\n], "outputs": %s}\n' % json.dumps(outputs()))
+
+
+def export(node, path, format='dot', stats=False):
+    """
+    exports the computational graphs of the given nodes to a DOT or a JSON
+    file to inspect them offline. The graph is walked once in topological
+    order and each node is written as soon as it's reached, so the memory
+    used beyond the ids of the visited nodes doesn't grow with the graph
+
+    Parameters:
+    ----------
+    node: Node | list of Node
+        the nodes to export their graphs
+    path: String
+        the path of the file to write
+    format: String
+        'dot' for a graphviz digraph or 'json' for a document holding a list
+        of the nodes records
+    stats: Boolean
+        a flag to add the min, max, mean, std and the non-finite count of
+        each node's value to its record, this reads every value
+    """
+    if format not in FORMATS:
+        raise ValueError("unknown export format %r, expected one of %s" % (format, FORMATS))
+
+    roots = list(node) if isinstance(node, (list, tuple)) else [node]
+    index = {}
+    records = (_record(current, index, stats) for current in _walk(roots, index))
+    outputs = lambda: [index[id(root)] for root in roots]
+
+    with open(path, 'w') as f:
+        if format == 'dot':
+            _write_dot(f, records, outputs)
+        else:
+            _write_json(f, records, outputs)
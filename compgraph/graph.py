@@ -0,0 +1,65 @@
+import itertools
+from collections import defaultdict
+from contextvars import ContextVar
+
+# the graphs entered in the current context, innermost last. A context
+# variable keeps them apart across threads and asyncio tasks: a task starts
+# with the graphs of the context it was created in, a thread with none
+_entered = ContextVar('compgraph_graphs', default=())
+
+
+class Graph:
+
+    def __init__(self):
+        """
+        creates a graph context, the nodes created inside a `with Graph():`
+        block are named by the graph's own counters, so graphs built in
+        parallel threads or asyncio tasks each get their own names, e.g. _0,
+        const_0 and add_0, without sharing any state
+        """
+        self.counters = defaultdict(itertools.count)
+
+    def unique_name(self, prefix):
+        """
+        returns the next name for an unnamed node in this graph
+
+        Parameters:
+        ----------
+        prefix: String
+            the prefix of the name, the opname for an operational node
+
+        Returns: String
+        """
+        # a single C-level call, so threads sharing a graph don't get the
+        # same id without a lock
+        return "%s_%d" % (prefix, next(self.counters[prefix]))
+
+    def reset(self):
+        """
+        resets the names counters of the graph
+        """
+        self.counters = defaultdict(itertools.count)
+
+    def __enter__(self):
+        _entered.set(_entered.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _entered.set(_entered.get()[:-1])
+        return False
+
+
+# the graph of the nodes created outside of any graph context
+_default_graph = Graph()
+
+
+def get_graph():
+    """
+    returns the graph the nodes created in the current context belong to,
+    the innermost entered graph or the default graph
+
+    Returns: Graph
+    """
+    entered = _entered.get()
+
+    return entered[-1] if len(entered) != 0 else _default_graph
@@ -0,0 +1,343 @@
+from collections import defaultdict
+import numpy as np
+from compgraph.nodes import *
+
+try:
+    from numpy.lib.array_utils import byte_bounds
+except ImportError:  # numpy < 2.0
+    byte_bounds = np.byte_bounds
+
+# the node attributes that describe the graph rather than hold tensors
+_STRUCTURE_ATTRIBUTES = ('name', 'opname', 'operands')
+
+
+def _arrays(value):
+    """
+    yields the arrays held by an attribute value, looking into lists, tuples
+    and sparse matrices
+
+    Parameters:
+    ----------
+    value: object
+        the attribute value
+    """
+    if isinstance(value, SparseNode):
+        value = value.value
+    if isinstance(value, np.ndarray):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _arrays(item)
+    elif is_sparse(value):
+        for part in ('data', 'indices', 'indptr'):
+            yield getattr(value, part)
+
+
+def _label(node):
+    """
+    returns the name of the given node, numpy calls on nodes return nameless
+    nodes that end up in graphs when their results are used as operands
+
+    Parameters:
+    ----------
+    node: Node | SparseNode
+        the node to label
+    """
+    return getattr(node, 'name', '<unnamed %s>' % node.__class__.__name__)
+
+
+def _buffers(node):
+    """
+    returns the arrays holding the value of the given node
+
+    Parameters:
+    ----------
+    node: Node | SparseNode
+        the node to get its buffers
+    """
+    if isinstance(node, SparseNode):
+        return list(_arrays(node.value))
+
+    return [node]
+
+
+def _reachable(roots):
+    """
+    returns the nodes reachable from the given roots through the operands and
+    the nodes saved as attributes, in the order they are discovered
+
+    Parameters:
+    ----------
+    roots: list
+        the nodes to start from
+    """
+    seen = set()
+    order = []
+    stack = list(reversed(roots))
+    while len(stack) > 0:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        order.append(node)
+
+        for operand in getattr(node, 'operands', ()):
+            stack.append(operand)
+        if isinstance(node, OperationalNode):
+            for key, value in node.__dict__.items():
+                # nameless nodes are the results of numpy calls on nodes, not graph nodes
+                if key not in _STRUCTURE_ATTRIBUTES and isinstance(value, (Node, SparseNode)) \
+                        and hasattr(value, 'name'):
+                    stack.append(value)
+
+    return order
+
+
+def _unique_bytes(arrays):
+    """
+    returns the number of bytes covered by the given arrays, counting the
+    memory shared by some of them once, and the groups of arrays that share
+    memory
+
+    Parameters:
+    ----------
+    arrays: list
+        (label, ndarray) pairs
+
+    Returns: (int, list)
+    """
+    intervals = []
+    for label, array in arrays:
+        if array.nbytes == 0:
+            continue
+        low, high = byte_bounds(array)
+        intervals.append((low, high, label, array.nbytes))
+    intervals.sort(key=lambda interval: interval[:2])
+
+    total = 0
+    groups = []
+    group_low, group_high, group = None, None, []
+    for low, high, label, nbytes in intervals + [(None, None, None, 0)]:
+        if low is not None and group_high is not None and low < group_high:
+            group_high = max(group_high, high)
+            group.append((label, nbytes))
+            continue
+
+        if group_high is not None:
+            total += group_high - group_low
+            if len(group) > 1:
+                groups.append({'bytes': group_high - group_low, 'holders': group})
+        group_low, group_high, group = low, high, [(label, nbytes)]
+
+    return total, groups
+
+
+def _labelled_arrays(nodes, attributes):
+    """
+    returns (label, ndarray) pairs for the buffers of the given nodes and the
+    given saved attributes, the attributes that are nodes themselves are
+    left to their node's buffers
+
+    Parameters:
+    ----------
+    nodes: list
+        the nodes
+    attributes: list
+        (node, key, ndarray) for each saved attribute
+    """
+    ids = {id(node) for node in nodes}
+    arrays = [(_label(node), array) for node in nodes for array in _buffers(node)]
+    arrays += [
+        ("%s.%s" % (_label(node), key), array) for node, key, array in attributes
+        if id(array) not in ids
+    ]
+
+    return arrays
+
+
+class MemoryReport:
+
+    def __init__(self, nodes, attributes, roots):
+        """
+        creates a report of the memory held by a graph
+
+        Parameters:
+        ----------
+        nodes: list
+            the reachable nodes
+        attributes: list
+            (node, key, ndarray) for each array saved as a node attribute
+        roots: dict
+            the nodes reachable from each root, or the root itself if it's a
+            plain array, by the root's label
+        """
+        self.nodes = []
+        for node in nodes:
+            self.nodes.append({
+                'name': _label(node),
+                'kind': getattr(node, 'opname', node.__class__.__name__),
+                'shape': tuple(node.shape),
+                'dtype': str(node.dtype),
+                'bytes': sum(int(array.nbytes) for array in _buffers(node)),
+                'saved_bytes': 0
+            })
+        index = {id(node): i for i, node in enumerate(nodes)}
+
+        self.by_opcode = defaultdict(lambda: {'count': 0, 'bytes': 0, 'saved_bytes': 0})
+        self.by_attribute = defaultdict(lambda: {'count': 0, 'bytes': 0})
+        for node, key, array in attributes:
+            self.nodes[index[id(node)]]['saved_bytes'] += int(array.nbytes)
+            self.by_attribute[key]['count'] += 1
+            self.by_attribute[key]['bytes'] += int(array.nbytes)
+
+        for entry in self.nodes:
+            stats = self.by_opcode[entry['kind']]
+            stats['count'] += 1
+            stats['bytes'] += entry['bytes']
+            stats['saved_bytes'] += entry['saved_bytes']
+
+        self.nominal_bytes = sum(entry['bytes'] + entry['saved_bytes'] for entry in self.nodes)
+        self.total_bytes, self.shared = _unique_bytes(_labelled_arrays(nodes, attributes))
+
+        self.roots = {}
+        for label, reachable in roots.items():
+            if isinstance(reachable, list):
+                ids = {id(node) for node in reachable}
+                arrays = _labelled_arrays(
+                    reachable, [attribute for attribute in attributes if id(attribute[0]) in ids]
+                )
+                self.roots[label] = {'nodes': len(reachable), 'bytes': _unique_bytes(arrays)[0]}
+            else:
+                self.roots[label] = {
+                    'nodes': 0, 'bytes': _unique_bytes([(label, array) for array in _arrays(reachable)])[0]
+                }
+
+    def __str__(self):
+        return self.format()
+
+    def format(self, limit=10):
+        """
+        formats the report as text
+
+        Parameters:
+        ----------
+        limit: int
+            the number of the largest nodes and shared buffers to list
+
+        Returns: String
+        """
+        lines = [
+            "%d nodes holding %s, %s counting shared buffers once" % (
+                len(self.nodes), _format_bytes(self.nominal_bytes),
+                _format_bytes(self.total_bytes)
+            ),
+            "",
+            "%-32s %-24s %-20s %12s %12s" % ('largest nodes', 'kind', 'shape', 'value', 'saved')
+        ]
+        largest = sorted(self.nodes, key=lambda entry: entry['bytes'] + entry['saved_bytes'], reverse=True)
+        for entry in largest[:limit]:
+            lines.append("%-32s %-24s %-20s %12s %12s" % (
+                entry['name'], entry['kind'], entry['shape'],
+                _format_bytes(entry['bytes']), _format_bytes(entry['saved_bytes'])
+            ))
+
+        lines += ["", "%-32s %8s %12s %12s" % ('opcode', 'count', 'value', 'saved')]
+        opcodes = sorted(
+            self.by_opcode.items(), key=lambda item: item[1]['bytes'] + item[1]['saved_bytes'], reverse=True
+        )
+        for opcode, stats in opcodes:
+            lines.append("%-32s %8d %12s %12s" % (
+                opcode, stats['count'], _format_bytes(stats['bytes']),
+                _format_bytes(stats['saved_bytes'])
+            ))
+
+        if len(self.by_attribute) != 0:
+            lines += ["", "%-32s %8s %12s" % ('saved attribute', 'count', 'bytes')]
+            attributes = sorted(self.by_attribute.items(), key=lambda item: item[1]['bytes'], reverse=True)
+            for key, stats in attributes:
+                lines.append("%-32s %8d %12s" % (key, stats['count'], _format_bytes(stats['bytes'])))
+
+        if len(self.shared) != 0:
+            lines += ["", "shared buffers"]
+            shared = sorted(self.shared, key=lambda group: group['bytes'], reverse=True)
+            for group in shared[:limit]:
+                lines.append("%12s  %s" % (
+                    _format_bytes(group['bytes']),
+                    ", ".join(label for label, _ in group['holders'])
+                ))
+
+        if len(self.roots) != 0:
+            lines += ["", "%-32s %8s %12s" % ('reachable from', 'nodes', 'bytes')]
+            for label, stats in self.roots.items():
+                lines.append("%-32s %8d %12s" % (label, stats['nodes'], _format_bytes(stats['bytes'])))
+
+        return "\n".join(lines)
+
+    def report(self, limit=10, file=None):
+        """
+        prints the report
+
+        Parameters:
+        ----------
+        limit: int
+            the number of the largest nodes and shared buffers to list
+        file: file
+            the stream to print to, defaults to stdout
+        """
+        print(self.format(limit), file=file)
+
+
+def _format_bytes(nbytes):
+    """
+    formats a number of bytes with a binary unit
+    """
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if nbytes < 1024 or unit == 'GiB':
+            return "%.1f %s" % (nbytes, unit) if unit != 'B' else "%d B" % nbytes
+        nbytes /= 1024
+
+
+def memory_report(roots):
+    """
+    walks the graphs reachable from the given roots and accounts for the
+    memory held by the nodes values and the arrays the ops save for their
+    gradients, e.g. softmax_val or with_keepdims
+
+    Parameters:
+    ----------
+    roots: Node | list | dict
+        the nodes to walk from, a dict like the one returned by
+        reverse.gradient also reports what each of its entries keeps
+        reachable, e.g. the forward graph behind a gradient node
+
+    Returns: MemoryReport
+    """
+    if isinstance(roots, dict):
+        labelled = list(roots.items())
+    elif isinstance(roots, (list, tuple)):
+        labelled = [(root.name, root) for root in roots]
+    else:
+        labelled = [(roots.name, roots)]
+
+    nodes = _reachable([root for _, root in labelled if isinstance(root, (Node, SparseNode))])
+
+    attributes = []
+    for node in nodes:
+        if not isinstance(node, OperationalNode):
+            continue
+        for key, value in node.__dict__.items():
+            if key in _STRUCTURE_ATTRIBUTES:
+                continue
+            for array in _arrays(value):
+                attributes.append((node, key, array))
+
+    roots_reachable = {}
+    if isinstance(roots, dict):
+        for label, root in labelled:
+            if isinstance(root, (Node, SparseNode)):
+                roots_reachable[label] = _reachable([root])
+            else:
+                # a plain array, e.g. a sparse gradient, holds only its own memory
+                roots_reachable[label] = root
+
+    return MemoryReport(nodes, attributes, roots_reachable)
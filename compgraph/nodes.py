@@ -1,5 +1,137 @@
+import sys
 from collections import deque
 import numpy as np
+from compgraph import profiler
+from compgraph import registry
+from compgraph.graph import Graph, get_graph
+
+# the graph-wide dtype policy followed by the nodes constructors
+_dtype_policy = {'dtype': np.dtype(np.float64), 'mixed_precision': False}
+
+
+def set_default_dtype(dtype, mixed_precision=False):
+    """
+    sets the floating point dtype used for the values of newly created nodes
+
+    Parameters:
+    ----------
+    dtype: np.dtype | type
+        the floating point dtype to use, e.g. np.float32
+    mixed_precision: Boolean
+        a flag to keep reductions and adjoints accumulation in float64
+        while the nodes values stay in the given dtype
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'f':
+        raise ValueError("the default dtype must be a floating point type, got %s" % dtype)
+
+    _dtype_policy['dtype'] = dtype
+    _dtype_policy['mixed_precision'] = mixed_precision
+
+
+def get_default_dtype():
+    """
+    returns the floating point dtype used for the values of new nodes
+
+    Returns: np.dtype
+    """
+    return _dtype_policy['dtype']
+
+
+def is_mixed_precision():
+    """
+    returns True if accumulations are carried in float64 regardless of the
+    default dtype
+
+    Returns: Boolean
+    """
+    return _dtype_policy['mixed_precision']
+
+
+def get_accumulator_dtype():
+    """
+    returns the dtype used for reductions and adjoints accumulation
+
+    Returns: np.dtype
+    """
+    if _dtype_policy['mixed_precision']:
+        return np.dtype(np.float64)
+
+    return _dtype_policy['dtype']
+
+
+def _as_default_dtype(val):
+    """
+    converts the given value into an ndarray following the dtype policy,
+    numerical values are cast to the default dtype while booleans are kept
+
+    Parameters:
+    ----------
+    val: np.ndarray | Number
+        the value to convert
+    Returns: np.ndarray
+    """
+    dtype = get_default_dtype()
+
+    if not isinstance(val, np.ndarray):
+        return np.array(val, dtype=dtype)
+    if val.dtype.kind in 'iuf' and val.dtype != dtype:
+        return val.astype(dtype)
+
+    return val
+
+
+def _broadcast_axes(shape, result_shape):
+    """
+    returns how an operand of the given shape was broadcast to the shape of
+    an elementwise op's result, so its adjoint can be summed back to the
+    operand's shape without comparing shapes during the backward sweep
+
+    Parameters:
+    ----------
+    shape: tuple
+        the shape of the operand
+    result_shape: tuple
+        the shape of the op's result
+
+    Returns: tuple | None
+        None if the operand wasn't broadcast, otherwise (axes, keepdims,
+        shape): the axes of the result to sum over, the keepdims flag of
+        the sum and the shape to reshape the sum into, None if the sum has
+        the operand's shape already
+    """
+    if shape == result_shape:
+        return None
+
+    leading = len(result_shape) - len(shape)
+    ones = tuple(
+        leading + axis for axis, size in enumerate(shape)
+        if size == 1 and result_shape[leading + axis] != 1
+    )
+    if leading == 0:
+        return ones, True, None
+
+    # without keepdims the leading axes are dropped, the broadcast ones of
+    # the operand too so they're restored by a reshape
+    return tuple(range(leading)) + ones, False, (tuple(shape) if len(ones) != 0 else None)
+
+
+def is_sparse(val):
+    """
+    checks if the given value is a scipy.sparse matrix or array
+
+    Parameters:
+    ----------
+    val: object
+        the value to check
+    Returns: Boolean
+    """
+    # scipy is only needed for sparse operands and isn't imported here, no
+    # value can be a sparse matrix before scipy.sparse is imported
+    sparse = sys.modules.get('scipy.sparse')
+
+    return sparse is not None and sparse.issparse(val)
+
 
 class Node(np.ndarray):
 
@@ -22,6 +154,24 @@ class Node(np.ndarray):
 
         return newobj
 
+    def __reduce__(self):
+        """
+        extends ndarray's pickling with the node's attributes, e.g. its name,
+        opname and operands, which ndarray alone drops
+        """
+        constructor, args, state = super().__reduce__()
+
+        return constructor, args, (state, self.__dict__)
+
+    def __setstate__(self, state):
+        """
+        restores the pickled ndarray state along with the node's attributes
+        """
+        ndarray_state, attributes = state
+        super().__setstate__(ndarray_state)
+        self.__dict__.update(attributes)
+
+    @profiler.instrument
     def _nodify(self, method_name, other, opname, self_first=True):
         """
         augments the operation of given arithmetic super method
@@ -46,7 +196,8 @@ class Node(np.ndarray):
 
         return OperationalNode.create_using(opvalue, opname,
             self if self_first else other,
-            other if self_first else self
+            other if self_first else self,
+            broadcast=True
         )
 
 
@@ -86,22 +237,68 @@ class Node(np.ndarray):
     def __rpow__(self, other):
         return self._nodify('__rpow__', other, 'pow', False)
 
+    def _compare(self, method_name, other, ufunc):
+        """
+        augments the given comparison super method by remembering how its
+        result was computed, the result isn't a graph node but transforms
+        that re-evaluate a graph, e.g. autodiff.vmap, use it to recompute the
+        conditions of where nodes from new values
+
+        Parameters:
+        ----------
+        method_name: String
+            the name of the super method to be augmented
+        other: Node | np.ndarray | Number
+            the other operand to the comparison
+        ufunc: np.ufunc
+            the ufunc computing the comparison
+
+        Returns: Node
+        """
+        result = getattr(np.ndarray, method_name)(self, other)
+        if isinstance(result, Node):
+            result.comparison = (ufunc, self, other)
+
+        return result
+
+    def __lt__(self, other):
+        return self._compare('__lt__', other, np.less)
+
+    def __le__(self, other):
+        return self._compare('__le__', other, np.less_equal)
+
+    def __gt__(self, other):
+        return self._compare('__gt__', other, np.greater)
+
+    def __ge__(self, other):
+        return self._compare('__ge__', other, np.greater_equal)
+
+    def __eq__(self, other):
+        return self._compare('__eq__', other, np.equal)
+
+    def __ne__(self, other):
+        return self._compare('__ne__', other, np.not_equal)
+
+    # defining __eq__ drops the inherited __hash__, ndarrays aren't hashable either
+    __hash__ = None
+
     @property
     def T(self):
         """
         augments numpy's T attribute by creating a node for the operation
         """
+        return self._transpose()
+
+    @profiler.instrument
+    def _transpose(self):
         opvalue = np.transpose(self)
         return OperationalNode.create_using(opvalue, 'transpose', self)
 
 
 class OperationalNode(Node):
 
-    # a static attribute to count for unnamed nodes
-    nodes_counter = {}
-
     @staticmethod
-    def create_using(opresult, opname, operand_a, operand_b=None, name=None):
+    def create_using(opresult, opname, *operands, name=None, broadcast=False):
         """
         craetes an graph node representing an operation
 
@@ -111,44 +308,57 @@ class OperationalNode(Node):
             the result of the operation
         opname: String
             the name of the operation
-        operand_a: Node
-            the first operand to the operation
-        operand_b: Node
-            the second operand to the operation if any
+        operands: Node
+            the operands to the operation, any number of them
         name: String
             the name of the node
+        broadcast: Boolean
+            a flag for elementwise ops broadcasting their operands, the axes
+            each operand was broadcast along are saved as broadcast_axes
 
         Returns: OperationalNode
         """
 
+        opresult = np.copy(opresult, order='A')
         obj = OperationalNode(
             strides=opresult.strides,
             shape=opresult.shape,
             dtype=opresult.dtype,
-            buffer=np.copy(opresult)
+            buffer=opresult
         )
 
         obj.opname = opname
-        obj.operand_a = operand_a
-        obj.operand_b = operand_b
+        obj.opdef = registry._opdef(opname)
+        obj.operands = tuple(operand for operand in operands if operand is not None)
 
         if name is not None:
             obj.name = name
         else:
-            if opname not in OperationalNode.nodes_counter:
-                OperationalNode.nodes_counter[opname] = 0
+            obj.name = get_graph().unique_name(opname)
 
-            node_id = OperationalNode.nodes_counter[opname]
-            OperationalNode.nodes_counter[opname] += 1
-            obj.name = "%s_%d" % (opname, node_id)
+        if broadcast:
+            broadcast_axes = tuple(_broadcast_axes(operand.shape, obj.shape) for operand in obj.operands)
+            if any(axes is not None for axes in broadcast_axes):
+                obj.broadcast_axes = broadcast_axes
 
         return obj
 
+    @property
+    def operand_a(self):
+        """
+        the first operand of the operation, kept for binary-style access
+        """
+        return self.operands[0]
+
+    @property
+    def operand_b(self):
+        """
+        the second operand of the operation if any, kept for binary-style access
+        """
+        return self.operands[1] if len(self.operands) > 1 else None
 
-class ConstantNode(Node):
 
-     # a static attribute to count the unnamed instances
-     count = 0
+class ConstantNode(Node):
 
      @staticmethod
      def create_using(val, name=None):
@@ -162,8 +372,9 @@ class ConstantNode(Node):
         name: String
          the node's name
         """
-        if not isinstance(val, np.ndarray):
-            val = np.array(val, dtype=float)
+        if is_sparse(val):
+            return SparseConstantNode.create_using(val, name)
+        val = _as_default_dtype(val)
 
         obj = ConstantNode(
             strides=val.strides,
@@ -174,17 +385,13 @@ class ConstantNode(Node):
         if name is not None:
             obj.name = name
         else:
-            obj.name = "const_%d" % (ConstantNode.count)
-            ConstantNode.count += 1
+            obj.name = get_graph().unique_name("const")
 
         return obj
 
 
 class VariableNode(Node):
 
-     # a static attribute to count the unnamed instances
-     count = 0
-
      @staticmethod
      def create_using(val, name=None):
         """
@@ -197,8 +404,9 @@ class VariableNode(Node):
         name: String
             the node's name
         """
-        if not isinstance(val, np.ndarray):
-            val = np.array(val, dtype=float)
+        if is_sparse(val):
+            return SparseVariableNode.create_using(val, name)
+        val = _as_default_dtype(val)
 
         obj = VariableNode(
             strides=val.strides,
@@ -209,23 +417,148 @@ class VariableNode(Node):
         if name is not None:
             obj.name = name
         else:
-            obj.name = "_%d" % (VariableNode.count)
-            VariableNode.count += 1
+            obj.name = get_graph().unique_name("")
 
         return obj
 
 
+class SparseNode:
+
+    def __init__(self, matrix, name):
+        """
+        creates an object that wraps a scipy.sparse matrix into a structure that
+        represents a leaf node in a computational graph, the matrix is kept
+        in CSR format so its sparsity pattern stays fixed
+
+        Parameters:
+        ----------
+        matrix: scipy.sparse matrix | array
+            the sparse value of the node
+        name: String
+            the node's name
+        """
+        matrix = matrix.tocsr()
+        if matrix.dtype.kind in 'iuf' and matrix.dtype != get_default_dtype():
+            matrix = matrix.astype(get_default_dtype())
+        matrix.sum_duplicates()
+
+        self.value = matrix
+        self.name = name
+
+    @property
+    def shape(self):
+        return self.value.shape
+
+    @property
+    def ndim(self):
+        return self.value.ndim
+
+    @property
+    def dtype(self):
+        return self.value.dtype
+
+    @property
+    def nnz(self):
+        return self.value.nnz
+
+    @property
+    def T(self):
+        """
+        returns the transposed matrix as a constant, this is used by the
+        gradient rules where the sparse operand is not differentiated again
+        """
+        return SparseConstantNode(self.value.T, "%s_T" % (self.name))
+
+    def __repr__(self):
+        return "%s(%s, shape=%s, nnz=%d)" % (
+            self.__class__.__name__, self.name, self.shape, self.nnz
+        )
+
+
+class SparseConstantNode(SparseNode):
+
+     @staticmethod
+     def create_using(val, name=None):
+        """
+        creates a graph node representing a sparse constant
+
+        Parameters:
+        ----------
+        val: scipy.sparse matrix | array
+            the value of the constant
+        name: String
+            the node's name
+        """
+        if name is None:
+            name = get_graph().unique_name("const")
+
+        return SparseConstantNode(val, name)
+
+
+class SparseVariableNode(SparseNode):
+
+     @staticmethod
+     def create_using(val, name=None):
+        """
+        creates a graph node representing a sparse variable, its gradient is
+        returned as a sparse matrix with the same sparsity pattern
+
+        Parameters:
+        ----------
+        val: scipy.sparse matrix | array
+            the value of the variable
+        name: String
+            the node's name
+        """
+        if name is None:
+            name = get_graph().unique_name("")
+
+        return SparseVariableNode(val, name)
+
+
+def topological_sort(node):
+    """
+    returns the nodes of the graph ending at the given node in topological
+    order, every node comes after all of its operands. The traversal is
+    iterative so deep graphs don't hit the recursion limit
+
+    Parameters:
+    ----------
+    node: Node
+        the node to sort its computational graph
+
+    Returns: list of Node
+    """
+    order = []
+    visited = {id(node)}
+    stack = [(node, iter(getattr(node, 'operands', ())))]
+
+    while len(stack) > 0:
+        current, operands = stack[-1]
+        for operand in operands:
+            if id(operand) not in visited:
+                visited.add(id(operand))
+                stack.append((operand, iter(getattr(operand, 'operands', ()))))
+                break
+        else:
+            stack.pop()
+            order.append(current)
+
+    return order
+
+
 class NodesQueue:
 
     def __init__(self):
         """
-        creates an object that runs two parallel queus, one for the nodes
-        and the other for the node names, this captures the uniqueness of
-        a node via name even if it shares the same value as another
+        creates an object that runs a queue of nodes along with a count of
+        the queued nodes by name, this captures the uniqueness of a node via
+        name even if it shares the same value as another, and makes the
+        membership test O(1)
         """
 
         self.nodes = deque()
-        self.nodes_ids = deque()
+        self.nodes_ids = {}
 
     def push(self, node):
         """
@@ -237,7 +570,7 @@ class NodesQueue:
             the node to be pushed
         """
         self.nodes.append(node)
-        self.nodes_ids.append(node.name)
+        self.nodes_ids[node.name] = self.nodes_ids.get(node.name, 0) + 1
 
 
     def pop(self):
@@ -247,15 +580,17 @@ class NodesQueue:
         Returns: Node
         """
         node = self.nodes.popleft()
-        self.nodes_ids.popleft()
+        self.nodes_ids[node.name] -= 1
+        if self.nodes_ids[node.name] == 0:
+            del self.nodes_ids[node.name]
 
         return node
 
     def __contains__(self, node):
         """
-        implements the searching operator via `in` by searching in the names
-        queue instead of the nodes themselves queue to capture unique nodes
-        with exact numerical values
+        implements the searching operator via `in` by looking up the names
+        of the queued nodes instead of the nodes themselves to capture unique
+        nodes with exact numerical values
 
         Parameters:
         ----------
@@ -0,0 +1,287 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+import numpy as np
+
+# the running profiler of the current context, the instrumented call sites
+# only check it against None so profiling costs nothing beyond that check
+# when it's disabled. A context variable keeps the profilers of different
+# threads and asyncio tasks apart, while the gradient workers run in a copy
+# of the caller's context and are recorded by its profiler
+_active = ContextVar('compgraph_profiler', default=None)
+
+# the stack of the running events in each thread, used for the self times
+_local = threading.local()
+
+
+def _shapes(value):
+    """
+    returns the shapes of the given value as a list, nodes lists included
+
+    Parameters:
+    ----------
+    value: object
+        a node, an array, a list of those or anything else
+    """
+    if isinstance(value, (list, tuple)):
+        return [shape for item in value for shape in _shapes(item)]
+    if hasattr(value, 'shape') and not isinstance(value, np.dtype):
+        return [tuple(value.shape)]
+
+    return []
+
+
+def _nbytes(value):
+    """
+    returns the number of bytes held by the given value, nodes lists included
+
+    Parameters:
+    ----------
+    value: object
+        a node, an array, a list of those or anything else
+    """
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(item) for item in value)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+
+    return 0
+
+
+class Profiler:
+
+    def __init__(self):
+        """
+        creates a profiler that records the forward construction and the
+        backward rules of each op while it's active
+        """
+        self.events = []
+        self.start = None
+        self._token = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = _active.set(self)
+
+        return self
+
+    def __exit__(self, *exc_info):
+        # restores the profiler that was active when this one was entered in
+        # the same context
+        _active.reset(self._token)
+        self._token = None
+
+    def run(self, phase, name, fn, *args, **kwargs):
+        """
+        runs the given function and records an event for it
+
+        Parameters:
+        ----------
+        phase: String
+            'forward' for the ops construction, 'backward' for the gradient
+            sweep, the ops created inside a backward event are backward too
+        name: String
+            the name of the event, None to take the opname of the result
+        fn: callable
+            the function to run
+        args, kwargs:
+            the arguments of the function
+
+        Returns: the result of the function
+        """
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+
+        # inside a gradient rule the created ops belong to the backward sweep
+        if phase == 'forward' and len(stack) != 0 and stack[-1][0] == 'backward':
+            phase = 'backward'
+
+        frame = [phase, 0.]
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            stop = time.perf_counter()
+            stack.pop()
+
+        duration = stop - start
+        if len(stack) != 0:
+            stack[-1][1] += duration
+
+        if name is None:
+            first = result[0] if isinstance(result, list) and len(result) != 0 else result
+            name = getattr(first, 'opname', fn.__name__)
+
+        self.events.append({
+            'phase': phase,
+            'name': name,
+            'start': start - self.start,
+            'duration': duration,
+            'self_time': duration - frame[1],
+            'bytes': _nbytes(result),
+            'input_shapes': _shapes(args),
+            'output_shapes': _shapes(result),
+            'thread': threading.get_ident()
+        })
+
+        return result
+
+    def summary(self, sort_by='self_time'):
+        """
+        aggregates the recorded events by phase and op
+
+        Parameters:
+        ----------
+        sort_by: String
+            the statistic to sort the ops by in decreasing order, one of
+            'self_time', 'total_time', 'calls' or 'bytes'
+
+        Returns: list of dict
+            the phase, name, calls, self_time, total_time, bytes and the most
+            frequent shapes signature of each op
+        """
+        stats = {}
+        signatures = defaultdict(lambda: defaultdict(int))
+        for event in self.events:
+            key = (event['phase'], event['name'])
+            if key not in stats:
+                stats[key] = {
+                    'phase': event['phase'], 'name': event['name'], 'calls': 0,
+                    'self_time': 0., 'total_time': 0., 'bytes': 0
+                }
+            stat = stats[key]
+            stat['calls'] += 1
+            stat['self_time'] += event['self_time']
+            stat['total_time'] += event['duration']
+            stat['bytes'] += event['bytes']
+
+            signature = "%s -> %s" % (
+                ", ".join(str(shape) for shape in event['input_shapes']),
+                ", ".join(str(shape) for shape in event['output_shapes'])
+            )
+            signatures[key][signature] += 1
+
+        for key, stat in stats.items():
+            stat['shapes'] = max(signatures[key].items(), key=lambda item: item[1])[0]
+
+        return sorted(stats.values(), key=lambda stat: stat[sort_by], reverse=True)
+
+    def report(self, sort_by='self_time', limit=None, file=None):
+        """
+        prints a table of the ops sorted by the given statistic
+
+        Parameters:
+        ----------
+        sort_by: String
+            the statistic to sort the ops by, see summary
+        limit: int
+            the maximum number of ops to print
+        file: file
+            the stream to print to, defaults to stdout
+        """
+        rows = self.summary(sort_by)
+        total = sum(stat['self_time'] for stat in rows) or 1.
+
+        print("%-9s %-24s %8s %11s %11s %7s %12s  %s" % (
+            'phase', 'op', 'calls', 'self (ms)', 'total (ms)', 'self %', 'bytes', 'shapes'
+        ), file=file)
+        for stat in rows[:limit]:
+            print("%-9s %-24s %8d %11.3f %11.3f %6.1f%% %12d  %s" % (
+                stat['phase'], stat['name'], stat['calls'],
+                stat['self_time'] * 1e3, stat['total_time'] * 1e3,
+                100 * stat['self_time'] / total, stat['bytes'], stat['shapes']
+            ), file=file)
+
+    def export_chrome_trace(self, path):
+        """
+        writes the recorded events in the Chrome trace event format, viewable
+        in chrome://tracing or Perfetto
+
+        Parameters:
+        ----------
+        path: String
+            the path of the JSON file to write
+        """
+        pid = os.getpid()
+        trace = [{
+            'name': event['name'],
+            'cat': event['phase'],
+            'ph': 'X',
+            'ts': event['start'] * 1e6,
+            'dur': event['duration'] * 1e6,
+            'pid': pid,
+            'tid': event['thread'],
+            'args': {
+                'bytes': event['bytes'],
+                'input_shapes': event['input_shapes'],
+                'output_shapes': event['output_shapes']
+            }
+        } for event in self.events]
+
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+def profile():
+    """
+    creates a profiler to use as a context manager, the ops created and the
+    gradient rules run inside the context are recorded
+
+        with cg.profile() as p:
+            loss = ...
+            grads = gradient(loss)
+        p.report()
+        p.export_chrome_trace('trace.json')
+
+    Returns: Profiler
+    """
+    return Profiler()
+
+
+def record(phase, name, fn, *args):
+    """
+    calls the given function, recording it as an event if a profiler is active
+
+    Parameters:
+    ----------
+    phase: String
+        'forward' or 'backward'
+    name: String
+        the name of the event
+    fn: callable
+        the function to call
+    args:
+        the arguments of the function
+    """
+    active = _active.get()
+    if active is None:
+        return fn(*args)
+
+    return active.run(phase, name, fn, *args)
+
+
+def instrument(fn):
+    """
+    decorates a function creating an op so its calls are recorded as forward
+    events while a profiler is active
+
+    Parameters:
+    ----------
+    fn: callable
+        the function to instrument
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        active = _active.get()
+        if active is None:
+            return fn(*args, **kwargs)
+
+        return active.run('forward', None, fn, *args, **kwargs)
+
+    return wrapper
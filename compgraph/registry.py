@@ -0,0 +1,118 @@
+# the table of the ops the graph nodes are created by, each op gets an
+# integer opcode, the index of its OpDef in _ops, and every operational node
+# holds a reference to its OpDef so the autodiff sweeps dispatch to the op's
+# rules through an attribute instead of looking them up by name
+
+_BUILTIN_OPS = (
+    'add', 'sub', 'mul', 'div', 'pow', 'transpose', 'sum', 'mean', 'exp', 'log',
+    'max', 'dot', 'einsum', 'where', 'sin', 'cos', 'softmax_cross_entropy',
+    'softmax', 'reshape', 'squeeze', 'add_n', 'concatenate', 'stack', 'split',
+    'conv2d', 'conv2d_backprop_input', 'conv2d_backprop_filter', 'max_pool2d',
+    'max_pool2d_backprop', 'max_pool2d_select', 'avg_pool2d',
+    'avg_pool2d_backprop', 'cast'
+)
+
+# the rules an op may have, named after the modules defining the built-in
+# ones: autodiff.grads, autodiff.jvps and autodiff.batching
+RULES = ('vjp', 'jvp', 'batched', 'batched_vjp')
+
+_ops = []
+_opcodes = {}
+
+
+class OpDef:
+
+    def __init__(self, name, opcode, forward=None, **rules):
+        """
+        defines an op and the rules differentiating it
+
+        Parameters:
+        ----------
+        name: String
+            the op's name, the opname of its nodes
+        opcode: int
+            the op's index in the registry
+        forward: callable
+            computes the op's value from its operands values, None for the
+            built-in ops which compgraph.api creates the nodes of
+        rules: callable
+            the op's rules by their name in RULES:
+            vjp(prev_adjoint, node) returns the adjoints of the operands,
+            jvp(node, tangents) returns the tangent of the node,
+            batched(node, values, batched) returns the batched value of the
+            node and batched_vjp(node, adjoint, output, values, batched,
+            needs) returns the per-example adjoints of the operands
+        """
+        self.name = name
+        self.opcode = opcode
+        self.forward = forward
+        for rule in RULES:
+            setattr(self, rule, rules.get(rule))
+
+    def __reduce__(self):
+        # ops are pickled by name so unpickled nodes share the registered op
+        return _opdef, (self.name,)
+
+    def __repr__(self):
+        return "OpDef(%r, opcode=%d)" % (self.name, self.opcode)
+
+
+def _opdef(name):
+    """
+    returns the op with the given name, registering it without rules if
+    it's unknown, e.g. an op of a loaded graph that isn't registered yet
+
+    Parameters:
+    ----------
+    name: String
+        the op's name
+
+    Returns: OpDef
+    """
+    if name not in _opcodes:
+        _opcodes[name] = len(_ops)
+        _ops.append(OpDef(name, len(_ops)))
+
+    return _ops[_opcodes[name]]
+
+
+def get_op(op):
+    """
+    returns a registered op
+
+    Parameters:
+    ----------
+    op: String | int
+        the op's name or opcode
+
+    Returns: OpDef
+    """
+    if isinstance(op, str):
+        if op not in _opcodes:
+            raise KeyError("no op named %r is registered" % op)
+        return _ops[_opcodes[op]]
+
+    return _ops[op]
+
+
+def attach_rules(namespace, suffix, rule):
+    """
+    attaches the rules a module defines for the built-in ops, the rule of
+    an op is looked up as {opname}{suffix} in the module's namespace
+
+    Parameters:
+    ----------
+    namespace: dict
+        the module's globals
+    suffix: String
+        the suffix of the rules names, e.g. '_grad'
+    rule: String
+        the name of the rule in RULES, e.g. 'vjp'
+    """
+    for name in _BUILTIN_OPS:
+        if name + suffix in namespace:
+            setattr(_ops[_opcodes[name]], rule, namespace[name + suffix])
+
+
+for _name in _BUILTIN_OPS:
+    _opdef(_name)
@@ -0,0 +1,307 @@
+import json
+import struct
+import numpy as np
+from compgraph.nodes import *
+from compgraph import registry
+
+# the layout of a graph file: the magic bytes, the header length as uint64,
+# the JSON header, then the tensors payloads each aligned to ALIGNMENT bytes
+MAGIC = b'CGRAPH01'
+ALIGNMENT = 64
+
+# the kinds of nodes in the topology arrays
+CONSTANT, VARIABLE, OPERATIONAL, SPARSE_CONSTANT, SPARSE_VARIABLE = range(5)
+
+
+class _TensorsWriter:
+
+    def __init__(self):
+        """
+        creates an object that collects the tensors to write and assigns
+        each one its aligned offset in the payloads section
+        """
+        self.tensors = []
+        self.entries = []
+        self.size = 0
+
+    def add(self, array):
+        """
+        adds an array to the payloads and returns its index
+
+        Parameters:
+        ----------
+        array: ndarray
+            the array to add
+        Returns: int
+        """
+        # np.ascontiguousarray would turn a 0-d array into a (1,) one
+        array = np.asarray(array, order='C')
+        self.entries.append({
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': self.size
+        })
+        self.tensors.append(array)
+        self.size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+        return len(self.tensors) - 1
+
+
+def _encode(value, ids, tensors):
+    """
+    encodes an attribute value into a JSON compatible structure, arrays go
+    to the tensors payloads and nodes are referred to by their ids
+
+    Parameters:
+    ----------
+    value: object
+        the attribute value to encode
+    ids: dict
+        the ids of the saved nodes by their python id
+    tensors: _TensorsWriter
+        the writer collecting the tensors
+    """
+    if isinstance(value, (Node, SparseNode)) and id(value) in ids:
+        return {'node': ids[id(value)]}
+    if isinstance(value, Node) and hasattr(value, 'name'):
+        # a node outside the saved graph is kept as a constant
+        return {'constant': tensors.add(value), 'name': getattr(value, 'name', None)}
+    if isinstance(value, np.ndarray):
+        return {'array': tensors.add(value)}
+    if isinstance(value, np.generic):
+        return {'scalar': value.item(), 'dtype': value.dtype.str}
+    if isinstance(value, np.dtype):
+        return {'dtype': value.str}
+    if isinstance(value, tuple):
+        return {'tuple': [_encode(item, ids, tensors) for item in value]}
+    if isinstance(value, list):
+        return [_encode(item, ids, tensors) for item in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+
+    raise TypeError("cannot serialize an attribute of type %s" % type(value).__name__)
+
+
+def _decode(value, nodes, tensor):
+    """
+    decodes an attribute value encoded by _encode
+
+    Parameters:
+    ----------
+    value: object
+        the encoded value
+    nodes: list
+        the loaded nodes so far
+    tensor: callable
+        returns the tensor with the given index
+    """
+    if isinstance(value, list):
+        return [_decode(item, nodes, tensor) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if 'node' in value:
+        return nodes[value['node']]
+    if 'constant' in value:
+        return _wrap(ConstantNode, tensor(value['constant']), value['name'])
+    if 'array' in value:
+        return tensor(value['array'])
+    if 'scalar' in value:
+        return np.array(value['scalar'], dtype=value['dtype'])[()]
+    if 'dtype' in value:
+        return np.dtype(value['dtype'])
+    if 'tuple' in value:
+        return tuple(_decode(item, nodes, tensor) for item in value['tuple'])
+
+    raise ValueError("unknown attribute encoding %s" % value)
+
+
+def _wrap(node_class, array, name):
+    """
+    creates a node of the given class over the buffer of the given array
+    without copying it
+
+    Parameters:
+    ----------
+    node_class: type
+        the class of the node
+    array: ndarray
+        the array holding the node's value
+    name: String
+        the node's name
+    """
+    node = node_class(shape=array.shape, dtype=array.dtype, buffer=array, strides=array.strides)
+    node.name = name
+
+    return node
+
+
+def save(path, *outputs):
+    """
+    saves the computational graphs of the given nodes into a single file,
+    the topology is stored as arrays of opcodes and inputs ids and the
+    nodes values as raw payloads that can be memory-mapped back
+
+    Parameters:
+    ----------
+    path: String
+        the path of the file to write
+    outputs: Node
+        the nodes to save their graphs
+    """
+    nodes = []
+    ids = {}
+    for output in outputs:
+        for node in topological_sort(output):
+            if id(node) not in ids:
+                ids[id(node)] = len(nodes)
+                nodes.append(node)
+
+    tensors = _TensorsWriter()
+    opnames = []
+    opcodes_table = {}
+    kinds = np.empty(len(nodes), dtype=np.int8)
+    opcodes = np.full(len(nodes), -1, dtype=np.int32)
+    values = np.empty(len(nodes), dtype=np.int64)
+    inputs_offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+    inputs = []
+    names = []
+    attributes = {}
+
+    for i, node in enumerate(nodes):
+        names.append(node.name)
+
+        if isinstance(node, SparseNode):
+            kinds[i] = SPARSE_VARIABLE if isinstance(node, SparseVariableNode) else SPARSE_CONSTANT
+            values[i] = tensors.add(node.value.data)
+            attributes[i] = {
+                'shape': _encode(tuple(node.shape), ids, tensors),
+                'indices': _encode(node.value.indices, ids, tensors),
+                'indptr': _encode(node.value.indptr, ids, tensors)
+            }
+            inputs_offsets[i + 1] = len(inputs)
+            continue
+
+        values[i] = tensors.add(node)
+        if isinstance(node, VariableNode):
+            kinds[i] = VARIABLE
+        elif isinstance(node, OperationalNode):
+            kinds[i] = OPERATIONAL
+            if node.opname not in opcodes_table:
+                opcodes_table[node.opname] = len(opnames)
+                opnames.append(node.opname)
+            opcodes[i] = opcodes_table[node.opname]
+            inputs.extend(ids[id(operand)] for operand in node.operands)
+
+            extra = {
+                key: value for key, value in node.__dict__.items()
+                if key not in ('opname', 'opdef', 'operands', 'name')
+            }
+            if len(extra) != 0:
+                attributes[i] = {key: _encode(value, ids, tensors) for key, value in extra.items()}
+        else:
+            kinds[i] = CONSTANT
+
+        inputs_offsets[i + 1] = len(inputs)
+
+    topology = {
+        'kinds': tensors.add(kinds),
+        'opcodes': tensors.add(opcodes),
+        'values': tensors.add(values),
+        'inputs_offsets': tensors.add(inputs_offsets),
+        'inputs': tensors.add(np.array(inputs, dtype=np.int64))
+    }
+
+    header = json.dumps({
+        'opnames': opnames,
+        'names': names,
+        'outputs': [ids[id(output)] for output in outputs],
+        'topology': topology,
+        'attributes': {str(i): attrs for i, attrs in attributes.items()},
+        'tensors': tensors.entries
+    }).encode('utf-8')
+
+    # pad the header so the payloads start at an aligned offset
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+    header += b' ' * (data_start - len(MAGIC) - 8 - len(header))
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for entry, array in zip(tensors.entries, tensors.tensors):
+            f.seek(data_start + entry['offset'])
+            f.write(array.data)
+        f.truncate(data_start + tensors.size)
+
+
+def load(path, mmap_mode='c'):
+    """
+    loads the computational graphs saved by save, only the header is read
+    while the nodes values are memory-mapped and paged in on first access
+
+    Parameters:
+    ----------
+    path: String
+        the path of the file to read
+    mmap_mode: String
+        'c' for copy-on-write values that can be updated in place without
+        touching the file, 'r' for read-only values, None to read the whole
+        file into memory
+
+    Returns: list of Node
+        the saved output nodes in order
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a computational graph file" % path)
+        header_length, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+
+    data_start = len(MAGIC) + 8 + header_length
+    if mmap_mode is None:
+        data = np.fromfile(path, dtype=np.uint8, offset=data_start)
+    else:
+        data = np.memmap(path, dtype=np.uint8, mode=mmap_mode, offset=data_start)
+
+    entries = header['tensors']
+
+    def tensor(index):
+        entry = entries[index]
+        return np.ndarray(
+            entry['shape'], dtype=entry['dtype'], buffer=data, offset=entry['offset']
+        )
+
+    topology = {key: tensor(index) for key, index in header['topology'].items()}
+    opnames = header['opnames']
+    names = header['names']
+    nodes = []
+
+    for i, kind in enumerate(topology['kinds']):
+        value = tensor(topology['values'][i])
+        attributes = header['attributes'].get(str(i), {})
+
+        if kind == CONSTANT:
+            node = _wrap(ConstantNode, value, names[i])
+        elif kind == VARIABLE:
+            node = _wrap(VariableNode, value, names[i])
+        elif kind in (SPARSE_CONSTANT, SPARSE_VARIABLE):
+            import scipy.sparse as sparse
+            attributes = {key: _decode(encoded, nodes, tensor) for key, encoded in attributes.items()}
+            matrix = sparse.csr_matrix(
+                (value, attributes['indices'], attributes['indptr']),
+                shape=attributes['shape']
+            )
+            node_class = SparseVariableNode if kind == SPARSE_VARIABLE else SparseConstantNode
+            node = node_class(matrix, names[i])
+        else:
+            node = _wrap(OperationalNode, value, names[i])
+            node.opname = opnames[topology['opcodes'][i]]
+            node.opdef = registry._opdef(node.opname)
+            start, stop = topology['inputs_offsets'][i:i + 2]
+            node.operands = tuple(nodes[j] for j in topology['inputs'][start:stop])
+            for key, encoded in attributes.items():
+                setattr(node, key, _decode(encoded, nodes, tensor))
+
+        nodes.append(node)
+
+    return [nodes[i] for i in header['outputs']]
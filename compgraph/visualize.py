@@ -1,8 +1,5 @@
-from collections import deque
-
-import networkx as nx
-from matplotlib import rc
-import matplotlib.pyplot as plt
+from collections import Counter, deque
+from xml.sax.saxutils import escape
 
 from compgraph.nodes import *
 
@@ -16,10 +13,18 @@ def visualize_at(node, figsize=None):
     node: nodes.Node
         the node to visualize its computational graph
     """
+    # only this visualization needs networkx and matplotlib, they're imported
+    # on its first call
+    import networkx as nx
+    from matplotlib import rc
+    import matplotlib.pyplot as plt
 
     G = nx.DiGraph(graph={'rankdir': 'LR'})
     queue = NodesQueue()
-    color_dict = {'VariableNode': 'lightblue', 'ConstantNode': 'orange'}
+    color_dict = {
+        'VariableNode': 'lightblue', 'ConstantNode': 'orange',
+        'SparseVariableNode': 'lightblue', 'SparseConstantNode': 'orange'
+    }
     color = lambda n: color_dict[n.__class__.__name__] if n.__class__.__name__ in color_dict else '#d5a6f9'
 
     G.add_node(node.name, label=f"${node.name}$", color=color(node))
@@ -28,20 +33,19 @@ def visualize_at(node, figsize=None):
     while queue:
         current = queue.pop()
 
-        if isinstance(current, VariableNode) or isinstance(current, ConstantNode):
+        if isinstance(current, (VariableNode, ConstantNode, SparseNode)):
             continue
         
-        previous_nodes = sorted(
-            filter(lambda n: n is not None, [current.operand_a, current.operand_b]),
-            key=lambda n: n.name
-        )
+        previous_nodes = sorted(current.operands, key=lambda n: n.name)
 
         for prev_node in previous_nodes:
             if prev_node is not None:
+                # a node is queued once so the traversal is linear in the graph size
+                visited = prev_node.name in G
                 G.add_node(prev_node.name, label=f"${prev_node.name}$", color=color(prev_node))
                 G.add_edge(prev_node.name, current.name)
 
-                if prev_node not in queue:
+                if not visited:
                     queue.push(prev_node)
 
     nodes_colors = [_node[1]["color"] for _node in G.nodes(data=True)]
@@ -55,3 +59,465 @@ def visualize_at(node, figsize=None):
 
     nx.draw(G, pos, with_labels=False, arrows=True, node_color=nodes_colors, node_size=2000)
     nx.draw_networkx_labels(G, pos, labels=nodes_labels, font_size=15)
+
+
+# the fill colors of the kinds of nodes in a graph summary
+_KIND_COLORS = {
+    'variable': 'lightblue', 'constant': 'orange', 'op': '#d5a6f9',
+    'collapsed': '#e0e0e0', 'repeated': '#bfa5ef'
+}
+
+
+def _kind(node):
+    """
+    returns the kind of the given node in a graph summary
+    """
+    if isinstance(node, (VariableNode, SparseVariableNode)):
+        return 'variable'
+    if isinstance(node, OperationalNode):
+        return 'op'
+
+    return 'constant'
+
+
+def _collect(roots):
+    """
+    returns the nodes of the graphs of the given roots in topological order,
+    each node is visited once so the traversal is linear in the graph size
+    """
+    order = []
+    visited = set()
+    for root in roots:
+        if id(root) in visited:
+            continue
+        visited.add(id(root))
+        stack = [(root, iter(getattr(root, 'operands', ())))]
+
+        while len(stack) > 0:
+            current, operands = stack[-1]
+            for operand in operands:
+                if id(operand) not in visited:
+                    visited.add(id(operand))
+                    stack.append((operand, iter(getattr(operand, 'operands', ()))))
+                    break
+            else:
+                stack.pop()
+                order.append(current)
+
+    return order
+
+
+def _histogram(counter, limit=None):
+    """
+    formats the counts of ops as 'add x3, mul x2', the most common first
+    """
+    items = counter.most_common()
+    text = ", ".join("%s ×%d" % item for item in items[:limit])
+
+    return text + (", …" if limit is not None and len(items) > limit else "")
+
+
+def _repeated_runs(names, min_repeats, max_period=8):
+    """
+    finds the runs of a sequence of op names that repeat a pattern at least
+    min_repeats times, returns (start, period, repeats) for each run
+    """
+    runs = []
+    i = 0
+    while i < len(names):
+        best = None
+        for period in range(1, max_period + 1):
+            pattern = names[i:i + period]
+            if len(pattern) < period:
+                break
+            repeats = 1
+            while names[i + repeats * period:i + (repeats + 1) * period] == pattern:
+                repeats += 1
+            if repeats >= min_repeats and (best is None or period * repeats > best[0] * best[1]):
+                best = (period, repeats)
+
+        if best is None:
+            i += 1
+        else:
+            runs.append((i,) + best)
+            i += best[0] * best[1]
+
+    return runs
+
+
+def summarize_graph(roots, max_depth=None, ops=None, constants=True, min_repeats=3):
+    """
+    builds a summary of the graphs of the given roots that stays readable for
+    large graphs: the nodes deeper than max_depth or filtered out by op are
+    collapsed into a summary node per connected group, and chains of ops
+    repeating the same pattern, e.g. the layers of a deep network, are
+    collapsed into a single node. The traversal and the collapsing are linear
+    in the graph size
+
+    Parameters:
+    ----------
+    roots: Node | list of Node
+        the nodes to summarize their graphs
+    max_depth: int
+        the number of edges from the roots beyond which the nodes are
+        collapsed, None shows all the depths
+    ops: collection of String
+        the opnames of the op nodes to show, the other op nodes are collapsed,
+        None shows all the ops
+    constants: Boolean
+        a flag to show the constant nodes, hidden constants are dropped
+    min_repeats: int
+        the number of repetitions of a pattern of ops in a chain from which
+        the chain is collapsed, None keeps the chains
+
+    Returns: dict
+        'nodes', a list of dicts with the id, kind, label, title and the count
+        of graph nodes of each summary node, and 'edges', a list of (source id,
+        target id) pairs from the operands to the ops
+    """
+    roots = list(roots) if isinstance(roots, (list, tuple)) else [roots]
+    order = _collect(roots)
+    index = {id(node): i for i, node in enumerate(order)}
+    operands = [[index[id(operand)] for operand in getattr(node, 'operands', ())] for node in order]
+    kinds = [_kind(node) for node in order]
+    roots_indices = {index[id(root)] for root in roots}
+
+    depths = [None] * len(order)
+    queue = deque(sorted(roots_indices))
+    for i in queue:
+        depths[i] = 0
+    while len(queue) > 0:
+        i = queue.popleft()
+        for j in operands[i]:
+            if depths[j] is None:
+                depths[j] = depths[i] + 1
+                queue.append(j)
+
+    # each node is shown, hidden into a collapsed group or dropped
+    states = []
+    for i, node in enumerate(order):
+        if i in roots_indices:
+            states.append('shown')
+        elif kinds[i] == 'constant' and not constants:
+            states.append('dropped')
+        elif max_depth is not None and depths[i] > max_depth:
+            states.append('hidden')
+        elif kinds[i] == 'op' and ops is not None and node.opname not in ops:
+            states.append('hidden')
+        else:
+            states.append('shown')
+
+    # the connected groups of hidden nodes, by union-find
+    parents = list(range(len(order)))
+
+    def find(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    for i in range(len(order)):
+        if states[i] == 'hidden':
+            for j in operands[i]:
+                if states[j] == 'hidden':
+                    parents[find(j)] = find(i)
+
+    summary = []
+    representatives = [None] * len(order)
+    groups = {}
+    for i, node in enumerate(order):
+        if states[i] == 'shown':
+            name = getattr(node, 'name', '<unnamed>')
+            representatives[i] = len(summary)
+            summary.append({
+                'kind': kinds[i], 'label': name, 'count': 1,
+                'opname': getattr(node, 'opname', None),
+                'title': "%s\n%s %s %s" % (
+                    name, getattr(node, 'opname', node.__class__.__name__),
+                    tuple(node.shape), node.dtype
+                )
+            })
+        elif states[i] == 'hidden':
+            group = find(i)
+            if group not in groups:
+                groups[group] = len(summary)
+                summary.append({'kind': 'collapsed', 'count': 0, 'ops': Counter()})
+            representatives[i] = groups[group]
+            summary[groups[group]]['count'] += 1
+            summary[groups[group]]['ops'][getattr(node, 'opname', kinds[i])] += 1
+
+    for entry in summary:
+        if entry['kind'] == 'collapsed':
+            entry['label'] = "%d node%s\n%s" % (
+                entry['count'], '' if entry['count'] == 1 else 's', _histogram(entry['ops'], 3)
+            )
+            entry['title'] = "%d collapsed\n%s" % (entry['count'], _histogram(entry.pop('ops')))
+
+    edges = set()
+    for i in range(len(order)):
+        for j in operands[i]:
+            source, target = representatives[j], representatives[i]
+            if source is not None and target is not None and source != target:
+                edges.add((source, target))
+
+    if min_repeats is not None:
+        summary, edges = _collapse_repeats(summary, edges, min_repeats)
+
+    return {
+        'nodes': [dict(entry, id=i) for i, entry in enumerate(summary)],
+        'edges': sorted(edges)
+    }
+
+
+def _collapse_repeats(summary, edges, min_repeats):
+    """
+    collapses the runs of op nodes chained one after the other that repeat
+    the same pattern of ops, along with the constants only they consume
+
+    Parameters:
+    ----------
+    summary: list of dict
+        the summary nodes
+    edges: set
+        the (source, target) edges between the summary nodes
+    min_repeats: int
+        the number of repetitions from which a run is collapsed
+
+    Returns: (list of dict, set)
+    """
+    successors = [[] for _ in summary]
+    predecessors = [[] for _ in summary]
+    for source, target in edges:
+        successors[source].append(target)
+        predecessors[target].append(source)
+
+    # an op continues the chain of its only op operand if it's that operand's only consumer
+    next_in_chain = {}
+    for target, entry in enumerate(summary):
+        ops_predecessors = [p for p in predecessors[target] if summary[p]['kind'] == 'op']
+        if entry['kind'] == 'op' and len(ops_predecessors) == 1 and len(successors[ops_predecessors[0]]) == 1:
+            next_in_chain[ops_predecessors[0]] = target
+
+    merged = {}
+    chained = set(next_in_chain.values())
+    for head in range(len(summary)):
+        if head not in next_in_chain or head in chained:
+            continue
+        chain = [head]
+        while chain[-1] in next_in_chain:
+            chain.append(next_in_chain[chain[-1]])
+
+        names = [summary[i]['opname'] for i in chain]
+        for start, period, repeats in _repeated_runs(names, min_repeats):
+            run = chain[start:start + period * repeats]
+            collapsed = len(summary)
+            summary.append({
+                'kind': 'repeated', 'count': len(run),
+                'label': "(%s) × %d\n%s → %s" % (
+                    " → ".join(names[start:start + period]), repeats,
+                    summary[run[0]]['label'], summary[run[-1]]['label']
+                ),
+                'title': "%d ops repeating (%s) %d times, from %s to %s" % (
+                    len(run), ", ".join(names[start:start + period]), repeats,
+                    summary[run[0]]['label'], summary[run[-1]]['label']
+                )
+            })
+            for i in run:
+                merged[i] = collapsed
+
+    # the constants consumed by a single collapsed run go into it
+    for i, entry in enumerate(summary[:len(successors)]):
+        if entry['kind'] == 'constant' and len(successors[i]) != 0:
+            targets = {merged.get(target) for target in successors[i]}
+            if len(targets) == 1 and None not in targets:
+                collapsed = targets.pop()
+                merged[i] = collapsed
+                summary[collapsed]['count'] += 1
+
+    if len(merged) == 0:
+        return summary, edges
+
+    kept = [i for i in range(len(summary)) if i not in merged]
+    ids = {i: new_id for new_id, i in enumerate(kept)}
+    edges = {
+        (ids[merged.get(source, source)], ids[merged.get(target, target)]) for source, target in edges
+        if merged.get(source, source) != merged.get(target, target)
+    }
+
+    return [summary[i] for i in kept], edges
+
+
+def _layout(summary):
+    """
+    places the summary nodes in layers from the leaves to the roots, an op
+    is a layer after its operands and a leaf a layer before its first
+    consumer, then orders each layer by the positions of the operands
+
+    Returns: (list of int, list of int)
+        the layer and the position in its layer of each node
+    """
+    nodes, edges = summary['nodes'], summary['edges']
+    predecessors = [[] for _ in nodes]
+    successors = [[] for _ in nodes]
+    for source, target in edges:
+        predecessors[target].append(source)
+        successors[source].append(target)
+
+    # layering in topological order, collapsed groups can close cycles which
+    # are broken at their first node in id order
+    layers = [0] * len(nodes)
+    indegrees = [len(p) for p in predecessors]
+    ready = deque(i for i in range(len(nodes)) if indegrees[i] == 0)
+    done = [False] * len(nodes)
+    next_unprocessed = 0
+    for _ in range(len(nodes)):
+        if len(ready) == 0:
+            while done[next_unprocessed]:
+                next_unprocessed += 1
+            ready.append(next_unprocessed)
+        i = ready.popleft()
+        if done[i]:
+            continue
+        done[i] = True
+        layers[i] = max((layers[p] + 1 for p in predecessors[i] if done[p]), default=0)
+        for successor in successors[i]:
+            indegrees[successor] -= 1
+            if indegrees[successor] == 0 and not done[successor]:
+                ready.append(successor)
+    for i, node in enumerate(nodes):
+        if node['kind'] in ('variable', 'constant') and len(successors[i]) != 0:
+            layers[i] = max(min(layers[s] for s in successors[i]) - 1, 0)
+
+    by_layer = [[] for _ in range(max(layers, default=0) + 1)]
+    for i, layer in enumerate(layers):
+        by_layer[layer].append(i)
+
+    positions = [0] * len(nodes)
+    for layer in by_layer:
+        for position, i in enumerate(layer):
+            positions[i] = position
+
+    # a barycenter pass from the leaves to the roots then back for the leaves
+    for layer in by_layer[1:]:
+        layer.sort(key=lambda i: (
+            sum(positions[p] for p in predecessors[i]) / len(predecessors[i])
+            if len(predecessors[i]) != 0 else positions[i]
+        ))
+        for position, i in enumerate(layer):
+            positions[i] = position
+    for layer in by_layer:
+        layer.sort(key=lambda i: (
+            sum(positions[s] for s in successors[i]) / len(successors[i])
+            if len(predecessors[i]) == 0 and len(successors[i]) != 0 else positions[i]
+        ))
+        for position, i in enumerate(layer):
+            positions[i] = position
+
+    return layers, positions
+
+
+def render_svg(roots, path=None, max_depth=None, ops=None, constants=True, min_repeats=3):
+    """
+    renders the graphs of the given roots as an SVG image without going
+    through matplotlib or graphviz, the graph is summarized first, see
+    summarize_graph, and laid out in linear time so graphs of tens of
+    thousands of nodes render in seconds
+
+    Parameters:
+    ----------
+    roots: Node | list of Node
+        the nodes to render their graphs
+    path: String
+        the file to write the image to, if any
+    max_depth: int
+        the number of edges from the roots beyond which the nodes are
+        collapsed, None shows all the depths
+    ops: collection of String
+        the opnames of the op nodes to show, the other op nodes are collapsed
+    constants: Boolean
+        a flag to show the constant nodes
+    min_repeats: int
+        the number of repetitions of a pattern of ops in a chain from which
+        the chain is collapsed, None keeps the chains
+
+    Returns: String
+        the SVG document
+    """
+    summary = summarize_graph(roots, max_depth, ops, constants, min_repeats)
+    nodes = summary['nodes']
+    layers, positions = _layout(summary)
+
+    char_width, line_height, padding = 7, 16, 10
+    row_height, column_gap = 2 * line_height + 2 * padding + 12, 60
+
+    sizes = []
+    for node in nodes:
+        lines = node['label'].split("\n")
+        sizes.append((
+            max(len(line) for line in lines) * char_width + 2 * padding,
+            len(lines) * line_height + padding
+        ))
+
+    layers_count = max(layers, default=0) + 1
+    widths = [0] * layers_count
+    heights = [0] * layers_count
+    for i, layer in enumerate(layers):
+        widths[layer] = max(widths[layer], sizes[i][0])
+        heights[layer] = max(heights[layer], positions[i] + 1)
+    offsets = [0] * layers_count
+    for layer in range(1, layers_count):
+        offsets[layer] = offsets[layer - 1] + widths[layer - 1] + column_gap
+    total_height = max(heights, default=0) * row_height
+
+    centers = []
+    for i in range(len(nodes)):
+        layer = layers[i]
+        top = (total_height - heights[layer] * row_height) / 2
+        centers.append((
+            offsets[layer] + widths[layer] / 2,
+            top + (positions[i] + 0.5) * row_height
+        ))
+
+    width = offsets[-1] + widths[-1] + 2 * padding
+    parts = [
+        '<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" '
+        'viewBox="%d %d %d %d" font-family="serif" font-size="13">' % (
+            width, total_height + 2 * padding, -padding, -padding, width, total_height + 2 * padding
+        ),
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" '
+        'markerWidth="6" markerHeight="6" orient="auto"><path d="M 0 0 L 10 5 L 0 10 z"/></marker></defs>',
+        '<g fill="none" stroke="#555" stroke-width="1" marker-end="url(#arrow)">'
+    ]
+    for source, target in summary['edges']:
+        (x1, y1), (x2, y2) = centers[source], centers[target]
+        x1 += sizes[source][0] / 2
+        x2 -= sizes[target][0] / 2
+        middle = (x1 + x2) / 2
+        parts.append('<path d="M %.1f %.1f C %.1f %.1f %.1f %.1f %.1f %.1f"/>' % (
+            x1, y1, middle, y1, middle, y2, x2, y2
+        ))
+    parts.append('</g>')
+
+    for i, node in enumerate(nodes):
+        (x, y), (node_width, node_height) = centers[i], sizes[i]
+        lines = node['label'].split("\n")
+        parts.append(
+            '<g><title>%s</title><rect x="%.1f" y="%.1f" width="%d" height="%d" rx="8" '
+            'fill="%s" stroke="#333"/>' % (
+                escape(node['title']), x - node_width / 2, y - node_height / 2,
+                node_width, node_height, _KIND_COLORS[node['kind']]
+            )
+        )
+        for k, line in enumerate(lines):
+            parts.append('<text x="%.1f" y="%.1f" text-anchor="middle" dominant-baseline="central">%s</text>' % (
+                x, y + (k - (len(lines) - 1) / 2) * line_height, escape(line)
+            ))
+        parts.append('</g>')
+    parts.append('</svg>')
+
+    svg = "\n".join(parts)
+    if path is not None:
+        with open(path, 'w') as f:
+            f.write(svg)
+
+    return svg
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import compgraph as cg
+from autodiff.reverse import gradient
+from autodiff.visualize import _sweep_graph, _frames, _grad_text, save_AD_animation
+
+
+def build():
+    x = cg.variable(0.5, 'x')
+    y = cg.variable(1.5, 'y')
+    return cg.sin(x * y) + x ** 2. + cg.exp(y * 0.3)
+
+
+def test_frames_end_with_the_gradients():
+    f = build()
+    _, _, var_names, name_to_node = _sweep_graph(f)
+    frames = _frames(f, name_to_node)
+
+    final = {}
+    for frame in frames:
+        final.update(frame['grads'])
+    expected = gradient(f)
+    assert sorted(var_names) == sorted(final) == ['x', 'y']
+    for name in var_names:
+        assert final[name] == _grad_text(name, expected[name])
+
+
+def test_frames_visit_nodes_after_their_consumers():
+    f = build()
+    _, _, _, name_to_node = _sweep_graph(f)
+    frames = _frames(f, name_to_node)
+
+    order = []
+    for frame in frames:
+        if frame['node'] not in order:
+            order.append(frame['node'])
+    assert sorted(order) == sorted(name_to_node)
+    for node in name_to_node.values():
+        for operand in getattr(node, 'operands', ()):
+            assert order.index(node.name) < order.index(operand.name)
+
+    # every edge is highlighted once, and is labeled on its consumer's first frame
+    edges = [frame['edge'] for frame in frames if frame['edge'] is not None]
+    assert len(edges) == len(set(edges)) == sum(len(getattr(node, 'operands', ())) for node in name_to_node.values())
+
+
+def test_broadcast_operands_get_reduced_adjoints():
+    w = cg.variable(np.array([1., 2.]), 'w')
+    f = cg.sum(w * np.ones((3, 2)))
+    _, _, _, name_to_node = _sweep_graph(f)
+
+    final = {}
+    for frame in _frames(f, name_to_node):
+        final.update(frame['grads'])
+    assert final['w'] == _grad_text('w', gradient(f)['w'])
+
+
+def test_save_AD_animation_writes_a_gif(tmp_path):
+    pytest.importorskip('pydot')
+    from matplotlib import animation
+
+    path = tmp_path / 'ad.gif'
+    save_AD_animation(cg.variable(2., 'x') * 3., str(path), writer=animation.PillowWriter(fps=1))
+    assert path.stat().st_size > 0
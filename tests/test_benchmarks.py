@@ -0,0 +1,44 @@
+import json
+import pytest
+from benchmarks import run
+from benchmarks.workloads import WORKLOADS
+
+
+@pytest.mark.parametrize('name', sorted(name for name in WORKLOADS if name != 'import_core'))
+def test_workloads_run(name):
+    workload, sizes = WORKLOADS[name]
+    workload(sizes[0])()
+
+
+def test_compare_reports_regressions():
+    baseline = {'a[1]': {'median': 1., 'peak_bytes': 100}, 'b[1]': {'median': 1., 'peak_bytes': 100}}
+    results = {
+        'a[1]': {'median': 1.1, 'peak_bytes': 100},
+        'b[1]': {'median': 1., 'peak_bytes': 200},
+        'c[1]': {'median': 9., 'peak_bytes': 900}
+    }
+
+    assert run.compare(results, baseline, 1.25) == ['b[1]']
+
+
+def test_save_and_compare(tmp_path, capsys):
+    path = str(tmp_path / 'baseline.json')
+    assert run.main(['build_scalar_chain', '--quick', '--repeat', '1', '--save', path]) == 0
+    with open(path) as f:
+        saved = json.load(f)
+    assert list(saved['results']) == ['build_scalar_chain[%d]' % WORKLOADS['build_scalar_chain'][1][0]]
+
+    # a baseline 100 times faster makes the run a regression
+    for result in saved['results'].values():
+        result['median'] /= 100
+    with open(path, 'w') as f:
+        json.dump(saved, f)
+    assert run.main(['build_scalar_chain', '--quick', '--repeat', '1', '--compare', path]) == 1
+    assert 'REGRESSION' in capsys.readouterr().out
+
+
+def test_list_and_unknown_workloads(capsys):
+    assert run.main(['--list']) == 0
+    assert 'reverse_scalar_chain' in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        run.main(['no_such_workload'])
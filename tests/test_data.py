@@ -0,0 +1,83 @@
+import threading
+import numpy as np
+import pytest
+from autodiff.data import DataLoader, load_shard
+
+
+def make_shards(tmp_path, lengths):
+    """
+    writes shards of features and labels numbering the examples in order
+    """
+    shards = []
+    start = 0
+    for i, length in enumerate(lengths):
+        features = np.arange(start, start + length, dtype=np.float64)[:, None] * np.ones((1, 3))
+        np.save(str(tmp_path / ('x%d.npy' % i)), features)
+        shards.append((str(tmp_path / ('x%d.npy' % i)), np.arange(start, start + length)))
+        start += length
+
+    return shards
+
+
+def test_load_shard(tmp_path):
+    features, labels = load_shard(make_shards(tmp_path, [5])[0])
+    assert isinstance(features, np.memmap)
+    np.testing.assert_array_equal(features[:, 0], labels)
+
+    with pytest.raises(ValueError):
+        load_shard((np.ones(3), np.ones(4)))
+
+
+@pytest.mark.parametrize('drop_last', [False, True])
+def test_batches_in_order(tmp_path, drop_last):
+    loader = DataLoader(make_shards(tmp_path, [5, 7, 3]), 4, shuffle=False, drop_last=drop_last)
+    batches = list(loader)
+
+    assert len(batches) == len(loader) == (3 if drop_last else 4)
+    assert all(len(labels) == 4 for _, labels in batches[:3])
+    # the batches span the shards boundaries
+    labels = np.concatenate([labels for _, labels in batches])
+    np.testing.assert_array_equal(labels, np.arange(12 if drop_last else 15))
+    for features, labels in batches:
+        np.testing.assert_array_equal(features[:, 0], labels)
+
+
+def test_shuffled_epochs_cover_every_example(tmp_path):
+    loader = DataLoader(make_shards(tmp_path, [5, 7, 3]), 4, seed=0)
+    epochs = [np.concatenate([labels for _, labels in loader]) for _ in range(2)]
+
+    for labels in epochs:
+        np.testing.assert_array_equal(np.sort(labels), np.arange(15))
+    assert not np.array_equal(epochs[0], epochs[1])
+
+
+def test_transform_runs_in_workers(tmp_path):
+    threads = set()
+
+    def transform(features, labels):
+        threads.add(threading.get_ident())
+        return features * 2
+
+    loader = DataLoader(make_shards(tmp_path, [10]), 3, shuffle=False, transform=transform)
+    batches = list(loader)
+
+    assert threading.get_ident() not in threads
+    np.testing.assert_array_equal(np.concatenate(batches)[:, 0], 2 * np.arange(10))
+
+
+def test_prefetch_is_bounded(tmp_path):
+    loaded = []
+    lock = threading.Lock()
+
+    def transform(features, labels):
+        with lock:
+            loaded.append(labels[0])
+        return labels
+
+    loader = DataLoader(make_shards(tmp_path, [40]), 2, shuffle=False, transform=transform, prefetch=3)
+    iterator = iter(loader)
+    next(iterator)
+
+    # only the first prefetch batches were submitted when the first is yielded
+    assert len(loaded) <= 3
+    iterator.close()
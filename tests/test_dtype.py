@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+import compgraph as cg
+from autodiff.reverse import gradient
+
+rng = np.random.RandomState(0)
+
+
+@pytest.fixture
+def float32():
+    cg.set_default_dtype(np.float32)
+    yield
+    cg.set_default_dtype(np.float64)
+
+
+@pytest.fixture
+def mixed_precision():
+    cg.set_default_dtype(np.float32, mixed_precision=True)
+    yield
+    cg.set_default_dtype(np.float64)
+
+
+def loss(w, x):
+    hidden = cg.sin(cg.dot(x, w))
+    return cg.mean(hidden * hidden) + cg.sum(cg.max(cg.exp(w), axis=0)) + cg.softmax_cross_entropy(hidden, np.eye(3)[[0, 1, 2, 0]])
+
+
+def expected_gradient(w, x):
+    """
+    returns the float64 gradient of loss
+    """
+    variable = cg.variable(w, 'w')
+    return gradient(loss(variable, cg.constant(x)))['w']
+
+
+def test_default_is_float64():
+    assert cg.get_default_dtype() == np.float64
+    assert cg.variable([1, 2, 3]).dtype == np.float64
+    assert cg.constant(2).dtype == np.float64
+
+
+def test_rejects_non_float_dtypes():
+    with pytest.raises(ValueError):
+        cg.set_default_dtype(np.int32)
+
+
+def test_float32_graph(float32):
+    w, x = rng.rand(3, 3), rng.rand(4, 3)
+    variable = cg.variable(w, 'w')
+    output = loss(variable, cg.constant(x))
+    grads = gradient(output)
+
+    assert variable.dtype == np.float32
+    assert output.dtype == np.float32
+    assert grads['w'].dtype == np.float32
+    # booleans, e.g. masks, keep their dtype
+    assert cg.constant(np.ones(2, dtype=bool)).dtype == bool
+
+    cg.set_default_dtype(np.float64)
+    np.testing.assert_allclose(grads['w'], expected_gradient(w, x), rtol=1e-4)
+
+
+def test_mixed_precision_accumulates_in_float64(mixed_precision):
+    assert cg.get_accumulator_dtype() == np.float64
+
+    # a float32 sum of these loses the small terms
+    values = np.concatenate([[1e8], np.ones(1000)])
+    total = cg.sum(cg.variable(values, 'v'))
+    assert total.dtype == np.float32
+    assert float(total) == np.float32(1e8 + 1000)
+
+    w, x = rng.rand(3, 3), rng.rand(4, 3)
+    grads = gradient(loss(cg.variable(w, 'w'), cg.constant(x)))
+    # the rules run in float32 while the adjoints are accumulated in float64
+    assert grads['w'].dtype == np.float64
+
+    cg.set_default_dtype(np.float64)
+    np.testing.assert_allclose(grads['w'], expected_gradient(w, x), rtol=1e-5)
+
+
+def test_cast_gradient():
+    w = cg.variable(rng.rand(3), 'w')
+    grads = gradient(cg.sum(cg.cast(w, np.float32) * 2.))
+
+    assert grads['w'].dtype == np.float64
+    np.testing.assert_allclose(grads['w'], 2.)
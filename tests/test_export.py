@@ -0,0 +1,100 @@
+import json
+import re
+import numpy as np
+import pytest
+import scipy.sparse as sp
+import compgraph as cg
+
+
+def build():
+    w = cg.variable(np.arange(6.).reshape(2, 3), 'w')
+    b = cg.variable(np.array([1., np.inf, 2.]), 'b')
+    h = w + b
+    return w, b, h, cg.sum(h, name='loss')
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_json_records_the_graph(tmp_path):
+    w, b, h, loss = build()
+    path = str(tmp_path / 'graph.json')
+    cg.export([loss, h], path, format='json', stats=True)
+
+    document = load_json(path)
+    records = {record['name']: record for record in document['nodes']}
+    records['h'] = records[h.name]
+    ids = [record['id'] for record in document['nodes']]
+    # the records are in topological order, with their operands before them
+    assert ids == list(range(len(ids)))
+    assert all(operand < record['id'] for record in document['nodes'] for operand in record['operands'])
+
+    assert records['h']['operands'] == [records['w']['id'], records['b']['id']]
+    assert records['h']['op'] == 'add' and records['h']['opcode'] == cg.get_op('add').opcode
+    assert records['w']['kind'] == 'variable' and records['loss']['kind'] == 'op'
+    assert records['w']['shape'] == [2, 3] and records['w']['nbytes'] == 48
+    assert document['outputs'] == [records['loss']['id'], records['h']['id']]
+
+    assert records['w']['stats'] == {'min': 0., 'max': 5., 'mean': 2.5, 'std': pytest.approx(np.std(np.arange(6.))), 'nonfinite': 0}
+    assert records['b']['stats']['nonfinite'] == 1
+    assert records['b']['stats']['mean'] == 1.5
+    assert records['h']['stats']['nonfinite'] == 2
+
+
+def test_stats_are_optional(tmp_path):
+    path = str(tmp_path / 'graph.json')
+    cg.export(build()[-1], path, format='json')
+
+    assert not any('stats' in record for record in load_json(path)['nodes'])
+
+
+def test_sparse_nodes_kinds(tmp_path):
+    matrix = sp.random(4, 3, density=0.5, format='csr', random_state=0)
+    product = cg.dot(cg.variable(matrix, 'sparse'), np.ones((3, 2)), name='product')
+    path = str(tmp_path / 'graph.json')
+    cg.export(product, path, format='json', stats=True)
+
+    records = {record['name']: record for record in load_json(path)['nodes']}
+    assert records['sparse']['kind'] == 'sparse_variable'
+    assert records['sparse']['nbytes'] == matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    assert records['sparse']['stats']['max'] == matrix.data.max()
+    assert records['product']['shape'] == [4, 2]
+
+
+def test_dot_matches_json(tmp_path):
+    loss = build()[-1]
+    cg.export(loss, str(tmp_path / 'graph.json'), format='json')
+    cg.export(loss, str(tmp_path / 'graph.dot'), format='dot')
+
+    records = load_json(str(tmp_path / 'graph.json'))['nodes']
+    dot = (tmp_path / 'graph.dot').read_text()
+    assert dot.startswith('digraph G {') and dot.endswith('}\n')
+
+    nodes = set(int(id) for id in re.findall(r'^  n(\d+) \[label=', dot, re.M))
+    edges = set((int(a), int(b), int(position)) for a, b, position in re.findall(r'^  n(\d+) -> n(\d+) \[operand=(\d+)\];$', dot, re.M))
+    outputs = [int(id) for id in re.findall(r'^  n(\d+) \[peripheries=2\];$', dot, re.M)]
+
+    assert nodes == {record['id'] for record in records}
+    assert edges == {
+        (operand, record['id'], position)
+        for record in records for position, operand in enumerate(record['operands'])
+    }
+    assert outputs == [records[-1]['id']]
+
+
+def test_shared_nodes_are_exported_once(tmp_path):
+    x = cg.variable(np.ones(3), 'x')
+    y = cg.exp(x, name='y')
+    path = str(tmp_path / 'graph.json')
+    cg.export([y * y, y], path, format='json')
+
+    names = [record['name'] for record in load_json(path)['nodes']]
+    assert names.count('x') == names.count('y') == 1
+
+
+def test_unknown_format_raises(tmp_path):
+    with pytest.raises(ValueError):
+        cg.export(build()[-1], str(tmp_path / 'graph.txt'), format='txt')
+    assert not (tmp_path / 'graph.txt').exists()
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import pytest
+import compgraph as cg
+from compgraph.graph import get_graph
+
+
+def build():
+    x = cg.variable(1.)
+    y = x * 2.
+    return [x.name, y.operand_b.name, y.name, (y + x).name]
+
+
+def test_graphs_name_their_own_nodes():
+    with cg.Graph() as graph:
+        assert get_graph() is graph
+        assert build() == ['_0', 'const_0', 'mul_0', 'add_0']
+        assert build() == ['_1', 'const_1', 'mul_1', 'add_1']
+
+        with cg.Graph():
+            assert build() == ['_0', 'const_0', 'mul_0', 'add_0']
+        assert build() == ['_2', 'const_2', 'mul_2', 'add_2']
+
+        cg.reset()
+        assert build() == ['_0', 'const_0', 'mul_0', 'add_0']
+
+    assert get_graph() is not graph
+
+
+def test_graphs_are_exited_on_errors():
+    default = get_graph()
+    with pytest.raises(RuntimeError):
+        with cg.Graph():
+            raise RuntimeError()
+
+    assert get_graph() is default
+
+
+def test_threads_build_in_their_own_graphs():
+    barrier = threading.Barrier(4)
+    names = {}
+
+    def run(index):
+        with cg.Graph():
+            barrier.wait()
+            names[index] = [build() for _ in range(50)]
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    expected = [['_%d' % i, 'const_%d' % i, 'mul_%d' % i, 'add_%d' % i] for i in range(50)]
+    assert all(names[i] == expected for i in range(4))
+
+
+def test_threads_sharing_a_graph_get_unique_names():
+    graph = cg.Graph()
+    barrier = threading.Barrier(4)
+    names = []
+
+    def run():
+        with graph:
+            barrier.wait()
+            names.extend(cg.variable(1.).name for _ in range(500))
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(names) == sorted('_%d' % i for i in range(2000))
+
+
+def test_asyncio_tasks_build_in_their_own_graphs():
+    async def task():
+        with cg.Graph():
+            names = []
+            for _ in range(10):
+                names.append(build())
+                await asyncio.sleep(0)
+            return names
+
+    async def main():
+        with cg.Graph() as outer:
+            results = await asyncio.gather(*(task() for _ in range(3)))
+            # the tasks' graphs were entered in copies of this context
+            assert get_graph() is outer
+            return results
+
+    expected = [['_%d' % i, 'const_%d' % i, 'mul_%d' % i, 'add_%d' % i] for i in range(10)]
+    assert asyncio.run(main()) == [expected] * 3
@@ -0,0 +1,181 @@
+import numpy as np
+import scipy.sparse as sp
+import pytest
+import compgraph as cg
+import autodiff
+from autodiff.hessian import jvp
+
+rng = np.random.RandomState(0)
+X = rng.rand(5, 4)
+Y = np.eye(3)[rng.randint(0, 3, 5)]
+A = rng.rand(4, 3)
+S = sp.random(5, 3, density=0.5, format='csr', random_state=0)
+IMAGES = rng.rand(2, 1, 5, 5)
+KERNELS = rng.rand(2, 1, 3, 3)
+
+# the scalar functions checked and the points to take their Hessians at
+FUNCTIONS = {
+    'elementwise': (
+        lambda w: cg.sum(w * w * w + cg.sin(w) * w) + cg.sum(cg.exp(w) / (w + 2.)) + cg.sum(cg.log(w + 1.) ** 2.),
+        rng.rand(6)
+    ),
+    'mean': (
+        lambda w: cg.sum(cg.mean(w * w, axis=0) * cg.sum(cg.mean(cg.exp(w), axis=1))),
+        rng.rand(3, 2)
+    ),
+    'sum': (
+        lambda w: cg.sum(cg.sum(w * w, axis=1) ** 2.) + cg.sum(cg.sum(cg.cos(w), axis=0, keepdims=True) * w),
+        rng.rand(3, 4)
+    ),
+    'max': (
+        lambda w: cg.sum(cg.max(w, axis=1) ** 2.),
+        rng.rand(3, 4)
+    ),
+    'max_keepdims': (
+        lambda w: cg.sum(cg.max(w * w, axis=0, keepdims=True) * w),
+        rng.rand(3, 4)
+    ),
+    'max_all': (
+        lambda w: cg.max(w * cg.sin(w)) ** 2.,
+        rng.rand(3, 4)
+    ),
+    'dot_einsum': (
+        lambda w: cg.sum(cg.einsum('ij,jk->ik', X, w) ** 2.) + cg.sum(cg.dot(w.T, w)),
+        rng.rand(4, 3)
+    ),
+    'softmax': (
+        lambda w: -1 * cg.sum(Y * cg.log(cg.softmax(cg.dot(cg.cos(cg.dot(X, w)), A)))) + cg.sum(cg.softmax(w) ** 2.),
+        rng.rand(4, 4)
+    ),
+    'softmax_cross_entropy': (
+        lambda w: cg.softmax_cross_entropy(cg.dot(cg.cos(cg.dot(X, w)), A), Y),
+        rng.rand(4, 4)
+    ),
+    'conv_pool': (
+        lambda w: cg.sum(cg.max_pool2d(cg.conv2d(IMAGES, w, padding=1), 2) ** 2.)
+        + cg.sum(cg.avg_pool2d(cg.conv2d(IMAGES, w), 3) ** 2.),
+        rng.rand(2, 1, 3, 3)
+    ),
+    'conv_pool_input': (
+        lambda x: cg.sum(cg.conv2d(x, KERNELS, stride=2, padding=1) ** 2.) + cg.sum(cg.max_pool2d(x * x, 2, padding=1)),
+        rng.rand(1, 1, 5, 5)
+    ),
+    'sparse_dot': (
+        lambda v: cg.sum(cg.dot(cg.constant(S), v * v) ** 2.) + cg.sum(cg.dot(v, v)),
+        rng.rand(3)
+    ),
+}
+
+
+def numerical_hessian(fn, x, eps=1e-4):
+    """
+    computes the Hessian of fn at x by central differences of its values
+    """
+    value = lambda point: float(np.sum(fn(cg.constant(point.reshape(x.shape)))))
+    point = x.astype(np.float64).reshape(-1)
+    steps = np.eye(x.size) * eps
+
+    hessian = np.zeros((x.size, x.size))
+    for i in range(x.size):
+        for j in range(i, x.size):
+            hessian[i, j] = hessian[j, i] = (
+                value(point + steps[i] + steps[j]) - value(point + steps[i] - steps[j])
+                - value(point - steps[i] + steps[j]) + value(point - steps[i] - steps[j])
+            ) / (4 * eps ** 2)
+
+    return hessian
+
+
+@pytest.mark.parametrize('name', sorted(FUNCTIONS))
+def test_hessian(name):
+    fn, x = FUNCTIONS[name]
+    expected = numerical_hessian(fn, x)
+
+    hessian = autodiff.hessian(fn, x)
+    assert hessian.shape == x.shape * 2
+    np.testing.assert_allclose(hessian.reshape(x.size, x.size), expected, atol=1e-4)
+
+    chunked = autodiff.hessian(fn, x, chunk_size=5)
+    np.testing.assert_allclose(chunked, hessian, atol=1e-10)
+
+
+@pytest.mark.parametrize('name', sorted(FUNCTIONS))
+def test_hvp(name):
+    fn, x = FUNCTIONS[name]
+    expected = numerical_hessian(fn, x)
+    vectors = np.random.RandomState(1).rand(3, *x.shape)
+
+    product = autodiff.hvp(fn, x, vectors[0])
+    np.testing.assert_allclose(product.reshape(-1), expected.dot(vectors[0].reshape(-1)), atol=1e-4)
+
+    products = autodiff.hvp(fn, x, vectors, batched=True)
+    np.testing.assert_allclose(products.reshape(3, -1), vectors.reshape(3, -1).dot(expected), atol=1e-4)
+
+
+def test_hessian_of_several_arrays():
+    fn = lambda w, b: cg.sum(cg.max_pool2d(cg.conv2d(IMAGES, w, padding=1) * b, 2) ** 2.)
+    w, b = rng.rand(2, 1, 3, 3), np.array(0.7)
+    expected = numerical_hessian(
+        lambda z: fn(cg.reshape(z[:w.size], w.shape), z[w.size]),
+        np.concatenate([w.reshape(-1), b.reshape(-1)])
+    )
+
+    blocks = autodiff.hessian(fn, [w, b], chunk_size=7)
+    hessian = np.block([
+        [blocks[0][0].reshape(w.size, w.size), blocks[0][1].reshape(w.size, 1)],
+        [blocks[1][0].reshape(1, w.size), blocks[1][1].reshape(1, 1)]
+    ])
+    np.testing.assert_allclose(hessian, expected, atol=1e-4)
+
+
+@pytest.mark.parametrize('keepdims', [False, True])
+@pytest.mark.parametrize('axis', [0, -1, (0, 1), None])
+def test_max_jvp(axis, keepdims):
+    x, tangents = rng.rand(3, 4), rng.rand(2, 3, 4)
+    output = cg.max(cg.variable(x, 'x') ** 2., axis=axis, keepdims=keepdims)
+
+    tangent, = jvp([output], {'x': tangents})
+    eps = 1e-6
+    expected = np.stack([
+        (np.max((x + eps * t) ** 2, axis=axis, keepdims=keepdims)
+         - np.max((x - eps * t) ** 2, axis=axis, keepdims=keepdims)) / (2 * eps)
+        for t in tangents
+    ])
+    np.testing.assert_allclose(tangent, expected, atol=1e-6)
+
+
+def test_hessian_diag_is_exact_for_separable_functions():
+    fn, x = FUNCTIONS['elementwise']
+    estimate = autodiff.hessian_diag(fn, x, samples=4, seed=0)
+
+    # z * Hz is the diagonal for every probe when the Hessian is diagonal
+    np.testing.assert_allclose(estimate.mean, np.diag(autodiff.hessian(fn, x)), rtol=1e-10)
+    np.testing.assert_allclose(estimate.variance, 0., atol=1e-20)
+
+
+@pytest.mark.parametrize('name', ['softmax_cross_entropy', 'dot_einsum', 'max'])
+def test_hutchinson_estimates(name):
+    fn, x = FUNCTIONS[name]
+    hessian = autodiff.hessian(fn, x).reshape(x.size, x.size)
+
+    diag = autodiff.hessian_diag(fn, x, samples=400, seed=0)
+    assert diag.mean.shape == x.shape
+    assert np.all(np.abs(diag.mean.reshape(-1) - np.diag(hessian)) <= 5 * diag.std_error.reshape(-1) + 1e-10)
+
+    trace = autodiff.hessian_trace(fn, x, samples=400, seed=0)
+    assert abs(trace.mean - np.trace(hessian)) <= 5 * trace.std_error + 1e-10
+
+    # the chunks draw the same probes in the same order
+    chunked = autodiff.hessian_trace(fn, x, samples=400, chunk_size=64, seed=0)
+    np.testing.assert_allclose(chunked.mean, trace.mean, rtol=1e-10)
+
+
+def test_hutchinson_of_several_arrays():
+    fn = lambda w, b: cg.sum(cg.exp(cg.dot(X, w) * b))
+    w, b = rng.rand(4, 3) * 0.1, rng.rand(3)
+    estimate = autodiff.hessian_diag(fn, [w, b], samples=200, seed=1)
+
+    assert [mean.shape for mean in estimate.mean] == [w.shape, b.shape]
+    assert 'samples=200' in repr(estimate)
+    with pytest.raises(ValueError):
+        autodiff.hessian_trace(fn, [w, b], samples=1)
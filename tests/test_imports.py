@@ -0,0 +1,74 @@
+import subprocess
+import sys
+import pytest
+import compgraph as cg
+
+
+def imported_modules(code):
+    """
+    runs the given code in a fresh interpreter and returns the lazily
+    imported modules it loaded
+    """
+    code += "\nimport sys\nprint(' '.join(m for m in sys.modules if m.split('.')[0] in ('matplotlib', 'networkx', 'scipy')))"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+
+def test_building_and_differentiating_imports_only_numpy(tmp_path):
+    path = str(tmp_path / 'graph.cg')
+    code = """
+import numpy as np
+import compgraph as cg
+import autodiff
+from autodiff.reverse import gradient
+x = cg.variable(np.ones((3, 3)), 'x')
+loss = cg.sum(cg.exp(cg.dot(x, x)))
+gradient(loss, workers=2)
+cg.save(%r, loss)
+gradient(cg.load(%r)[0])
+autodiff.hessian_diag(lambda w: cg.sum(cg.sin(w)), np.ones(3))
+""" % (path, path)
+
+    assert imported_modules(code) == set()
+
+
+def test_render_svg_needs_neither_networkx_nor_matplotlib():
+    code = """
+import compgraph as cg
+cg.render_svg(cg.sum(cg.variable([1., 2.], 'x') * 2.))
+"""
+
+    modules = imported_modules(code)
+    assert not any(m.split('.')[0] in ('matplotlib', 'networkx') for m in modules)
+
+
+def test_sparse_graphs_load_in_a_fresh_interpreter(tmp_path):
+    path = str(tmp_path / 'graph.cg')
+    code = """
+import numpy as np
+import scipy.sparse as sp
+import compgraph as cg
+cg.save(%r, cg.dot(cg.variable(sp.eye(3, format='csr'), 's'), np.ones(3)))
+""" % path
+    imported_modules(code)
+
+    code = """
+import compgraph as cg
+from autodiff.reverse import gradient
+product, = cg.load(%r)
+assert cg.nodes.is_sparse(product.operand_a.value)
+assert gradient(cg.sum(product))['s'].nnz == 3
+""" % path
+    assert 'scipy.sparse' in imported_modules(code)
+
+
+def test_lazy_attributes_resolve():
+    from compgraph import visualize
+    import autodiff.reverse as reverse
+
+    assert 'render_svg' in dir(cg)
+    assert cg.render_svg is visualize.render_svg
+    assert cg.summarize_graph is visualize.summarize_graph
+    assert callable(reverse.visualize_AD) and callable(reverse.save_AD_animation)
+    with pytest.raises(AttributeError):
+        cg.no_such_function
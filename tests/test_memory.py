@@ -0,0 +1,50 @@
+import numpy as np
+import compgraph as cg
+from autodiff.reverse import gradient
+
+
+def test_accounts_values_and_saved_arrays():
+    w = cg.variable(np.ones((100, 10)), 'w')
+    peak = cg.max(w, axis=1, name='peak')
+    loss = cg.sum(peak, name='loss')
+    report = cg.memory_report(loss)
+
+    entries = {entry['name']: entry for entry in report.nodes}
+    assert entries['w']['bytes'] == 8000
+    assert entries['peak']['bytes'] == 800
+    # max saves its result with the reduced axes kept for its gradient
+    assert entries['peak']['saved_bytes'] == 800
+    assert report.by_attribute['with_keepdims'] == {'count': 1, 'bytes': 800}
+    assert report.by_opcode['max']['count'] == 1
+    assert report.nominal_bytes == 8000 + 800 + 800 + 8
+
+
+def test_shared_buffers_are_counted_once():
+    buffer = np.ones((100, 10))
+    whole = cg.variable(buffer, 'whole')
+    half = cg.variable(buffer[:50], 'half')
+    report = cg.memory_report(cg.sum(whole) + cg.sum(half))
+
+    assert np.shares_memory(whole, half)
+    assert report.nominal_bytes - report.total_bytes == half.nbytes
+    assert any({'whole', 'half'} <= {label for label, _ in group['holders']} for group in report.shared)
+
+
+def test_gradient_roots_report_what_they_keep_alive():
+    w = cg.variable(np.ones((50, 50)), 'w')
+    grads = gradient(cg.sum(cg.exp(w * 2.)))
+    report = cg.memory_report(grads)
+
+    assert report.roots['w']['nodes'] > 1
+    assert report.roots['w']['bytes'] >= w.nbytes
+
+    released = gradient(cg.sum(cg.exp(w * 2.)), retain_graph=False)
+    assert cg.memory_report(released).roots['w']['bytes'] < report.roots['w']['bytes']
+
+
+def test_format_lists_the_largest_nodes():
+    w = cg.variable(np.ones((100, 10)), 'w')
+    text = cg.memory_report(cg.sum(cg.exp(w), name='loss')).format(limit=1)
+
+    assert 'largest nodes' in text
+    assert '7.8 KiB' in text
@@ -0,0 +1,256 @@
+import numpy as np
+import scipy.sparse as sp
+import pytest
+import compgraph as cg
+from autodiff.reverse import gradient
+
+rng = np.random.RandomState(0)
+
+
+def numerical_gradients(fn, arrays, eps=1e-6):
+    """
+    computes the gradients of the sum of fn's output wrt each of the given
+    arrays by central differences
+    """
+    value = lambda points: float(np.sum(fn(*[cg.constant(point) for point in points])))
+
+    grads = []
+    for i, array in enumerate(arrays):
+        grad = np.zeros(array.shape)
+        for index in np.ndindex(array.shape):
+            shifted = [point.copy() for point in arrays]
+            shifted[i][index] += eps
+            forward = value(shifted)
+            shifted[i][index] -= 2 * eps
+            grad[index] = (forward - value(shifted)) / (2 * eps)
+        grads.append(grad)
+
+    return grads
+
+
+def check_gradients(fn, *arrays, atol=1e-6):
+    """
+    checks the reverse mode gradients of the sum of fn's output wrt each of
+    the given arrays against central differences
+    """
+    arrays = [np.asarray(array, dtype=np.float64) for array in arrays]
+    variables = [cg.variable(array, 'arg_%d' % i) for i, array in enumerate(arrays)]
+    grads = gradient(cg.sum(fn(*variables)))
+
+    for i, expected in enumerate(numerical_gradients(fn, arrays)):
+        np.testing.assert_allclose(grads.get('arg_%d' % i, 0.), expected, atol=atol)
+
+
+def test_add_n():
+    check_gradients(lambda a, b, c: cg.add_n([a, b * c, a]), rng.rand(3, 2), rng.rand(3, 2), rng.rand(3, 2))
+
+
+@pytest.mark.parametrize('axis', [0, 1, -1])
+def test_concatenate(axis):
+    check_gradients(
+        lambda a, b: cg.concatenate([a * b, cg.exp(b), a], axis=axis) ** 2.,
+        rng.rand(2, 3), rng.rand(2, 3)
+    )
+
+
+@pytest.mark.parametrize('axis', [0, 1, 2])
+def test_stack(axis):
+    check_gradients(lambda a, b: cg.stack([a, cg.sin(b), a * b], axis=axis) ** 2., rng.rand(2, 3), rng.rand(2, 3))
+
+
+@pytest.mark.parametrize('sections', [3, [1, 4]])
+def test_split(sections):
+    def fn(a):
+        parts = cg.split(a * a, sections, axis=1)
+        return cg.sum(parts[0]) * cg.sum(cg.exp(parts[-1]))
+
+    check_gradients(fn, rng.rand(2, 6))
+
+
+def test_split_sections_used_once():
+    check_gradients(lambda a: cg.split(cg.exp(a), 2)[1] * 3., rng.rand(4, 2))
+
+
+def test_where():
+    condition = rng.rand(3, 4) > 0.5
+    check_gradients(lambda a, b: cg.where(condition, a * b, cg.exp(b)), rng.rand(3, 4), rng.rand(3, 4))
+
+
+def test_operands_are_kept_in_order():
+    a, b, c = cg.constant(np.ones(2)), cg.constant(np.zeros(2)), cg.constant(np.ones(2))
+    node = cg.add_n([a, b, c])
+
+    assert node.operands == (a, b, c)
+    assert node.operand_a is a and node.operand_b is b
+
+
+@pytest.mark.parametrize('sparse_side', ['left', 'right'])
+def test_sparse_dot(sparse_side):
+    matrix = sp.random(5, 4, density=0.4, format='csr', random_state=0)
+    dense = rng.rand(4, 3) if sparse_side == 'left' else rng.rand(3, 5)
+
+    def product(sparse, other):
+        return cg.dot(sparse, other) if sparse_side == 'left' else cg.dot(other, sparse)
+
+    sparse = cg.variable(matrix, 'sparse')
+    other = cg.variable(dense, 'other')
+    output = product(sparse, other)
+    grads = gradient(cg.sum(cg.sin(output)))
+
+    # the same graph over the dense matrix
+    dense_sparse = cg.variable(matrix.toarray(), 'sparse')
+    dense_other = cg.variable(dense, 'other')
+    expected_output = product(dense_sparse, dense_other)
+    expected = gradient(cg.sum(cg.sin(expected_output)))
+
+    np.testing.assert_allclose(output, expected_output, rtol=1e-12)
+    np.testing.assert_allclose(grads['other'], expected['other'], rtol=1e-12)
+    # a sparse variable only gets the entries of its sparsity pattern
+    assert sp.issparse(grads['sparse'])
+    pattern = matrix.toarray() != 0
+    np.testing.assert_allclose(grads['sparse'].toarray(), np.where(pattern, expected['sparse'], 0.), rtol=1e-12)
+
+
+def test_sparse_constant_dot():
+    matrix = sp.random(6, 4, density=0.5, format='csr', random_state=1)
+    check_gradients(lambda x: cg.dot(cg.constant(matrix), x * x), rng.rand(4, 2))
+    check_gradients(lambda x: cg.dot(cg.exp(x), cg.constant(matrix)), rng.rand(3, 6))
+
+
+@pytest.mark.parametrize('subscripts, shapes', [
+    ('ij,jk->ik', [(3, 4), (4, 2)]),
+    ('bij,bjk->bik', [(2, 3, 4), (2, 4, 2)]),
+    ('ij,jk,kl->il', [(2, 3), (3, 4), (4, 2)]),
+    ('ij->', [(3, 4)]),
+    ('i,j->ij', [(3,), (4,)]),
+    ('ij,ij', [(3, 4), (3, 4)]),
+    ('...ij,...jk', [(2, 3, 4), (4, 2)]),
+])
+def test_einsum(subscripts, shapes):
+    arrays = [rng.rand(*shape) for shape in shapes]
+    np.testing.assert_allclose(
+        cg.einsum(subscripts, *arrays), np.einsum(subscripts, *arrays), rtol=1e-12
+    )
+    check_gradients(lambda *operands: cg.einsum(subscripts, *operands) ** 2., *arrays)
+
+
+def test_einsum_rejects_repeated_subscripts():
+    with pytest.raises(ValueError):
+        cg.einsum('ii->i', rng.rand(3, 3))
+
+
+@pytest.mark.parametrize('shape_a, shape_b', [
+    ((3, 4), (4, 2)),
+    ((2, 3, 4), (4, 2)),
+    ((2, 1, 3, 4), (5, 4, 2)),
+    ((4,), (2, 4, 3)),
+    ((2, 3, 4), (4,)),
+])
+def test_matmul(shape_a, shape_b):
+    a, b = rng.rand(*shape_a), rng.rand(*shape_b)
+    np.testing.assert_allclose(cg.matmul(a, b), np.matmul(a, b), rtol=1e-12)
+    check_gradients(lambda x, y: cg.sin(cg.matmul(x, y)), a, b)
+
+
+def naive_conv2d(x, filters, stride, padding):
+    """
+    computes a cross-correlation with explicit loops over the output
+    """
+    x = np.pad(x, ((0, 0), (0, 0), (padding, padding), (padding, padding)))
+    kernel_height, kernel_width = filters.shape[2:]
+    height = (x.shape[2] - kernel_height) // stride + 1
+    width = (x.shape[3] - kernel_width) // stride + 1
+
+    result = np.zeros((x.shape[0], filters.shape[0], height, width))
+    for i in range(height):
+        for j in range(width):
+            window = x[:, :, i * stride:i * stride + kernel_height, j * stride:j * stride + kernel_width]
+            result[:, :, i, j] = np.einsum('nchw,fchw->nf', window, filters)
+
+    return result
+
+
+def naive_pool2d(x, size, stride, reduce):
+    """
+    pools windows with explicit loops over the output, without padding
+    """
+    height = (x.shape[2] - size) // stride + 1
+    width = (x.shape[3] - size) // stride + 1
+
+    result = np.zeros(x.shape[:2] + (height, width))
+    for i in range(height):
+        for j in range(width):
+            window = x[:, :, i * stride:i * stride + size, j * stride:j * stride + size]
+            result[:, :, i, j] = reduce(window, axis=(2, 3))
+
+    return result
+
+
+@pytest.mark.parametrize('stride, padding', [(1, 0), (1, 1), (2, 1), (2, 0)])
+def test_conv2d(stride, padding):
+    x, filters = rng.rand(2, 3, 6, 5), rng.rand(4, 3, 3, 2)
+    np.testing.assert_allclose(
+        cg.conv2d(x, filters, stride=stride, padding=padding),
+        naive_conv2d(x, filters, stride, padding), rtol=1e-12
+    )
+    check_gradients(lambda a, b: cg.conv2d(a, b, stride=stride, padding=padding) ** 2., x, filters)
+
+
+@pytest.mark.parametrize('size, stride', [(2, None), (3, 1), (2, 3)])
+def test_max_pool2d(size, stride):
+    x = rng.rand(2, 2, 6, 7)
+    np.testing.assert_allclose(
+        cg.max_pool2d(x, size, stride=stride), naive_pool2d(x, size, stride or size, np.max), rtol=1e-12
+    )
+    check_gradients(lambda a: cg.max_pool2d(a * a, size, stride=stride, padding=1) * 2., x)
+
+
+@pytest.mark.parametrize('size, stride', [(2, None), (3, 1), (2, 3)])
+def test_avg_pool2d(size, stride):
+    x = rng.rand(2, 2, 6, 7)
+    np.testing.assert_allclose(
+        cg.avg_pool2d(x, size, stride=stride), naive_pool2d(x, size, stride or size, np.mean), rtol=1e-12
+    )
+    check_gradients(lambda a: cg.avg_pool2d(cg.exp(a), size, stride=stride, padding=1) ** 2., x)
+
+
+
+@pytest.mark.parametrize('shape_a, shape_b', [
+    ((3, 1), (3, 4)), ((4,), (3, 4)), ((), (3, 4)), ((2, 1, 4), (3, 1)), ((1, 1), (5,))
+])
+@pytest.mark.parametrize('op', [
+    lambda a, b: a + b, lambda a, b: a - b, lambda a, b: a * b, lambda a, b: a / (b + 2.), lambda a, b: (a + 1.) ** b
+])
+def test_broadcasting(shape_a, shape_b, op):
+    check_gradients(lambda a, b: op(a, b) ** 2., rng.rand(*shape_a), rng.rand(*shape_b))
+    check_gradients(lambda a, b: op(b, a + 1.) ** 2., rng.rand(*shape_a), rng.rand(*shape_b))
+
+
+def test_broadcasting_where_and_add_n():
+    condition = rng.rand(3, 1) > 0.5
+    check_gradients(lambda a, b: cg.where(condition, a, cg.exp(b)) ** 2., rng.rand(4), rng.rand(3, 4))
+    check_gradients(lambda a, b, c: cg.add_n([a, b, c]) ** 2., rng.rand(3, 1), rng.rand(4), rng.rand(2, 3, 4))
+
+
+def test_broadcast_axes_are_recorded_when_broadcasting():
+    a = cg.variable(np.ones((3, 1)), 'a')
+    b = cg.variable(np.ones((3, 4)), 'b')
+    c = cg.variable(np.ones(4), 'c')
+
+    assert not hasattr(b * b, 'broadcast_axes')
+    assert (a * b).broadcast_axes[1] is None
+    assert (a * b).broadcast_axes[0] is not None
+    assert all(axes is not None for axes in (a + c).broadcast_axes)
+
+
+def test_broadcast_axes_are_saved(tmp_path):
+    a = cg.variable(rng.rand(3, 1), 'a')
+    b = cg.variable(rng.rand(4), 'b')
+    product = a * b
+    cg.save(str(tmp_path / 'graph.cg'), cg.sum(product))
+
+    loss, = cg.load(str(tmp_path / 'graph.cg'))
+    assert loss.operand_a.broadcast_axes == product.broadcast_axes
+    grads = gradient(loss)
+    np.testing.assert_allclose(grads['a'], np.full((3, 1), np.sum(b)), rtol=1e-12)
+    np.testing.assert_allclose(grads['b'], np.full(4, np.sum(a)), rtol=1e-12)
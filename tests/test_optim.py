@@ -0,0 +1,99 @@
+import numpy as np
+import scipy.sparse as sp
+import pytest
+import compgraph as cg
+from autodiff.reverse import gradient
+from autodiff import optim
+
+rng = np.random.RandomState(0)
+
+
+def sgd(param, grads, learning_rate):
+    for grad in grads:
+        param = param - learning_rate * grad
+    return param
+
+
+def momentum(param, grads, learning_rate, momentum=0.9, nesterov=False):
+    velocity = np.zeros_like(param)
+    for grad in grads:
+        velocity = momentum * velocity + grad
+        param = param - learning_rate * (momentum * velocity + grad if nesterov else velocity)
+    return param
+
+
+def rmsprop(param, grads, learning_rate, decay=0.9, epsilon=1e-8):
+    square_avg = np.zeros_like(param)
+    for grad in grads:
+        square_avg = decay * square_avg + (1 - decay) * grad ** 2
+        param = param - learning_rate * grad / (np.sqrt(square_avg) + epsilon)
+    return param
+
+
+def adam(param, grads, learning_rate, beta1=0.9, beta2=0.999, epsilon=1e-8):
+    first, second = np.zeros_like(param), np.zeros_like(param)
+    for step, grad in enumerate(grads, 1):
+        first = beta1 * first + (1 - beta1) * grad
+        second = beta2 * second + (1 - beta2) * grad ** 2
+        first_hat, second_hat = first / (1 - beta1 ** step), second / (1 - beta2 ** step)
+        param = param - learning_rate * first_hat / (np.sqrt(second_hat) + epsilon)
+    return param
+
+
+@pytest.mark.parametrize('optimizer, reference, kwargs', [
+    (optim.SGD, sgd, {}),
+    (optim.Momentum, momentum, {}),
+    (optim.Momentum, momentum, {'nesterov': True}),
+    (optim.RMSProp, rmsprop, {}),
+    (optim.Adam, adam, {}),
+])
+def test_updates_match_reference(optimizer, reference, kwargs):
+    initial = rng.rand(3, 4)
+    grads = [rng.randn(3, 4) for _ in range(5)]
+
+    w = cg.variable(initial.copy(), 'w')
+    buffer = w.view(np.ndarray)
+    instance = optimizer([w], 0.01, **kwargs)
+    for grad in grads:
+        instance.step({'w': grad})
+
+    # the variable's own buffer is updated
+    np.testing.assert_allclose(buffer, reference(initial, grads, 0.01, **kwargs), rtol=1e-12)
+
+
+def test_training_reaches_least_squares():
+    x, y = rng.rand(20, 3), rng.rand(20)
+    optimum = np.mean((x.dot(np.linalg.lstsq(x, y, rcond=None)[0]) - y) ** 2)
+    w = cg.variable(np.zeros(3), 'w')
+    instance = optim.Adam([w], 0.1)
+
+    losses = []
+    for _ in range(300):
+        loss = cg.mean((cg.dot(cg.constant(x), w) - y) ** 2.)
+        losses.append(float(loss))
+        instance.step(gradient(loss))
+
+    assert losses[-1] < 1.01 * optimum
+
+
+def test_sparse_variable_updates_its_pattern():
+    matrix = sp.random(4, 3, density=0.5, format='csr', random_state=0)
+    w = cg.variable(matrix.copy(), 'w')
+    grads = gradient(cg.sum(cg.dot(w, np.ones((3, 2)))))
+    optim.SGD([w], 0.5).step(grads)
+
+    np.testing.assert_allclose(w.value.toarray(), matrix.toarray() - 0.5 * 2 * (matrix.toarray() != 0))
+
+
+def test_skips_missing_and_rejects_mismatched_gradients():
+    w, b = cg.variable(np.ones(3), 'w'), cg.variable(np.ones(2), 'b')
+    instance = optim.SGD([w, b], 1.)
+
+    instance.step({'w': np.ones(3)})
+    np.testing.assert_array_equal(w, np.zeros(3))
+    np.testing.assert_array_equal(b, np.ones(2))
+
+    with pytest.raises(ValueError):
+        instance.step({'b': np.ones(3)})
+    with pytest.raises(TypeError):
+        optim.SGD([cg.constant(np.ones(3))], 1.)
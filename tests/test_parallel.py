@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+import compgraph as cg
+from autodiff.reverse import gradient
+from autodiff.parallel import DataParallel
+
+rng = np.random.RandomState(0)
+PARAMS = {'w': rng.rand(4, 3), 'b': rng.rand(3)}
+X = rng.rand(10, 4)
+Y = np.eye(3)[rng.randint(0, 3, 10)]
+
+
+def squared_error_sum(params, x, y):
+    return cg.sum((cg.dot(x, params['w']) + params['b'] - y) ** 2.)
+
+
+def squared_error_mean(params, x, y):
+    return cg.mean((cg.dot(x, params['w']) + params['b'] - y) ** 2.)
+
+
+def cross_entropy(params, x, y):
+    return cg.softmax_cross_entropy(cg.dot(x, params['w']) + params['b'], y)
+
+
+@pytest.mark.parametrize('loss_fn, reduction', [
+    (squared_error_sum, 'sum'),
+    (squared_error_mean, 'mean'),
+    (cross_entropy, 'mean'),
+])
+def test_matches_single_process_gradient(loss_fn, reduction):
+    parallel = DataParallel(loss_fn, PARAMS, workers=3, reduction=reduction)
+    try:
+        loss, grads = parallel.gradient(X, Y)
+    finally:
+        parallel.close()
+
+    params = {name: cg.variable(value, name) for name, value in PARAMS.items()}
+    expected_loss = loss_fn(params, cg.constant(X), cg.constant(Y))
+    expected = gradient(expected_loss)
+
+    np.testing.assert_allclose(loss, float(expected_loss), rtol=1e-10)
+    for name in PARAMS:
+        np.testing.assert_allclose(grads[name], expected[name], rtol=1e-10)
@@ -0,0 +1,85 @@
+import json
+import threading
+import numpy as np
+import compgraph as cg
+from compgraph import profiler
+from autodiff.reverse import gradient
+
+
+def build(steps):
+    w = cg.variable(np.ones((4, 4)), 'w')
+    y = w
+    for _ in range(steps):
+        y = cg.exp(cg.dot(y, w) * 0.01)
+    return cg.sum(y)
+
+
+def test_records_forward_and_backward_ops(tmp_path):
+    with cg.profile() as p:
+        gradient(build(3))
+
+    rows = {(stat['phase'], stat['name']): stat for stat in p.summary()}
+    assert rows[('forward', 'dot')]['calls'] == 3
+    assert rows[('forward', 'exp')]['calls'] == 3
+    assert rows[('backward', 'dot_grad')]['calls'] == 3
+    # the ops the gradient rules create belong to the backward phase
+    assert ('backward', 'dot') in rows
+    assert all(stat['self_time'] <= stat['total_time'] + 1e-9 for stat in rows.values())
+
+    path = str(tmp_path / 'trace.json')
+    p.export_chrome_trace(path)
+    with open(path) as f:
+        trace = json.load(f)
+    assert len(trace['traceEvents']) == len(p.events)
+    assert {event['ph'] for event in trace['traceEvents']} == {'X'}
+
+
+def test_records_nothing_when_inactive():
+    with cg.profile() as p:
+        pass
+    build(2)
+
+    assert p.events == []
+    assert profiler._active.get() is None
+
+
+def test_nested_profilers_restore_the_outer_one():
+    with cg.profile() as outer:
+        with cg.profile() as inner:
+            cg.exp(np.ones(2))
+        cg.sin(np.ones(2))
+
+    assert [event['name'] for event in inner.events] == ['exp']
+    assert [event['name'] for event in outer.events] == ['sin']
+
+
+def test_threads_have_their_own_profilers():
+    barrier = threading.Barrier(2)
+    profilers = {}
+
+    def run(name, op):
+        with cg.profile() as p:
+            barrier.wait()
+            for _ in range(20):
+                op(np.ones(3))
+            barrier.wait()
+        profilers[name] = p
+
+    threads = [threading.Thread(target=run, args=args) for args in (('exp', cg.exp), ('sin', cg.sin))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name, p in profilers.items():
+        assert {event['name'] for event in p.events} == {name}
+    assert profiler._active.get() is None
+
+
+def test_gradient_workers_are_recorded():
+    loss = build(1)
+    loss = cg.add_n([loss] + [cg.sum(cg.sin(loss * i)) for i in range(4)])
+    with cg.profile() as p:
+        gradient(loss, workers=3)
+
+    assert any(event['phase'] == 'backward' and event['thread'] != threading.get_ident() for event in p.events)
@@ -0,0 +1,55 @@
+from xml.dom import minidom
+import numpy as np
+import compgraph as cg
+from compgraph.nodes import topological_sort
+
+
+def layers(depth):
+    w = cg.variable(np.ones((3, 3)), 'w')
+    y = w
+    for _ in range(depth):
+        y = cg.sin(cg.dot(y, w) + 1.)
+    return cg.sum(y)
+
+
+def test_every_node_is_summarized_once():
+    loss = layers(20)
+    summary = cg.summarize_graph(loss, min_repeats=None)
+
+    assert sum(node['count'] for node in summary['nodes']) == len(topological_sort(loss))
+    assert len({node['id'] for node in summary['nodes']}) == len(summary['nodes'])
+    ids = {node['id'] for node in summary['nodes']}
+    assert all(source in ids and target in ids for source, target in summary['edges'])
+
+
+def test_repeated_chains_are_collapsed():
+    summary = cg.summarize_graph(layers(20))
+    repeated = [node for node in summary['nodes'] if node['kind'] == 'repeated']
+
+    assert len(repeated) == 1
+    assert '× 20' in repeated[0]['label']
+    assert len(summary['nodes']) < 10
+
+
+def test_depth_ops_and_constants_filters():
+    loss = layers(20)
+    total = len(topological_sort(loss))
+
+    deep = cg.summarize_graph(loss, max_depth=3, min_repeats=None)
+    assert sum(node['count'] for node in deep['nodes']) == total
+    assert sum(node['kind'] == 'collapsed' for node in deep['nodes']) == 1
+
+    sums = cg.summarize_graph(loss, ops={'sum'}, min_repeats=None)
+    assert [node['label'] for node in sums['nodes'] if node['kind'] == 'op'] == [loss.name]
+
+    hidden = cg.summarize_graph(loss, constants=False, min_repeats=None)
+    assert not any(node['kind'] == 'constant' for node in hidden['nodes'])
+
+
+def test_render_svg_writes_a_valid_document(tmp_path):
+    path = tmp_path / 'graph.svg'
+    svg = cg.render_svg(layers(2000), str(path))
+
+    document = minidom.parseString(svg)
+    assert document.documentElement.tagName == 'svg'
+    assert path.read_text() == svg
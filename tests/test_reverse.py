@@ -0,0 +1,85 @@
+import gc
+import weakref
+import numpy as np
+import pytest
+import compgraph as cg
+from autodiff.reverse import gradient
+
+rng = np.random.RandomState(0)
+
+
+def branches(w, x):
+    """
+    a loss with independent branches sharing the parameters and a deep chain
+    """
+    hidden = cg.dot(x, w)
+    terms = [cg.sum(cg.exp(hidden * (i + 1) / 10.)) for i in range(8)]
+    chain = hidden
+    for _ in range(50):
+        chain = cg.sin(chain) + hidden
+    terms.append(cg.mean(chain * chain))
+
+    return cg.add_n(terms)
+
+
+def values():
+    return {'w': rng.rand(4, 3)}, rng.rand(5, 4)
+
+
+@pytest.mark.parametrize('workers', [2, 4])
+def test_workers_match_serial_sweep(workers):
+    params, x = values()
+    w = cg.variable(params['w'], 'w')
+    loss = branches(w, cg.constant(x))
+
+    expected = gradient(loss)
+    for _ in range(3):
+        grads = gradient(loss, workers=workers)
+        np.testing.assert_allclose(grads['w'], expected['w'], rtol=1e-12)
+
+
+def test_shared_nodes_get_every_contribution():
+    w = cg.variable(rng.rand(3), 'w')
+    shared = cg.exp(w)
+    loss = cg.sum(shared * shared) + cg.sum(shared) + cg.sum(cg.sin(shared))
+
+    for workers in (None, 3):
+        grads = gradient(loss, workers=workers)
+        value = np.exp(w.view(np.ndarray))
+        np.testing.assert_allclose(grads['w'], (2 * value + 1 + np.cos(value)) * value, rtol=1e-12)
+
+
+def test_deep_chain_does_not_recurse():
+    w = cg.variable(np.array(0.5), 'w')
+    y = w
+    for _ in range(5000):
+        y = y * 1.
+    np.testing.assert_allclose(gradient(y)['w'], 1.)
+
+
+@pytest.mark.parametrize('workers', [None, 3])
+def test_released_graph_gives_the_same_gradients(workers):
+    params, x = values()
+    expected = gradient(branches(cg.variable(params['w'], 'w'), cg.constant(x)))
+
+    w = cg.variable(params['w'], 'w')
+    loss = branches(w, cg.constant(x))
+    grads = gradient(loss, workers=workers, retain_graph=False)
+
+    np.testing.assert_allclose(grads['w'], expected['w'], rtol=1e-12)
+    # the forward nodes drop their operands while the variables are kept
+    assert loss.operands == ()
+    assert float(loss) == float(branches(cg.variable(params['w'], 'w'), cg.constant(x)))
+    np.testing.assert_array_equal(w, params['w'])
+
+
+def test_released_graph_frees_forward_buffers():
+    w = cg.variable(rng.rand(100, 100), 'w')
+    hidden = cg.exp(w * 2.)
+    reference = weakref.ref(hidden)
+    loss = cg.sum(cg.sin(hidden))
+    del hidden
+
+    gradient(loss, retain_graph=False)
+    gc.collect()
+    assert reference() is None
@@ -0,0 +1,48 @@
+import numpy as np
+import scipy.sparse as sp
+import pytest
+import compgraph as cg
+from compgraph.nodes import topological_sort
+from autodiff.reverse import gradient
+
+rng = np.random.RandomState(0)
+
+
+@pytest.mark.parametrize('mmap_mode', ['c', 'r', None])
+def test_scalar_output_round_trip(tmp_path, mmap_mode):
+    x = cg.variable(rng.rand(3, 4), 'x')
+    loss = cg.sum(x * x) + cg.constant(np.float64(2.), 'two')
+    cg.save(str(tmp_path / 'graph.cg'), loss)
+
+    loaded, = cg.load(str(tmp_path / 'graph.cg'), mmap_mode=mmap_mode)
+    assert loaded.shape == ()
+    assert float(loaded) == float(loss)
+    scalars = [node for node in topological_sort(loaded) if getattr(node, 'name', None) == 'two']
+    assert scalars[0].shape == ()
+
+
+def test_round_trip_keeps_values_and_gradients(tmp_path):
+    x = cg.variable(rng.rand(3, 4), 'x')
+    w = cg.variable(rng.rand(4, 2), 'w')
+    sparse = cg.constant(sp.random(5, 3, density=0.5, format='csr', random_state=0))
+    hidden = cg.softmax(cg.dot(x, w) * 2.) + cg.max(x, axis=1, keepdims=True)
+    outputs = [cg.mean(hidden), cg.dot(sparse, cg.sum(x, axis=1)), cg.reshape(hidden, (-1,))]
+    cg.save(str(tmp_path / 'graph.cg'), *outputs)
+
+    loaded = cg.load(str(tmp_path / 'graph.cg'))
+    for output, copy in zip(outputs, loaded):
+        assert copy.shape == output.shape
+        assert copy.dtype == output.dtype
+        np.testing.assert_array_equal(copy, output)
+
+    expected = gradient(outputs[0])
+    grads = gradient(loaded[0])
+    for name in ('x', 'w'):
+        np.testing.assert_allclose(grads[name], expected[name], rtol=1e-12)
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.cg'
+    path.write_bytes(b'not a graph')
+    with pytest.raises(ValueError):
+        cg.load(str(path))
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import numpy as np
+import pytest
+import compgraph as cg
+from autodiff.reverse import gradient
+from autodiff.serving import GradientServer, LocalClient
+
+rng = np.random.RandomState(0)
+PARAMS = {'w': rng.rand(4, 3), 'b': rng.rand(3)}
+EXAMPLES = [(rng.rand(4), np.eye(3)[i % 3]) for i in range(40)]
+
+
+def loss(params, x, y):
+    hidden = cg.sin(cg.dot(x, params['w']) + params['b'])
+    return cg.sum((hidden - y) ** 2.)
+
+
+def expected(x, y):
+    """
+    returns the loss and the gradients of one example from its own graph
+    """
+    params = {name: cg.variable(value, name) for name, value in PARAMS.items()}
+    output = loss(params, cg.constant(x), cg.constant(y))
+    grads = gradient(output)
+
+    return float(output), {name: np.asarray(grads[name]) for name in PARAMS}
+
+
+def test_concurrent_gradients_are_batched():
+    async def main():
+        async with GradientServer(loss, PARAMS, max_batch_size=16, max_latency=0.05) as server:
+            results = await asyncio.gather(*[server.gradient(x, y) for x, y in EXAMPLES])
+        return server, results
+
+    server, results = asyncio.run(main())
+
+    assert server.stats['requests'] == len(EXAMPLES)
+    assert server.stats['batches'] < len(EXAMPLES)
+    for (x, y), (value, grads) in zip(EXAMPLES, results):
+        expected_value, expected_grads = expected(x, y)
+        np.testing.assert_allclose(value, expected_value, rtol=1e-10)
+        for name in PARAMS:
+            np.testing.assert_allclose(grads[name], expected_grads[name], rtol=1e-10)
+
+
+def test_single_request_is_answered_after_max_latency():
+    async def main():
+        async with GradientServer(loss, PARAMS, max_batch_size=64, max_latency=0.01) as server:
+            return await asyncio.wait_for(server.predict(*EXAMPLES[0]), timeout=5)
+
+    x, y = EXAMPLES[0]
+    np.testing.assert_allclose(asyncio.run(main()), expected(x, y)[0], rtol=1e-10)
+
+
+def test_example_of_wrong_shape_is_rejected():
+    async def main():
+        async with GradientServer(loss, PARAMS) as server:
+            await server.gradient(*EXAMPLES[0])
+            with pytest.raises(ValueError):
+                await server.gradient(rng.rand(5), EXAMPLES[0][1])
+            # the server keeps serving the well formed examples
+            return await server.gradient(*EXAMPLES[1])
+
+    value, _ = asyncio.run(main())
+    np.testing.assert_allclose(value, expected(*EXAMPLES[1])[0], rtol=1e-10)
+
+
+def test_batch_errors_reach_every_caller():
+    vector = lambda params, x, y: cg.sin(cg.dot(x, params['w']) + params['b']) - y
+
+    async def main():
+        async with GradientServer(vector, PARAMS, max_latency=0.05) as server:
+            return await asyncio.gather(
+                *[server.gradient(x, y) for x, y in EXAMPLES[:4]], return_exceptions=True
+            )
+
+    errors = asyncio.run(main())
+    assert all(isinstance(error, ValueError) for error in errors)
+
+
+def test_close_answers_queued_requests():
+    async def main():
+        server = GradientServer(loss, PARAMS, max_batch_size=4, max_latency=10.)
+        await server.start()
+        requests = [asyncio.ensure_future(server.gradient(x, y)) for x, y in EXAMPLES[:10]]
+        await asyncio.sleep(0)
+        await asyncio.wait_for(server.close(), timeout=5)
+
+        with pytest.raises(RuntimeError):
+            await server.gradient(*EXAMPLES[0])
+        return await asyncio.gather(*requests)
+
+    results = asyncio.run(main())
+    assert len(results) == 10
+    np.testing.assert_allclose(results[-1][0], expected(*EXAMPLES[9])[0], rtol=1e-10)
+
+
+def test_local_client():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    server = GradientServer(loss, PARAMS, max_latency=0.01)
+    try:
+        asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+        value, grads = LocalClient(server, loop).gradient(*EXAMPLES[2], timeout=5)
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    expected_value, expected_grads = expected(*EXAMPLES[2])
+    np.testing.assert_allclose(value, expected_value, rtol=1e-10)
+    np.testing.assert_allclose(grads['w'], expected_grads['w'], rtol=1e-10)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import compgraph as cg
+from autodiff.reverse import gradient
+from autodiff.vmap import per_example_gradients
+
+rng = np.random.RandomState(0)
+PARAMS = {'w': rng.rand(4, 3), 'b': rng.rand(3), 'k': rng.rand(2, 1, 3, 3)}
+
+# the losses of one example and the arrays of a batch of six examples
+LOSSES = {
+    'softmax_cross_entropy': (
+        lambda p, x, y: cg.softmax_cross_entropy(cg.dot(x, p['w']) + p['b'], y),
+        [rng.rand(6, 4), np.eye(3)[rng.randint(0, 3, 6)]]
+    ),
+    'softmax_cross_entropy_rows': (
+        lambda p, x, y: cg.softmax_cross_entropy(cg.dot(x, p['w']), y) * 3.,
+        [rng.rand(6, 2, 4), np.eye(3)[rng.randint(0, 3, (6, 2))]]
+    ),
+    'reductions': (
+        lambda p, x: cg.sum(cg.max(cg.dot(x, p['w']), axis=0) ** 2.) + cg.mean(cg.exp(x * p['b'][0])),
+        [rng.rand(6, 5, 4)]
+    ),
+    'conv_pool': (
+        lambda p, x: cg.sum(cg.max_pool2d(cg.conv2d(x, p['k'], padding=1), 2) ** 2.),
+        [rng.rand(6, 1, 1, 4, 4)]
+    ),
+}
+
+
+@pytest.mark.parametrize('name', sorted(LOSSES))
+def test_per_example_gradients(name):
+    fn, batch = LOSSES[name]
+    losses, grads = per_example_gradients(fn, PARAMS, *batch)
+
+    for i in range(len(batch[0])):
+        params = {key: cg.variable(value, key) for key, value in PARAMS.items()}
+        loss = fn(params, *[cg.constant(array[i]) for array in batch])
+        expected = gradient(loss)
+
+        np.testing.assert_allclose(losses[i], float(loss), rtol=1e-10)
+        for key in PARAMS:
+            expected_grad = expected[key] if key in expected else np.zeros_like(PARAMS[key])
+            np.testing.assert_allclose(grads[key][i], expected_grad, rtol=1e-8, atol=1e-12)